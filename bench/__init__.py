@@ -0,0 +1,47 @@
+"""Microbenchmarks for the parts of the bot which run on every line.
+
+Each module measures one thing and prints a small table; run them from the
+top of the repository, for example:
+
+    python3 -m bench.registry
+
+Like simulate.py, they need a botconfig.py. Importing src opens the
+database and log files in the working directory, so setup() moves into a
+temporary directory first, which is removed again on exit.
+
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup():
+    """Get ready to import src. Call this before importing anything from it."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix="lykos-bench-")
+    os.chdir(workdir)
+    atexit.register(shutil.rmtree, workdir, True)
+    # src parses the command line itself
+    sys.argv = [sys.argv[0], "--normal"]
+    return workdir
+
+def per_call(func, args):
+    """Call func once with each item of args, and return the average
+    wall clock time per call, in seconds."""
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - start) / len(args)
+
+def print_table(header, rows):
+    widths = [max(len(str(x)) for x in column) for column in zip(header, *rows)]
+    for row in (header,) + tuple(rows):
+        print("  ".join(str(x).rjust(width) for x, width in zip(row, widths)))
+
+# vim: set sw=4 expandtab:
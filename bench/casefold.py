@@ -0,0 +1,81 @@
+"""Time the case folding done for each message of a busy channel.
+
+For every line of the log, this folds what the bot folds when handling a
+message: the sender's nick, hostmask and account, and the target, which
+is also compared against the channel name. That is timed with the cached
+context.lower(), and with the old way of building a translation table on
+every call, kept here for comparison.
+
+Give a captured log of raw lines with --log; otherwise one is made up as
+in bench.parse.
+
+    python3 -m bench.casefold --lines 100000
+
+"""
+
+import argparse
+import random
+import time
+
+import bench
+from bench.parse import make_log
+
+def uncached_lower(nick, casemapping="rfc1459"):
+    # context.lower() as it was before the tables were precomputed
+    mapping = {"[": "{", "]": "}", "\\": "|", "^": "~"}
+    if casemapping == "strict-rfc1459":
+        mapping.pop("^")
+    elif casemapping == "ascii":
+        mapping.clear()
+    return nick.lower().translate(str.maketrans(mapping))
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the case folding done for each message of a busy channel.")
+    parser.add_argument("--log", default=None, help="file with raw lines received from a server")
+    parser.add_argument("--lines", type=int, default=100000, help="lines to make up if no log is given")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    from oyoyo.parse import parse_irc_line, parse_nick
+    from src.context import lower
+
+    if args.log is not None:
+        with open(args.log, "rb") as f:
+            data = f.read()
+    else:
+        data = make_log(args.lines)
+
+    messages = []
+    for line in data.split(b"\n"):
+        if not line.strip():
+            continue
+        tags, prefix, command, params = parse_irc_line(line)
+        if prefix is None or "!" not in prefix or not params:
+            continue
+        nick, mode, ident, host = parse_nick(prefix)
+        messages.append((nick, "{0}@{1}".format(ident, host), tags.get("account", nick), params[0]))
+
+    def fold(func):
+        start = time.perf_counter()
+        for nick, userhost, account, target in messages:
+            func(nick)
+            func(userhost)
+            func(account)
+            func(target) == func("#Channel")
+        return (time.perf_counter() - start) / len(messages)
+
+    cached = fold(lower)
+    uncached = fold(uncached_lower)
+
+    print("{0} messages from {1} users".format(len(messages), len({m[0] for m in messages})))
+    bench.print_table(("", "us/message"), (
+        ("cached tables", "{0:.2f}".format(cached * 1e6)),
+        ("table per call", "{0:.2f}".format(uncached * 1e6)),
+    ))
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
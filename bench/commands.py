@@ -0,0 +1,90 @@
+"""Time dispatching commands with a large user registry.
+
+This boots the bot against simulate.py's FakeServer, joins --users users
+to the channel, gives some of them flags and denies others a command, and
+then times --commands channel messages from random users, mostly !ping
+with some admin commands and plain chatter. Each one goes all the way
+through the handler, the user lookup, the flag and deny checks and the
+reply. The lookup and checks alone are also timed.
+
+    python3 -m bench.commands --users 20000 --commands 100000
+
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+import types
+
+import bench
+
+def main():
+    parser = argparse.ArgumentParser(description="Time dispatching commands with a large user registry.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--commands", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    import botconfig
+    import simulate
+    simulate.load_bot()
+    sim = simulate.Simulation(types.SimpleNamespace(max_players=4, players=0, max_phases=10, max_wait=100, verbose=False))
+    var = simulate.var
+    from src import users
+
+    server = sim.server
+    nicks = []
+    for i in range(args.users):
+        nick = "user{0}".format(i)
+        # half of them are only known by their hostmask
+        server.add_user(nick, "ident", "host/{0}".format(i), nick if i % 2 else None)
+        server.join(nick, sim.channel)
+        nicks.append(nick)
+    sim.cli.pump()
+
+    for nick in random.sample(nicks, args.users // 100):
+        if nick[-1] in "13579":
+            var.FLAGS_ACCS[nick] = "D"
+        else:
+            var.FLAGS[users._get(nick).lower().rawnick] = "D"
+    for nick in random.sample(nicks, args.users // 100):
+        if nick[-1] in "13579":
+            var.DENY_ACCS[nick].add("ping")
+        else:
+            var.DENY[users._get(nick).lower().rawnick].add("ping")
+
+    messages = random.choices(("{0}ping".format(botconfig.CMD_CHAR), "{0}fperf".format(botconfig.CMD_CHAR), "hello there"),
+                              (80, 15, 5), k=args.commands)
+    senders = [random.choice(nicks) for _ in range(args.commands)]
+
+    # admin commands are logged to the console
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for nick, text in zip(senders, messages):
+            server.privmsg(nick, sim.channel, text)
+            sim.cli.pump()
+        dispatched = time.perf_counter() - start
+
+    def check(nick):
+        user = users._get(server.rawnick(nick))
+        temp = user.lower()
+        var.DENY.get(temp.rawnick, ())
+        var.DENY_ACCS.get(temp.account, ())
+        var.FLAGS.get(temp.rawnick, "") + var.FLAGS_ACCS.get(temp.account, "")
+    checked = bench.per_call(check, senders)
+
+    print("{0} commands from {1} users".format(args.commands, args.users))
+    bench.print_table(("", "seconds", "us/command"), (
+        ("dispatched", "{0:.2f}".format(dispatched), "{0:.1f}".format(dispatched / args.commands * 1e6)),
+        ("lookup and checks", "{0:.2f}".format(checked * args.commands), "{0:.1f}".format(checked * 1e6)),
+    ))
+    print("Messages sent by the bot: {0}".format(dict(server.messages)))
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -0,0 +1,88 @@
+"""Stress the back-reference bookkeeping of the User containers.
+
+This makes --users users and --containers containers (half UserSets, a
+quarter UserDicts and a quarter UserLists), puts every user in every
+container, then times removing them from the dicts, swapping users out
+for new ones as a nick change does, and clearing everything. Swapping has
+to look for the user in every list it is in, so it is timed again once
+the lists are empty.
+
+    python3 -m bench.containers --users 10000 --containers 200
+
+"""
+
+import argparse
+import random
+import time
+
+import bench
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the back-reference bookkeeping of the User containers.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--containers", type=int, default=200)
+    parser.add_argument("--swaps", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    from src import users
+    from src.containers import UserList, UserSet, UserDict
+
+    everyone = [users._add(None, nick="user{0}!ident@host{0}".format(i)) for i in range(args.users)]
+    sets = [UserSet() for _ in range(args.containers // 2)]
+    dicts = [UserDict() for _ in range(args.containers // 4)]
+    lists = [UserList() for _ in range(args.containers - len(sets) - len(dicts))]
+    timings = []
+
+    start = time.perf_counter()
+    for container in sets:
+        for user in everyone:
+            container.add(user)
+    for container in dicts:
+        # every value is shared by many keys, as with per-role dicts of targets
+        for user in everyone:
+            container[user] = everyone[0]
+    for container in lists:
+        for user in everyone:
+            container.append(user)
+    timings.append(("fill", time.perf_counter() - start, args.users * args.containers))
+
+    start = time.perf_counter()
+    for container in dicts:
+        for user in everyone[1:]:
+            del container[user]
+    timings.append(("remove from dicts", time.perf_counter() - start, (args.users - 1) * len(dicts)))
+
+    picks = random.sample(range(1, args.users), args.swaps * 2)
+    start = time.perf_counter()
+    for i in picks[:args.swaps]:
+        new = users._add(None, nick="new{0}!ident@newhost{0}".format(i))
+        everyone[i].swap(new)
+        everyone[i] = new
+    timings.append(("swap", time.perf_counter() - start, args.swaps))
+
+    # a user's position in a list isn't tracked, so swapping has to look for it in every list
+    for container in lists:
+        container.clear()
+    start = time.perf_counter()
+    for i in picks[args.swaps:]:
+        new = users._add(None, nick="new{0}!ident@newhost{0}".format(i))
+        everyone[i].swap(new)
+        everyone[i] = new
+    timings.append(("swap, no lists", time.perf_counter() - start, args.swaps))
+
+    start = time.perf_counter()
+    for container in sets + dicts + lists:
+        container.clear()
+    timings.append(("clear", time.perf_counter() - start, args.containers))
+
+    print("{0} users in {1} containers".format(args.users, args.containers))
+    bench.print_table(("", "seconds", "us each"), [
+        (name, "{0:.3f}".format(elapsed), "{0:.2f}".format(elapsed / count * 1e6)) for name, elapsed, count in timings])
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -0,0 +1,89 @@
+"""Time storing finished games in the database.
+
+This hands --games games of --players players each to db.add_game(), which
+is what the game thread waits on at the end of a game, and then waits for
+the background writer to commit them. For comparison, the same amount of
+games is then written one transaction per game on the calling thread.
+
+    python3 -m bench.gamewriter --games 500 --players 16
+
+"""
+
+import argparse
+import random
+import time
+
+import bench
+
+ROLES = ("villager", "seer", "wolf", "harlot", "cursed villager", "gunner", "traitor", "detective")
+
+def make_players(count, pool):
+    players = []
+    for i in random.sample(range(pool), count):
+        role = random.choice(ROLES)
+        players.append({"version": 2, "nick": "player{0}".format(i), "account": "account{0}".format(i) if i % 2 else "*",
+                        "ident": "ident{0}".format(i), "host": "host{0}.example".format(i), "mainrole": role,
+                        "allroles": {role}, "special": ["lover"] if random.random() < 0.1 else [],
+                        "won": random.random() < 0.5, "iwon": False, "dced": False})
+    return players
+
+def main():
+    parser = argparse.ArgumentParser(description="Time storing finished games in the database.")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--players", type=int, default=16, help="players per game")
+    parser.add_argument("--pool", type=int, default=2000, help="distinct people the players are picked from")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    from src import db
+
+    started = 1000000000
+    def game():
+        nonlocal started
+        started += 1000
+        return ("default", args.players, started, started + 900, random.choice(("villagers", "wolves")),
+                make_players(args.players, args.pool), {"role reveal": "on", "stats": "default"})
+
+    games = [game() for _ in range(args.games)]
+    calls = []
+    start = time.perf_counter()
+    for record in games:
+        call = time.perf_counter()
+        db.add_game(*record)
+        calls.append(time.perf_counter() - call)
+    queued = time.perf_counter() - start
+    db.flush_games()
+    flushed = time.perf_counter() - start
+    stats = db.get_game_writer_stats()
+
+    # the writer takes the same records it would get from the queue, one per transaction
+    records = []
+    for mode, size, started_at, finished, winner, players, options in (game() for _ in range(args.games)):
+        for p in players:
+            p["allroles"] = list(p["allroles"])
+        records.append({"mode": mode, "size": size, "started": started_at, "finished": finished,
+                        "winner": winner, "options": options, "players": players})
+    start = time.perf_counter()
+    for record in records:
+        db._write_games([record])
+    single = time.perf_counter() - start
+
+    calls.sort()
+    print("{0} games of {1} players".format(args.games, args.players))
+    bench.print_table(("", "seconds"), (
+        ("add_game() mean", "{0:.6f}".format(sum(calls) / len(calls))),
+        ("add_game() p99", "{0:.6f}".format(calls[int(len(calls) * 0.99)])),
+        ("add_game() max", "{0:.6f}".format(calls[-1])),
+        ("all queued", "{0:.3f}".format(queued)),
+        ("all committed", "{0:.3f}".format(flushed)),
+        ("one per transaction", "{0:.3f}".format(single)),
+    ))
+    print("Writer: {written} games in {batches} batches, {total_latency:.3f}s writing, "
+          "longest batch {max_latency:.3f}s".format(**stats))
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -0,0 +1,109 @@
+"""Replay a server log through the line framing and the parser.
+
+The log is sent through a local socket pair and read into LineBuffer, and
+each line is parsed with parse_irc_line(), as the client does for every
+line it receives. For comparison, this also times framing the same data
+the way the client used to, by appending each 1k read to a bytes object
+and splitting it.
+
+Give a captured log of raw lines with --log; otherwise a log of --lines
+lines is made up, mixing channel messages, joins, parts and quits, WHO and
+NAMES replies, and lines with IRCv3 message tags.
+
+    python3 -m bench.parse --lines 100000
+
+"""
+
+import argparse
+import random
+import socket
+import threading
+import time
+
+import bench
+
+def make_log(count):
+    nicks = ["nick{0}".format(i) for i in range(2000)]
+    def rawnick():
+        nick = random.choice(nicks)
+        return "{0}!~{0}@user/{0}".format(nick)
+    kinds = (
+        (50, lambda: ":{0} PRIVMSG #channel :{1}".format(rawnick(), "some words here " * random.randint(1, 8))),
+        (15, lambda: "@account={0};time=2019-01-01T00:00:00.000Z :{1} PRIVMSG #channel :tagged \\s message".format(random.choice(nicks), rawnick())),
+        (10, lambda: ":{0} JOIN #channel {1} :realname".format(rawnick(), random.choice(nicks))),
+        (5, lambda: ":{0} PART #channel :leaving".format(rawnick())),
+        (5, lambda: ":{0} QUIT :Quit: bye".format(rawnick())),
+        (10, lambda: ":server.example 354 bot 0 #channel ~{0} user/{0} server.example {0} H {0} 0 :realname".format(random.choice(nicks))),
+        (5, lambda: ":server.example 353 bot = #channel :{0}".format(" ".join(random.sample(nicks, 40)))),
+    )
+    weights = [weight for weight, kind in kinds]
+    makers = [kind for weight, kind in kinds]
+    return "".join(maker() + "\r\n" for maker in random.choices(makers, weights, k=count)).encode("utf-8")
+
+def feed(data):
+    """Return a socket from which data can be read, as sent by another thread."""
+    reader, writer = socket.socketpair()
+    def send():
+        with writer:
+            writer.sendall(data)
+    threading.Thread(target=send, daemon=True).start()
+    return reader
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a server log through the line framing and the parser.")
+    parser.add_argument("--log", default=None, help="file with raw lines received from a server")
+    parser.add_argument("--lines", type=int, default=100000, help="lines to make up if no log is given")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    from oyoyo.client import LineBuffer
+    from oyoyo.parse import parse_irc_line
+
+    if args.log is not None:
+        with open(args.log, "rb") as f:
+            data = f.read()
+    else:
+        data = make_log(args.lines)
+
+    sock = feed(data)
+    buffer = LineBuffer()
+    lines = []
+    start = time.perf_counter()
+    while buffer.recv_from(sock):
+        lines.extend(buffer.lines())
+    framed = time.perf_counter() - start
+    sock.close()
+
+    start = time.perf_counter()
+    for line in lines:
+        parse_irc_line(line)
+    parsed = time.perf_counter() - start
+
+    sock = feed(data)
+    old = []
+    start = time.perf_counter()
+    pending = bytes()
+    while True:
+        read = sock.recv(1024)
+        if not read:
+            break
+        pending += read
+        split = pending.split(b"\n")
+        pending = split.pop()
+        old.extend(split)
+    old_framed = time.perf_counter() - start
+    sock.close()
+
+    count = len(lines)
+    print("{0} lines, {1:.1f} MiB".format(count, len(data) / 2**20))
+    bench.print_table(("", "seconds", "lines/s", "us/line"), [
+        (name, "{0:.3f}".format(elapsed), "{0:.0f}".format(count / elapsed), "{0:.2f}".format(elapsed / count * 1e6))
+        for name, elapsed in (("LineBuffer", framed), ("parse_irc_line", parsed), ("both", framed + parsed),
+                              ("bytes += recv(1024)", old_framed))])
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -0,0 +1,90 @@
+"""Time finding who to ping during the join phase.
+
+This boots the bot against simulate.py's FakeServer and joins --subscribers
+users to the channel, each with a !pingif preference between 2 and 24
+players. A few of them have an unacknowledged warning, and some are away.
+After four players join a game, this times pingif.get_pingers() and a
+whole run of the join timer, and counts the database queries and WHO
+requests the join timer made.
+
+    python3 -m bench.pingif --subscribers 5000
+
+"""
+
+import argparse
+import random
+import time
+import types
+
+import bench
+
+def main():
+    parser = argparse.ArgumentParser(description="Time finding who to ping during the join phase.")
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    import simulate
+    simulate.load_bot()
+    sim = simulate.Simulation(types.SimpleNamespace(max_players=4, players=0, max_phases=10, max_wait=100, verbose=False))
+    var = simulate.var
+    from src import db, pingif, users, wolfgame
+
+    server = sim.server
+    nicks = ["sub{0}".format(i) for i in range(args.subscribers)]
+    for i, nick in enumerate(nicks):
+        # half of them are only known by their hostmask
+        server.add_user(nick, "ident", "host/{0}".format(i), nick if i % 2 else None)
+        server.join(nick, sim.channel)
+    sim.cli.pump()
+
+    for nick in nicks:
+        user = users._get(server.rawnick(nick))
+        user.set_pingif_count(random.randint(2, 24))
+        if random.random() < 0.02:
+            db.add_warning(user.account, None if user.account else user.rawnick, None, None, 1, "bench", None, None)
+        if random.random() < 0.1:
+            server.send("AWAY :gone", prefix=server.rawnick(nick))
+    sim.cli.pump()
+
+    for nick in sim.players:
+        sim.command(nick, "join")
+    count = len(sim.players)
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        found = pingif.get_pingers(count)
+    pingers = (time.perf_counter() - start) / args.runs
+
+    queries = 0
+    def on_query(statement):
+        nonlocal queries
+        queries += 1
+    db._conn().set_trace_callback(on_query)
+    whos = server.received["who"]
+    elapsed = 0
+    for _ in range(args.runs):
+        # everyone is pinged again on every run
+        var.PINGED_ALREADY.clear()
+        var.PINGED_ALREADY_ACCS.clear()
+        start = time.perf_counter()
+        wolfgame.join_timer_handler(var)
+        elapsed += time.perf_counter() - start
+        sim.cli.pump()
+    db._conn().set_trace_callback(None)
+
+    print("{0} subscribers, {1} of them wanting a ping at {2} players".format(args.subscribers, len(found), count))
+    bench.print_table(("", "ms"), (
+        ("get_pingers()", "{0:.3f}".format(pingers * 1000)),
+        ("join timer", "{0:.3f}".format(elapsed / args.runs * 1000)),
+    ))
+    print("Join timer: {0} database queries and {1} WHO requests in {2} runs".format(
+        queries, server.received["who"] - whos, args.runs))
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -0,0 +1,61 @@
+"""Time user registry lookups as the registry grows.
+
+Users are added in steps up to --max-users; after each step, this times
+looking up users by full hostmask, by nick alone and by account, next to
+the full scan over the registry that lookups used to do.
+
+    python3 -m bench.registry --max-users 50000
+
+"""
+
+import argparse
+import random
+
+import bench
+
+SIZES = (100, 1000, 5000, 10000, 50000)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time user registry lookups as the registry grows.")
+    parser.add_argument("--max-users", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups to time of each kind")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bench.setup()
+    random.seed(args.seed)
+    from src import users
+
+    def rawnick(i):
+        return "Nick{0}!ident{0}@host{0}.example".format(i)
+
+    def scan(i):
+        # what _get did before the index: compare against a copy of every user
+        temp = users.User(None, "Nick{0}".format(i), "ident{0}".format(i), "host{0}.example".format(i), None, None)
+        return [user for user in set(users._users) if user == temp]
+
+    rows = []
+    count = 0
+    for size in SIZES + (args.max_users,):
+        if size > args.max_users or size <= count:
+            continue
+        for i in range(count, size):
+            users._add(None, nick=rawnick(i), account="account{0}".format(i))
+        count = size
+
+        picks = [random.randrange(count) for _ in range(args.lookups)]
+        full = bench.per_call(lambda i: users._get(rawnick(i)), picks)
+        nick = bench.per_call(lambda i: users._get("Nick{0}".format(i)), picks)
+        account = bench.per_call(lambda i: users._get(account="account{0}".format(i)), picks)
+        # the scan gets slow quickly, so only time a few of them
+        scanned = bench.per_call(scan, picks[:max(10, args.lookups * 100 // count)])
+        rows.append((count, "{0:.1f}".format(full * 1e6), "{0:.1f}".format(nick * 1e6),
+                     "{0:.1f}".format(account * 1e6), "{0:.1f}".format(scanned * 1e6)))
+
+    print("Lookup latency in microseconds")
+    bench.print_table(("users", "hostmask", "nick", "account", "full scan"), rows)
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
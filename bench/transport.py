@@ -0,0 +1,132 @@
+"""Measure the IRC client against a local fake server.
+
+A server thread listens on localhost and, once the client has registered,
+sends it --lines lines at once; this reports how many lines per second the
+client handled. The client then sends --sends lines from another thread,
+and the server notes when each one arrives, to show how closely the
+outbound pacing follows the token bucket and how long send() blocked the
+sending thread. Both transports are measured, unless --reactor or
+--blocking is given.
+
+    python3 -m bench.transport --lines 100000 --sends 40
+
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+import bench
+
+class FakeServer:
+    """Just enough of an IRC server to flood the client and time its replies."""
+
+    def __init__(self, lines, sends):
+        self.lines = lines
+        self.sends = sends
+        self.arrivals = []
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        conn, addr = self.listener.accept()
+        self.listener.close()
+        with conn:
+            buf = b""
+            while b"USER " not in buf:
+                buf += conn.recv(4096)
+            conn.sendall(b"".join(b":nick%d!ident@host.example PRIVMSG #channel :message number %d\r\n" % (i % 500, i)
+                                  for i in range(self.lines)))
+            buf = b""
+            while len(self.arrivals) < self.sends:
+                data = conn.recv(4096)
+                if not data:
+                    return
+                buf += data
+                *lines, buf = buf.split(b"\r\n")
+                now = time.perf_counter()
+                self.arrivals.extend(now for line in lines if line.startswith(b"PRIVMSG #out "))
+
+def run(reactor, args):
+    from oyoyo.client import IRCClient, OutboundQueue, TokenBucket
+
+    server = FakeServer(args.lines, args.sends)
+    received = 0
+    inbound = [None, None]
+    outbound = {"start": None, "blocked": []}
+
+    def sender(cli):
+        # let the bucket fill up after registering, so that the ideal times are known
+        time.sleep(args.burst * args.delay + 0.1)
+        outbound["start"] = time.perf_counter()
+        for i in range(args.sends):
+            start = time.perf_counter()
+            cli.send("PRIVMSG #out :line {0}".format(i))
+            outbound["blocked"].append(time.perf_counter() - start)
+
+    def on_privmsg(cli, prefix, target, text):
+        nonlocal received
+        received += 1
+        if received == 1:
+            inbound[0] = time.perf_counter()
+        if received == args.lines:
+            inbound[1] = time.perf_counter()
+            threading.Thread(target=sender, args=(cli,), daemon=True).start()
+
+    cli = IRCClient({"privmsg": on_privmsg, "": lambda *args: None}, host="127.0.0.1", port=server.port,
+                    nickname="bench", ident="bench", tokenbucket=TokenBucket(args.burst, args.delay),
+                    reactor=reactor, stream_handler=lambda *args, **kwargs: None)
+    for _ in cli.connect():
+        if len(server.arrivals) >= args.sends or not server.thread.is_alive():
+            cli._end = 1
+
+    # a full bucket lets `burst` lines through at once, then one line per `delay` seconds;
+    # the reactor keeps some tokens back from the interactive lane for more urgent lines
+    burst = args.burst
+    if reactor:
+        burst -= OutboundQueue()._reserve("interactive", cli.tokenbucket)
+    late = [arrival - (outbound["start"] + max(0, i + 1 - burst) * args.delay)
+            for i, arrival in enumerate(server.arrivals)]
+    return {"lines_per_second": args.lines / (inbound[1] - inbound[0]),
+            "mean_late": sum(late) / len(late),
+            "max_late": max(late),
+            "max_early": max(0, -min(late)),
+            "max_blocked": max(outbound["blocked"]),
+            "total_blocked": sum(outbound["blocked"])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the IRC client against a local fake server.")
+    parser.add_argument("--lines", type=int, default=100000, help="lines the server sends to the client")
+    parser.add_argument("--sends", type=int, default=40, help="lines the client sends to the server")
+    parser.add_argument("--burst", type=int, default=10, help="token bucket size")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between tokens")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--reactor", action="store_true", help="only measure the reactor transport")
+    group.add_argument("--blocking", action="store_true", help="only measure the blocking transport")
+    args = parser.parse_args()
+
+    bench.setup()
+    modes = [("reactor", True), ("blocking", False)]
+    if args.reactor:
+        modes = modes[:1]
+    elif args.blocking:
+        modes = modes[1:]
+
+    rows = []
+    for name, reactor in modes:
+        r = run(reactor, args)
+        rows.append((name, "{0:.0f}".format(r["lines_per_second"]),
+                     "{0:.1f}".format(r["mean_late"] * 1000), "{0:.1f}".format(r["max_late"] * 1000),
+                     "{0:.1f}".format(r["max_early"] * 1000), "{0:.1f}".format(r["max_blocked"] * 1000),
+                     "{0:.1f}".format(r["total_blocked"] * 1000)))
+
+    print("Inbound lines per second, and outbound lines compared to the token bucket (in ms)")
+    bench.print_table(("transport", "lines/s", "mean late", "max late", "max early", "longest send()", "total in send()"), rows)
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -16,6 +16,7 @@
 # THE SOFTWARE.
 
 import socket
+import selectors
 import ssl
 import sys
 import threading
@@ -24,8 +25,9 @@ import traceback
 import os
 import hashlib
 import hmac
+from collections import deque
 
-from oyoyo.parse import parse_raw_irc_command
+from oyoyo.parse import parse_irc_line
 
 
 # Adapted from http://code.activestate.com/recipes/511490-implementation-of-the-token-bucket-algorithm/
@@ -63,9 +65,184 @@ class TokenBucket(object):
         self.timestamp = now
         return self._tokens
 
+    def wait_time(self, tokens=1):
+        """Return how many seconds it will take until the given
+        amount of tokens can be consumed."""
+        return max(0.0, (tokens - self.tokens) * self.fill_rate)
+
     def __repr__(self):
         return "{self.__class__.__name__}(capacity={self.capacity}, fill rate={self.fill_rate}, tokens={self.tokens})".format(self=self)
 
+# Outbound lanes, from most to least urgent
+LANES = ("protocol", "game", "interactive", "bulk")
+
+# Commands which keep the connection itself going, and which always go out first
+_PROTOCOL_COMMANDS = {b"PONG", b"PING", b"NICK", b"MODE", b"CAP", b"AUTHENTICATE", b"PASS", b"USER"}
+_BULK_COMMANDS = {b"WHO"}
+# Commands which end the connection, and which are held back until everything else has been sent
+_FINAL_COMMANDS = {b"QUIT"}
+
+class OutboundQueue:
+    """Queue of lines waiting for the token bucket, split into lanes.
+
+    Lanes are served in order of urgency, but each lane may only take a
+    token if at least `reserve` tokens are left afterwards, so that a burst
+    of less urgent lines always leaves room for more urgent ones. A line
+    which has been waiting longer than its lane's `max_wait` seconds jumps
+    ahead of every lane except "protocol", and ignores the reservation.
+
+    Final lines (such as QUIT) are held back until every lane is empty,
+    so that nothing queued before them is lost when the server closes
+    the connection.
+    """
+
+    reserve = {"protocol": 0, "game": 1, "interactive": 3, "bulk": 6}
+    max_wait = {"protocol": None, "game": 10, "interactive": 30, "bulk": 60}
+
+    # upper bounds (in seconds) of the wait time histogram buckets; the last bucket is for longer waits
+    wait_buckets = (0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lanes = {lane: deque() for lane in LANES}
+        self._sent = dict.fromkeys(LANES, 0)
+        self._waits = {lane: [0] * (len(self.wait_buckets) + 1) for lane in LANES}
+        self._max_waits = dict.fromkeys(LANES, 0.0)
+        self._final = deque()
+
+    def __len__(self):
+        return sum(len(lines) for lines in self._lanes.values()) + len(self._final)
+
+    def push(self, line, lane):
+        self._lanes[lane].append((time.monotonic(), line))
+
+    def push_final(self, line):
+        """Queue a line to be sent only once every lane has been drained."""
+        self._final.append(line)
+
+    def _drained(self):
+        return not any(self._lanes.values())
+
+    def _order(self, now, bucket):
+        """Yield (lane, reserve) in the order in which the lanes should be served."""
+        starved = []
+        for lane in LANES[1:]:
+            lines = self._lanes[lane]
+            if lines and now - lines[0][0] > self.max_wait[lane]:
+                starved.append((lines[0][0], lane))
+        yield "protocol", 0
+        for queued, lane in sorted(starved):
+            yield lane, 0
+        for lane in LANES[1:]:
+            yield lane, self._reserve(lane, bucket)
+
+    def _reserve(self, lane, bucket):
+        # a small bucket can't hold the full reservation
+        return min(self.reserve[lane], bucket.capacity - 1)
+
+    def pop(self, bucket):
+        """Return the next line to send, consuming a token for it, or None
+        if no line may be sent yet."""
+        now = time.monotonic()
+        tokens = bucket.tokens
+        for lane, reserve in self._order(now, bucket):
+            lines = self._lanes[lane]
+            if not lines:
+                continue
+            if tokens < reserve + 1:
+                # less urgent lanes have larger reserves, but starved lanes may still follow
+                continue
+            bucket.consume(1)
+            queued, line = lines.popleft()
+            self._record(lane, now - queued)
+            return line
+        if self._final and self._drained() and bucket.consume(1):
+            return self._final.popleft()
+        return None
+
+    def timeout(self, bucket):
+        """Return how long to wait until pop() may return something,
+        or None if there is nothing queued."""
+        now = time.monotonic()
+        timeout = None
+        for lane in LANES:
+            lines = self._lanes[lane]
+            if not lines:
+                continue
+            wait = bucket.wait_time(self._reserve(lane, bucket) + 1)
+            if self.max_wait[lane] is not None:
+                wait = min(wait, max(lines[0][0] + self.max_wait[lane] - now, bucket.wait_time(1)))
+            if timeout is None or wait < timeout:
+                timeout = wait
+        if timeout is None and self._final:
+            timeout = bucket.wait_time(1)
+        return timeout
+
+    def _record(self, lane, wait):
+        self._sent[lane] += 1
+        self._max_waits[lane] = max(self._max_waits[lane], wait)
+        for i, bound in enumerate(self.wait_buckets):
+            if wait <= bound:
+                break
+        else:
+            i = len(self.wait_buckets)
+        self._waits[lane][i] += 1
+
+    def stats(self):
+        """Return a dict of lane name to a dict with the amount of lines
+        queued and sent, the longest wait and the wait time histogram.
+        The histogram is a list of (upper bound, count), with an upper
+        bound of None for the waits longer than every bucket."""
+        bounds = self.wait_buckets + (None,)
+        return {lane: {"queued": len(self._lanes[lane]),
+                       "sent": self._sent[lane],
+                       "max_wait": self._max_waits[lane],
+                       "histogram": list(zip(bounds, self._waits[lane]))}
+                for lane in LANES}
+
+class LineBuffer:
+    """Receive buffer which splits incoming data into lines.
+
+    Data is read straight into a preallocated bytearray, and the complete
+    lines are copied out together and split in one go; the unconsumed tail
+    is only moved back to the start when the buffer runs out of room.
+    """
+
+    def __init__(self, size=65536, min_read=4096):
+        self._buf = bytearray(size)
+        self._start = 0 # start of the first line not yet returned
+        self._end = 0 # end of the received data
+        self._min_read = min_read
+
+    def recv_from(self, sock):
+        """Read from the socket into the buffer. Returns the number of
+        bytes read, which is 0 if the connection was closed."""
+        if len(self._buf) - self._end < self._min_read:
+            if self._start:
+                size = self._end - self._start
+                self._buf[:size] = self._buf[self._start:self._end]
+                self._start = 0
+                self._end = size
+            if len(self._buf) - self._end < self._min_read:
+                # a single line longer than the buffer; only happens with broken servers
+                self._buf.extend(bytes(len(self._buf)))
+        with memoryview(self._buf) as view, view[self._end:] as free:
+            read = sock.recv_into(free)
+        self._end += read
+        return read
+
+    def lines(self):
+        """Return a list of every complete line received so far, without the LF."""
+        end = self._buf.rfind(b"\n", self._start, self._end)
+        if end < 0:
+            return []
+        with memoryview(self._buf) as view, view[self._start:end] as complete:
+            # splitting all of them at once is much cheaper than finding them one by one
+            lines = bytes(complete).split(b"\n")
+        self._start = end + 1
+        if self._start == self._end:
+            self._start = self._end = 0
+        return lines
+
 class IRCClient:
     """ IRC Client class. This handles one connection to a server.
     This can be used either with or without IRCApp ( see connect() docs )
@@ -88,6 +265,17 @@ class IRCClient:
         Warning: By default this class will not block on socket operations, this
         means if you use a plain while loop your app will consume 100% cpu.
         To enable blocking pass blocking=True.
+
+        Pass reactor=True to have a single thread own the socket: send()
+        then only queues the message and returns immediately, and the
+        connect() loop writes queued messages out as the token bucket
+        allows while waiting for incoming data. Queued messages are
+        prioritized by lane (see OutboundQueue).
+
+        A scheduler (an object with timeout() and run_due() methods, and a
+        wakeup attribute) can be given to have its timers run from the
+        reactor loop; without the reactor, its start() method is called to
+        run them from a thread instead.
         """
 
         self.socket = None
@@ -109,6 +297,8 @@ class IRCClient:
         self.client_keyfile = None
         self.cipher_list = None
         self.server_pass = None
+        self.reactor = False
+        self.scheduler = None
         self.lock = threading.RLock()
         self.stream_handler = lambda output, level=None: print(output)
 
@@ -117,6 +307,10 @@ class IRCClient:
         self.__dict__.update(kwargs)
         self.command_handler = cmd_handler
         self._end = 0
+        self._outbound = OutboundQueue()
+        self._waker = None
+        # IRCv3 message tags of the line currently being handled
+        self.tags = {}
 
     def __enter__(self):
         return self
@@ -137,31 +331,75 @@ class IRCClient:
         In python 3, all args must be of type str or bytes, *BUT* if they are
           str they will be converted to bytes with the encoding specified by the
           'encoding' keyword argument (default 'utf8').
+
+        With the reactor, the 'lane' keyword argument (one of LANES) says how
+          urgent the message is; by default, this is decided by the command.
+          QUIT is always sent last, after everything queued before it.
         """
-        with self.lock:
-            # Convert all args to bytes if not already
-            encoding = kwargs.get('encoding') or 'utf_8'
-            bargs = []
-            for i,arg in enumerate(args):
-                if isinstance(arg, str):
-                    bargs.append(bytes(arg, encoding))
-                elif isinstance(arg, bytes):
-                    bargs.append(arg)
-                elif arg is None:
-                    continue
+        # Convert all args to bytes if not already
+        encoding = kwargs.get('encoding') or 'utf_8'
+        bargs = []
+        for i,arg in enumerate(args):
+            if isinstance(arg, str):
+                bargs.append(bytes(arg, encoding))
+            elif isinstance(arg, bytes):
+                bargs.append(arg)
+            elif arg is None:
+                continue
+            else:
+                raise Exception(('Refusing to send arg at index {1} of the args from '+
+                                 'provided: {0}').format(repr([(type(arg), arg)
+                                                               for arg in args]), i))
+
+        msg = bytes(" ", "utf_8").join(bargs)
+        logmsg = kwargs.get("log") or str(msg)[1:]
+
+        if self.reactor:
+            # the reactor thread writes it out once the token bucket allows it
+            self.stream_handler('---> send {0}'.format(logmsg))
+            command = msg.split(b" ", 1)[0].upper()
+            if command in _FINAL_COMMANDS:
+                self._outbound.push_final(msg + bytes("\r\n", "utf_8"))
+                self._wake()
+                return
+            lane = kwargs.get("lane")
+            if lane is None:
+                if command in _PROTOCOL_COMMANDS:
+                    lane = "protocol"
+                elif command in _BULK_COMMANDS:
+                    lane = "bulk"
                 else:
-                    raise Exception(('Refusing to send arg at index {1} of the args from '+
-                                     'provided: {0}').format(repr([(type(arg), arg)
-                                                                   for arg in args]), i))
+                    lane = "interactive"
+            self._outbound.push(msg + bytes("\r\n", "utf_8"), lane)
+            self._wake()
+            return
 
-            msg = bytes(" ", "utf_8").join(bargs)
-            logmsg = kwargs.get("log") or str(msg)[1:]
+        with self.lock:
             self.stream_handler('---> send {0}'.format(logmsg))
 
             while not self.tokenbucket.consume(1):
                 time.sleep(0.3)
             self.socket.send(msg + bytes("\r\n", "utf_8"))
 
+    def send_delay(self, lines=0):
+        """ return how many seconds it will take until everything sent so far,
+        plus the given amount of additional lines, is written to the server """
+        return self.tokenbucket.wait_time(len(self._outbound) + lines)
+
+    def outbound_stats(self):
+        """ return the queue depth and wait times of each outbound lane,
+        see OutboundQueue.stats() """
+        return self._outbound.stats()
+
+    def _wake(self):
+        """Interrupt the reactor's wait so that it picks up new messages."""
+        if self._waker is not None:
+            try:
+                self._waker[1].send(b"\0")
+            except OSError:
+                # the pipe is full, so a wakeup is already pending
+                pass
+
     def connect(self):
         """ initiates the connection to the server set in self.host:self.port
         and returns a generator object.
@@ -252,6 +490,17 @@ class IRCClient:
             if not self.blocking:
                 self.socket.setblocking(0)
 
+            if self.reactor:
+                # lines are written as tokens come in, so don't let them wait for the previous one to be acknowledged
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._waker = socket.socketpair()
+                for sock in self._waker:
+                    sock.setblocking(False)
+                if self.scheduler is not None:
+                    self.scheduler.wakeup = self._wake
+            elif self.scheduler is not None:
+                self.scheduler.start()
+
             self.send("CAP LS 302")
 
             if (self.server_pass and "{password}" in self.server_pass
@@ -274,10 +523,14 @@ class IRCClient:
                     sys.stderr.write(traceback.format_exc())
                     raise e
 
-            buffer = bytes()
+            if self.reactor:
+                yield from self._run_reactor()
+                return
+
+            buffer = LineBuffer()
             while not self._end:
                 try:
-                    buffer += self.socket.recv(1024)
+                    buffer.recv_from(self.socket)
                 except socket.error as e:
                     if False and not self.blocking and e.errno == 11:
                         pass
@@ -285,39 +538,105 @@ class IRCClient:
                         sys.stderr.write(traceback.format_exc())
                         raise e
                 else:
-                    data = buffer.split(bytes("\n", "utf_8"))
-                    buffer = data.pop()
-
-                    for el in data:
-                        prefix, command, args = parse_raw_irc_command(el)
-
-                        try:
-                            enc = "utf8"
-                            fargs = [arg.decode(enc) for arg in args if isinstance(arg,bytes)]
-                        except UnicodeDecodeError:
-                            enc = "latin1"
-                            fargs = [arg.decode(enc) for arg in args if isinstance(arg,bytes)]
-
-                        try:
-                            largs = list(args)
-                            if prefix is not None:
-                                prefix = prefix.decode(enc)
-                            self.stream_handler("<--- receive {0} {1} ({2})".format(prefix, command, ", ".join(fargs)), level="debug")
-                            # for i,arg in enumerate(largs):
-                                # if arg is not None: largs[i] = arg.decode(enc)
-                            if command in self.command_handler:
-                                self.command_handler[command](self, prefix,*fargs)
-                            elif "" in self.command_handler:
-                                self.command_handler[""](self, prefix, command, *fargs)
-                        except Exception as e:
-                            sys.stderr.write(traceback.format_exc())
-                            raise e  # ?
+                    for el in buffer.lines():
+                        self._process_line(el)
                 yield True
         finally:
             if self.socket:
                 self.stream_handler('closing socket')
                 self.socket.close()
                 yield False
+            if self._waker is not None:
+                for sock in self._waker:
+                    sock.close()
+                self._waker = None
+
+    def _run_reactor(self):
+        """Drive the connection until it is closed or _end is set.
+
+        Reads are done in large chunks whenever the socket is readable, and
+        queued messages are written out as tokens become available, waiting
+        for the next token in select() rather than sleeping.
+        """
+        sel = selectors.DefaultSelector()
+        self.socket.setblocking(False)
+        sel.register(self.socket, selectors.EVENT_READ)
+        sel.register(self._waker[0], selectors.EVENT_READ)
+        buffer = LineBuffer()
+        pending = bytearray() # accepted from the queue but not yet taken by the socket
+        try:
+            while not self._end:
+                while True:
+                    line = self._outbound.pop(self.tokenbucket)
+                    if line is None:
+                        break
+                    pending += line
+                if pending:
+                    try:
+                        sent = self.socket.send(pending)
+                    except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                        sent = 0
+                    del pending[:sent]
+
+                timeout = self._outbound.timeout(self.tokenbucket)
+                if self.scheduler is not None:
+                    due = self.scheduler.timeout()
+                    if due is not None and (timeout is None or due < timeout):
+                        timeout = due
+                sel.modify(self.socket, selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0))
+
+                for key, mask in sel.select(timeout):
+                    if key.fileobj is self._waker[0]:
+                        try:
+                            self._waker[0].recv(4096)
+                        except BlockingIOError:
+                            pass
+                    elif mask & selectors.EVENT_READ:
+                        read = self._recv(buffer)
+                        if read is None:
+                            continue
+                        if not read:
+                            self.stream_handler("Connection closed by the server", level="warning")
+                            return
+                        for el in buffer.lines():
+                            self._process_line(el)
+                if self.scheduler is not None:
+                    self.scheduler.run_due()
+                yield True
+        finally:
+            sel.close()
+
+    def _recv(self, buffer):
+        """Read whatever is available from the socket into the buffer.
+        Returns the amount of bytes read, or None if nothing was available."""
+        try:
+            read = buffer.recv_from(self.socket)
+        except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return None
+        if isinstance(self.socket, ssl.SSLSocket):
+            # decrypted data left in the TLS buffer doesn't make the socket readable
+            while read and self.socket.pending():
+                read += buffer.recv_from(self.socket)
+        return read
+
+    def _process_line(self, el):
+        if not el.strip():
+            return
+        tags, prefix, command, args = parse_irc_line(el)
+
+        try:
+            self.stream_handler("<--- receive {0} {1} ({2})".format(prefix, command, ", ".join(args)), level="debug")
+            self.tags = tags
+            if command in self.command_handler:
+                self.command_handler[command](self, prefix, *args)
+            elif "" in self.command_handler:
+                self.command_handler[""](self, prefix, command, *args)
+        except Exception as e:
+            sys.stderr.write(traceback.format_exc())
+            raise e  # ?
+        finally:
+            self.tags = {}
+
     def msg(self, user, msg):
         for line in msg.split('\n'):
             maxchars = 494 - len(self.nickname+self.ident+self.hostmask+user)
@@ -18,14 +18,102 @@
 from oyoyo.ircevents import numeric_events
 
 
+# numeric replies keyed by the text the server sends
+_numeric_names = {num.decode("ascii"): name for num, name in numeric_events.items()}
+
+# command names seen so far, so that each line only costs a dict lookup
+_command_names = {}
+
+# what bytes.strip() removes; str.strip() would also eat non-ASCII whitespace
+_whitespace = " \t\n\r\x0b\x0c"
+
+# how escaped characters in IRCv3 tag values are written
+_tag_escapes = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
 # avoiding regex
+def parse_irc_line(line):
+    """
+    Parse one line received from the server, given as bytes with or
+    without the trailing CR LF, and return a tuple of
+    (tags, prefix, command, args).
+
+    The line is decoded once, as UTF-8 if possible and latin-1 otherwise,
+    so the prefix and arguments are str. IRCv3 message tags are returned
+    as a dict of tag name to unescaped value (None for tags without
+    a value), and prefix is None if the line has none. Command names are
+    lowercased, and numerics are replaced by their names (see ircevents).
+    """
+    try:
+        line = line.decode("utf_8")
+    except UnicodeDecodeError:
+        line = line.decode("latin_1")
+    return _tokenize(line.strip(_whitespace))
+
+def _tokenize(line):
+    tags = {}
+    if line.startswith("@"):
+        raw, _, line = line.partition(" ")
+        tags = parse_tags(raw[1:])
+
+    prefix = None
+    if line.startswith(":"):
+        prefix, _, line = line.partition(" ")
+        prefix = prefix[1:]
+
+    # the first " :" can only start the trailing argument, as other arguments may not begin with ":"
+    line, sep, trailing = line.partition(" :")
+    command, *args = line.split(" ")
+    if sep:
+        args.append(trailing)
+    elif args and args[0].startswith(":"):
+        # the trailing argument follows the command directly
+        args[0] = args[0][1:]
+
+    try:
+        command = _command_names[command]
+    except KeyError:
+        name = _numeric_names.get(command, command).lower()
+        if len(_command_names) < 1024:
+            _command_names[command] = name
+        command = name
+
+    return (tags, prefix, command, args)
+
+def parse_tags(raw):
+    """
+    Parse the IRCv3 message tags of a line (without the leading '@')
+    into a dict of tag name to unescaped value, or None for tags that
+    were sent without a value.
+    """
+    tags = {}
+    for tag in raw.split(";"):
+        if not tag:
+            continue
+        key, eq, value = tag.partition("=")
+        if not eq:
+            tags[key] = None
+            continue
+        if "\\" in value:
+            chars = []
+            it = iter(value)
+            for c in it:
+                if c == "\\":
+                    # an unknown escape is the character itself, a trailing backslash is dropped
+                    c = next(it, "")
+                    c = _tag_escapes.get(c, c)
+                chars.append(c)
+            value = "".join(chars)
+        tags[key] = value
+    return tags
+
 def parse_raw_irc_command(element):
     """
     This function parses a raw irc command and returns a tuple
     of (prefix, command, args).
     The following is a psuedo BNF of the input text:
 
-    <message>  ::= [':' <prefix> <SPACE> ] <command> <params> <crlf>
+    <message>  ::= ['@' <tags> <SPACE>] [':' <prefix> <SPACE> ] <command> <params> <crlf>
     <prefix>   ::= <servername> | <nick> [ '!' <user> ] [ '@' <host> ]
     <command>  ::= <letter> { <letter> } | <number> <number> <number>
     <SPACE>    ::= ' ' { ' ' }
@@ -37,34 +125,15 @@ def parse_raw_irc_command(element):
                      NUL or CR or LF>
 
     <crlf>     ::= CR LF
+
+    The prefix and args are returned as bytes, and message tags are
+    skipped; use parse_irc_line() to get decoded arguments and tags.
     """
-    parts = element.strip().split(bytes(" ", "utf_8"))
-    if parts[0].startswith(bytes(':', 'utf_8')):
-        prefix = parts[0][1:]
-        command = parts[1]
-        args = parts[2:]
-    else:
-        prefix = None
-        command = parts[0]
-        args = parts[1:]
-
-    if command.isdigit():
-        try:
-            command = numeric_events[command]
-        except KeyError:
-            pass
-    command = command.lower()
-    if isinstance(command, bytes): command = command.decode("utf_8")
-
-    if args[0].startswith(bytes(':', 'utf_8')):
-        args = [bytes(" ", "utf_8").join(args)[1:]]
-    else:
-        for idx, arg in enumerate(args):
-            if arg.startswith(bytes(':', 'utf_8')):
-                args = args[:idx] + [bytes(" ", 'utf_8').join(args[idx:])[1:]]
-                break
-
-    return (prefix, command, args)
+    # latin-1 maps every byte to one character, so this round-trips the raw bytes exactly
+    tags, prefix, command, args = _tokenize(element.decode("latin_1").strip(_whitespace))
+    if prefix is not None:
+        prefix = prefix.encode("latin_1")
+    return (prefix, command, [arg.encode("latin_1") for arg in args])
 
 
 def parse_nick(name):
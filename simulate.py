@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+
+"""Play games against an in-process IRC server, without any network.
+
+This boots the bot as wolfbot.py does, but the IRC client talks to a
+FakeServer living in the same process. Simulated players join the channel,
+join games and send random commands for their roles in every game mode,
+until the game ends by itself or hits the time limits; game timers run on a
+virtual clock, so nobody has to wait for them. At the end, this reports how
+many games per second were played, how long each phase took and how much
+memory was used at most, which makes it easy to spot a change which slows
+down role logic.
+
+    python3 simulate.py --games 1000 --seed 1
+
+The database and log files are written to a temporary directory, unless
+--workdir is given.
+
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+from collections import Counter, defaultdict, deque
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+import botconfig
+
+from oyoyo.client import IRCClient
+from oyoyo.parse import parse_irc_line
+
+SERVER = "sim.server"
+ADMIN = "simadmin"
+ADMIN_HOST = "simulation/admin"
+
+# commands players shouldn't use at random, as they take them out of the game
+SKIPPED_COMMANDS = frozenset({"quit", "leave"})
+# commands which undo what players did, or do nothing; they are picked less often
+RARE_COMMANDS = frozenset({"pass", "retract", "nolynch"})
+
+class FakeServer:
+    """Just enough of an IRC server for one bot and the simulated players.
+
+    Lines sent by the bot are handled by receive(); the lines the server
+    sends back are put in outbox, for the client to process in order.
+
+    """
+
+    def __init__(self, nick, ident, host):
+        self.bot = nick
+        self.users = {nick: (ident, host, None)} # nick -> (ident, host, account)
+        self.channels = defaultdict(dict) # channel -> {nick: status}
+        self.modes = defaultdict(lambda: set("nt")) # channel -> modes without an argument
+        self.outbox = deque()
+        self.received = Counter() # commands received from the bot
+        self.messages = Counter() # the bot's messages per kind of target
+        self.watched = {} # text -> times the bot sent it to a channel
+
+    def rawnick(self, nick):
+        ident, host, account = self.users[nick]
+        return "{0}!{1}@{2}".format(nick, ident, host)
+
+    def send(self, line, prefix=SERVER):
+        self.outbox.append(":{0} {1}".format(prefix, line).encode("utf-8"))
+
+    def numeric(self, num, *args):
+        self.send("{0} {1} {2}".format(num, self.bot, " ".join(args)))
+
+    def welcome(self, features):
+        self.numeric("001", ":Welcome to the simulation")
+        self.numeric("005", *features, ":are supported by this server")
+        self.numeric("376", ":End of /MOTD command.")
+
+    def add_user(self, nick, ident, host, account):
+        self.users[nick] = (ident, host, account)
+
+    def join(self, nick, channel, status=""):
+        self.channels[channel][nick] = status
+        # as with the extended-join capability
+        account = self.users[nick][2]
+        self.send("JOIN {0} {1} :{2}".format(channel, account or "*", nick), prefix=self.rawnick(nick))
+
+    def privmsg(self, nick, target, text):
+        self.send("PRIVMSG {0} :{1}".format(target, text), prefix=self.rawnick(nick))
+
+    def receive(self, line):
+        tags, prefix, command, args = parse_irc_line(line)
+        self.received[command] += 1
+        handler = getattr(self, "on_" + command, None)
+        if handler is not None:
+            handler(*args)
+
+    def on_join(self, channels, key=""):
+        for channel in channels.split(","):
+            self.join(self.bot, channel, "@")
+
+    def on_part(self, channels, message=""):
+        for channel in channels.split(","):
+            if self.channels[channel].pop(self.bot, None) is not None:
+                self.send("PART {0} :{1}".format(channel, message), prefix=self.rawnick(self.bot))
+
+    def on_kick(self, channel, nick, message=""):
+        if self.channels[channel].pop(nick, None) is not None:
+            self.send("KICK {0} {1} :{2}".format(channel, nick, message), prefix=self.rawnick(self.bot))
+
+    def on_nick(self, nick):
+        if nick != self.bot:
+            old = self.rawnick(self.bot)
+            self.users[nick] = self.users.pop(self.bot)
+            for members in self.channels.values():
+                if self.bot in members:
+                    members[nick] = members.pop(self.bot)
+            self.bot = nick
+            self.send("NICK :{0}".format(nick), prefix=old)
+
+    def on_mode(self, target, *changes):
+        if not changes:
+            self.numeric("324", target, "+" + "".join(sorted(self.modes[target])))
+        elif changes[0][0] not in "+-":
+            for mode in changes[0]:
+                if mode == "b":
+                    self.numeric("368", target, ":End of Channel Ban List")
+                elif mode == "q":
+                    self.numeric("729", target, "q", ":End of Channel Quiet List")
+        elif target in self.channels:
+            self.change_modes(target, changes[0], list(changes[1:]))
+
+    def change_modes(self, channel, modes, args):
+        """Tell everyone about the mode changes which change something."""
+        flags = self.modes[channel]
+        prefix = "+"
+        changed = []
+        targets = []
+        for mode in modes:
+            if mode in "+-":
+                prefix = mode
+            elif mode in "ovbqk" or (mode == "l" and prefix == "+"):
+                if args:
+                    changed.append(prefix + mode)
+                    targets.append(args.pop(0))
+            elif (prefix == "+") is not (mode in flags):
+                if prefix == "+":
+                    flags.add(mode)
+                else:
+                    flags.discard(mode)
+                changed.append(prefix + mode)
+        if changed:
+            self.send("MODE {0} {1}".format(channel, " ".join(["".join(changed)] + targets)), prefix=self.rawnick(self.bot))
+
+    def on_who(self, target, fields=None):
+        if target in self.channels:
+            members = self.channels[target].items()
+        else:
+            members = [(target, "")] if target in self.users else []
+        token = ""
+        if fields is not None:
+            token = fields.partition(",")[2]
+        for nick, status in members:
+            ident, host, account = self.users[nick]
+            if fields is None:
+                self.numeric("352", target, ident, host, SERVER, nick, "H" + status, ":0 " + nick)
+            else:
+                # an empty middle argument can't be sent
+                self.numeric("354", token or "0", target, ident, "127.0.0.1", host, SERVER, nick,
+                             "H" + status, "0", "0", account or "0", ":" + nick)
+        self.numeric("315", target, ":End of /WHO list.")
+
+    def on_ping(self, token=""):
+        self.send("PONG {0} :{1}".format(SERVER, token))
+
+    def on_privmsg(self, target, text):
+        if target.startswith("#"):
+            self.messages["channel"] += 1
+            if text in self.watched:
+                self.watched[text] += 1
+        else:
+            self.messages["private"] += 1
+
+    def on_notice(self, target, text):
+        self.messages["notice"] += 1
+
+class SimClient(IRCClient):
+    """IRC client which talks to a FakeServer instead of a socket."""
+
+    def __init__(self, cmd_handler, server, **kwargs):
+        super().__init__(cmd_handler, **kwargs)
+        self.server = server
+
+    def send(self, *args, **kwargs):
+        encoding = kwargs.get("encoding") or "utf_8"
+        line = b" ".join(arg if isinstance(arg, bytes) else arg.encode(encoding) for arg in args if arg is not None)
+        self.server.receive(line)
+
+    def send_delay(self, lines=0):
+        return 0
+
+    def pump(self):
+        """Handle every line the server sent, including replies to them."""
+        while self.server.outbox:
+            self._process_line(self.server.outbox.popleft())
+
+class Timings:
+    """Wall clock durations of something, in seconds."""
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    def summary(self):
+        values = sorted(self.values)
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+            "max": values[-1],
+        }
+
+def load_bot():
+    """Import the bot. This has to wait until main() has set things up,
+    as importing src reads the command line and opens the database."""
+    global var, users, channels, cats, decorators, get_players, get_all_roles, dispatch_role_prefix
+    import src.settings as var
+    from src import users, channels, cats, decorators
+    from src.functions import get_players, get_all_roles
+    from src.wolfgame import dispatch_role_prefix
+
+class Simulation:
+    def __init__(self, args):
+        from src import handler, scheduler
+        from src.messages import messages
+        from src.events import Event
+
+        self.args = args
+        self.clock = scheduler.VirtualClock()
+        # every timer the bot starts goes to the default scheduler
+        scheduler.default.clock = self.clock
+        self.scheduler = scheduler.default
+
+        self.server = FakeServer(botconfig.NICK, botconfig.IDENT, "simulation/bot")
+        self.server.watched[messages["error_log"]] = 0
+        self.cli = SimClient({"privmsg": lambda *s: None, "notice": lambda *s: None, "": handler.unhandled},
+                             self.server, nickname=botconfig.NICK, ident=botconfig.IDENT,
+                             hostmask="simulation/bot", real_name=botconfig.REALNAME,
+                             stream_handler=lambda output, level=None: None)
+
+        self.phases = defaultdict(Timings)
+        self.modes = Counter()
+        self.results = Counter()
+        self._phase = None
+        self._since = None
+        self._commands = {}
+        self._table = None
+
+        Event("init", {}).dispatch()
+        handler.connect_callback(self.cli)
+        self.server.welcome(["CHANTYPES=#", "PREFIX=(ov)@+", "CHANMODES=bq,k,l,imnpst", "MODES=4",
+                             "TARGMAX=PRIVMSG:4,NOTICE:4", "CASEMAPPING=rfc1459", "WHOX"])
+        self.cli.pump()
+
+        self.channel = channels.Main.name
+        self.players = []
+        self.server.add_user(ADMIN, "sim", ADMIN_HOST, ADMIN)
+        self.server.join(ADMIN, self.channel)
+        for i in range(1, args.max_players + 1):
+            nick = "player{0:02}".format(i)
+            self.server.add_user(nick, "sim", "simulation/player/{0}".format(i), nick)
+            self.server.join(nick, self.channel)
+            self.players.append(nick)
+        self.cli.pump()
+
+    def say(self, nick, target, text):
+        self.server.privmsg(nick, target, text)
+        self.cli.pump()
+        self._observe()
+
+    def command(self, nick, name, message="", *, private=False):
+        target = self.server.bot if private else self.channel
+        self.say(nick, target, "{0}{1} {2}".format(botconfig.CMD_CHAR, name, message).rstrip())
+
+    def _observe(self):
+        phase = (var.PHASE, getattr(var, "DAY_COUNT", 0), getattr(var, "NIGHT_COUNT", 0))
+        if phase != self._phase:
+            now = time.perf_counter()
+            if self._phase is not None and self._phase[0] != "none":
+                self.phases[self._phase[0]].add(now - self._since)
+            self._phase, self._since = phase, now
+
+    def pick_mode(self, index):
+        names = sorted(var.GAME_MODES.keys() - var.DISABLED_GAMEMODES)
+        name = names[index % len(names)]
+        cls, minp, maxp, likelihood = var.GAME_MODES[name]
+        if minp > self.args.max_players:
+            return None
+        size = self.args.players or random.randint(minp, min(maxp, self.args.max_players))
+        size = max(minp, min(maxp, self.args.max_players, size))
+        arg = name
+        if name == "roles":
+            arg = "roles=" + self._random_roles(size)
+        return name, arg, size
+
+    def _random_roles(self, size):
+        roles = sorted(set(cats.ROLES) - set(var.CURRENT_GAMEMODE.SECONDARY_ROLES) - var.DISABLED_ROLES - {"wolf", "villager"})
+        chosen = random.sample(roles, min(len(roles), random.randint(1, max(1, size // 2 - 1))))
+        return ",".join("{0}:1".format(role) for role in ["wolf"] + chosen)
+
+    def play(self, index):
+        picked = self.pick_mode(index)
+        if picked is None:
+            self.results["skipped"] += 1
+            return
+        name, arg, size = picked
+        players = self.players[:size]
+
+        self.command(players[0], "join")
+        self.command(ADMIN, "fgame", arg)
+        for nick in players[1:]:
+            self.command(nick, "join")
+        self.command(ADMIN, "fstart")
+
+        if var.PHASE not in var.GAME_PHASES:
+            # the mode couldn't be set up with this many players
+            self.results["not started"] += 1
+            if var.PHASE == "join":
+                self.command(ADMIN, "fstop")
+            return
+
+        self.modes[name] += 1
+        for step in range(self.args.max_phases):
+            if var.PHASE not in var.GAME_PHASES:
+                self.results["finished"] += 1
+                return
+            phase = self._phase
+            self._act(players)
+            if self._phase == phase and not self._wait(phase):
+                break
+
+        self.results["stalled"] += 1
+        self.command(ADMIN, "fstop")
+
+    def _available(self, user):
+        """Return the (name, command) pairs the user may use right now."""
+        table = decorators.get_dispatch_table(var.PHASE)
+        if table is not self._table:
+            self._table = table
+            self._commands.clear()
+        roles = frozenset(get_all_roles(user))
+        available = self._commands.get(roles)
+        if available is None:
+            available = []
+            seen = set()
+            for name, (fns, has_role_cmds) in table.items():
+                for fn in fns:
+                    if id(fn) in seen or fn.name in SKIPPED_COMMANDS or fn.flag or fn.owner_only:
+                        continue
+                    if not fn.playing and not fn.roles:
+                        continue
+                    if getattr(fn.func, "func", None) is dispatch_role_prefix:
+                        continue # "!seer see x" is the same as "!see x"
+                    if fn.roles and roles.isdisjoint(fn.roles):
+                        continue
+                    seen.add(id(fn))
+                    available.append((fn.name, fn))
+            available.sort(key=lambda x: x[0])
+            available = self._commands[roles] = tuple(available)
+        return available
+
+    def _act(self, players):
+        """Have every living player use a command or two at random."""
+        phase = self._phase
+        alive = [user.nick for user in get_players()]
+        if not alive:
+            return
+        # most people vote for the same person, so that days can end early
+        favourite = random.choice(alive)
+        random.shuffle(alive)
+        for nick in alive:
+            user = users._get(self.server.rawnick(nick), allow_none=True)
+            if user is None or user not in get_players():
+                continue
+            available = self._available(user)
+            if not available:
+                continue
+            weights = [0.1 if name in RARE_COMMANDS else 1 for name, fn in available]
+            for i in range(2 if random.random() < 0.25 else 1):
+                if self._phase != phase:
+                    return
+                name, fn = random.choices(available, weights)[0]
+                if name == "lynch" and random.random() < 0.8:
+                    message = favourite
+                else:
+                    message = self._arguments(alive)
+                self.command(nick, name, message, private=not fn.chan)
+
+    def _arguments(self, alive):
+        chance = random.random()
+        if chance < 0.7 or len(alive) < 2:
+            return random.choice(alive)
+        if chance < 0.9:
+            return " ".join(random.sample(alive, 2))
+        return "{0} {1}".format(random.choice(alive), random.choice(sorted(cats.ROLES)))
+
+    def _wait(self, phase):
+        """Run the timers until the phase changes, which usually means
+        that the time limit was hit. Return False if it didn't change."""
+        deadline = self.clock.now + self.args.max_wait
+        while self._phase == phase:
+            timeout = self.scheduler.timeout()
+            if timeout is None or self.clock.now + timeout > deadline:
+                return False
+            self.scheduler.advance(timeout)
+            self.cli.pump()
+            self._observe()
+        return True
+
+    def report(self, elapsed, games):
+        peak = None
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != "darwin": # macOS gives bytes, everyone else kilobytes
+                peak *= 1024
+        return {
+            "games": games,
+            "seconds": elapsed,
+            "games_per_second": games / elapsed if elapsed else None,
+            "results": dict(self.results),
+            "errors": sum(self.server.watched.values()),
+            "modes": dict(self.modes),
+            "phases": {name: timings.summary() for name, timings in self.phases.items()},
+            "lines_received": dict(self.server.received),
+            "messages_sent": dict(self.server.messages),
+            "peak_memory": peak,
+        }
+
+def print_report(report):
+    print("Played {0} games in {1:.2f}s ({2:.2f} games/s)".format(report["games"], report["seconds"], report["games_per_second"] or 0))
+    print("Results: " + ", ".join("{0} {1}".format(count, result) for result, count in sorted(report["results"].items())))
+    print("Errors: {0}".format(report["errors"]))
+    print("Modes: " + ", ".join("{0} ({1})".format(mode, count) for mode, count in sorted(report["modes"].items())))
+    print("{0:<8} {1:>7} {2:>10} {3:>10} {4:>10} {5:>10}".format("phase", "count", "mean ms", "p50 ms", "p99 ms", "max ms"))
+    for name, stats in sorted(report["phases"].items()):
+        if not stats["count"]:
+            continue
+        print("{0:<8} {1:>7} {2:>10.2f} {3:>10.2f} {4:>10.2f} {5:>10.2f}".format(
+            name, stats["count"], stats["mean"] * 1000, stats["p50"] * 1000, stats["p99"] * 1000, stats["max"] * 1000))
+    if report["peak_memory"] is not None:
+        print("Peak memory: {0:.1f} MiB".format(report["peak_memory"] / 1048576))
+    if "traced_memory" in report:
+        print("Peak traced memory: {0:.1f} MiB".format(report["traced_memory"] / 1048576))
+
+def main():
+    parser = argparse.ArgumentParser(description="Play simulated games and report how fast they ran.")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--players", type=int, default=0, help="players per game (default: random for each mode)")
+    parser.add_argument("--max-players", type=int, default=24, help="most players in a game")
+    parser.add_argument("--max-phases", type=int, default=60, help="stop games which last longer than this many phases")
+    parser.add_argument("--max-wait", type=float, default=3600, help="longest (virtual) time to wait for a phase to end, in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workdir", default=None, help="where to put the database and logs (default: a temporary directory)")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python allocations (slow)")
+    parser.add_argument("--verbose", action="store_true", help="print everything the bot logs")
+    args = parser.parse_args()
+
+    if args.json is not None:
+        args.json = os.path.abspath(args.json)
+
+    temporary = args.workdir is None
+    if temporary:
+        args.workdir = tempfile.mkdtemp(prefix="lykos-sim-")
+    os.makedirs(args.workdir, exist_ok=True)
+    # the database and logs are opened relative to the working directory when src is imported
+    os.chdir(args.workdir)
+
+    # src parses the command line itself
+    sys.argv = [sys.argv[0], "--verbose" if args.verbose else "--normal"]
+    botconfig.OWNERS = tuple(botconfig.OWNERS) + (ADMIN_HOST,)
+
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+
+    random.seed(args.seed)
+
+    import src
+    from src import db
+
+    load_bot()
+    sim = Simulation(args)
+    start = time.perf_counter()
+    for i in range(args.games):
+        try:
+            sim.play(i)
+        except Exception:
+            src.errlog(traceback.format_exc())
+            sim.results["crashed"] += 1
+            sim.command(ADMIN, "fstop")
+    elapsed = time.perf_counter() - start
+    db.flush_games()
+
+    report = sim.report(elapsed, args.games)
+    if args.tracemalloc:
+        report["traced_memory"] = tracemalloc.get_traced_memory()[1]
+    print_report(report)
+    if os.path.getsize("errors.log"):
+        print("Errors were logged to {0}".format(os.path.join(args.workdir, "errors.log")))
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    if temporary and not os.path.getsize("errors.log"):
+        # keep the directory around if there is something to look at
+        os.chdir(os.path.dirname(args.workdir))
+        shutil.rmtree(args.workdir)
+
+if __name__ == "__main__":
+    main()
+
+# vim: set sw=4 expandtab:
@@ -31,9 +31,15 @@ files to get an idea of how those containers should be used.
 
 """
 
+_missing = object()
+
 class Container:
     """Base container class for all containers."""
 
+    # Incremented whenever any container is created or changes, so that
+    # views computed from containers can tell when they are outdated
+    generation = 0
+
     def __enter__(self):
         return self
 
@@ -58,6 +64,8 @@ class Container:
 class UserList(Container, list):
     def __init__(self, iterable=()):
         super().__init__()
+        Container.generation += 1
+        self._refs = {} # id(user) -> number of times the user is in the list
         try:
             for item in iterable:
                 self.append(item)
@@ -65,6 +73,22 @@ class UserList(Container, list):
             self.clear()
             raise
 
+    def _ref(self, item):
+        Container.generation += 1
+        count = self._refs.get(id(item), 0)
+        if not count:
+            item.lists[id(self)] = self
+        self._refs[id(item)] = count + 1
+
+    def _unref(self, item):
+        Container.generation += 1
+        count = self._refs[id(item)] - 1
+        if count:
+            self._refs[id(item)] = count
+        else: # that was the last instance
+            del self._refs[id(item)]
+            del item.lists[id(self)]
+
     def __add__(self, other):
         if not isinstance(other, list):
             return NotImplemented
@@ -83,33 +107,29 @@ class UserList(Container, list):
 
         item = self[index]
         super().__setitem__(index, value)
-        if item not in self:
-            item.lists.remove(self)
-
-        if self not in value.lists:
-            value.lists.append(self)
+        self._ref(value)
+        self._unref(item)
 
     def __delitem__(self, index):
         item = self[index]
 
         super().__delitem__(index)
 
-        if item not in self: # there may have been multiple instances
-            item.lists.remove(self)
+        self._unref(item)
 
     def append(self, item):
         if not isinstance(item, User):
             raise TypeError("UserList may only contain User instances")
 
-        if self not in item.lists:
-            item.lists.append(self)
+        self._ref(item)
 
         super().append(item)
 
     def clear(self):
+        Container.generation += 1
         for item in self:
-            if self in item.lists:
-                item.lists.remove(self)
+            item.lists.pop(id(self), None)
+        self._refs.clear()
 
         super().clear()
 
@@ -125,26 +145,22 @@ class UserList(Container, list):
 
         # If it didn't work, we don't get here
 
-        if self not in item.lists:
-            item.lists.append(self)
+        self._ref(item)
 
     def pop(self, index=-1):
         item = super().pop(index)
 
-        if item not in self:
-            item.lists.remove(self)
+        self._unref(item)
 
         return item
 
     def remove(self, item):
-        super().remove(item)
-
-        if item not in self:
-            item.lists.remove(self)
+        self.pop(self.index(item))
 
 class UserSet(Container, set):
     def __init__(self, iterable=()):
         super().__init__()
+        Container.generation += 1
         try:
             for item in iterable:
                 self.add(item)
@@ -190,14 +206,16 @@ class UserSet(Container, set):
             if not isinstance(item, User):
                 raise TypeError("UserSet may only contain User instances")
 
-            item.sets.append(self)
+            item.sets[id(self)] = self
             super().add(item)
+            Container.generation += 1
 
     def clear(self):
         for item in self:
-            item.sets.remove(self)
+            del item.sets[id(self)]
 
         super().clear()
+        Container.generation += 1
 
     def difference(self, iterable):
         return type(self)(super().difference(iterable))
@@ -209,7 +227,8 @@ class UserSet(Container, set):
 
     def discard(self, item):
         if item in self:
-            item.sets.remove(self)
+            del item.sets[id(self)]
+            Container.generation += 1
 
         super().discard(item)
 
@@ -223,13 +242,15 @@ class UserSet(Container, set):
 
     def pop(self):
         item = super().pop()
-        item.sets.remove(self)
+        del item.sets[id(self)]
+        Container.generation += 1
         return item
 
     def remove(self, item):
         super().remove(item)
 
-        item.sets.remove(self)
+        del item.sets[id(self)]
+        Container.generation += 1
 
     def symmetric_difference(self, iterable):
         return type(self)(super().symmetric_difference(iterable))
@@ -252,6 +273,8 @@ class UserSet(Container, set):
 class UserDict(Container, dict):
     def __init__(_self, _it=(), **kwargs):
         super().__init__()
+        Container.generation += 1
+        _self._refs = {} # id(user) -> number of keys the user is the value of
         if hasattr(_it, "items"):
             _it = _it.items()
         try:
@@ -274,20 +297,39 @@ class UserDict(Container, dict):
             new[key] = copy.deepcopy(value, memo)
         return new
 
+    def _ref(self, value):
+        count = self._refs.get(id(value), 0)
+        if not count:
+            value.dict_values[id(self)] = self
+        self._refs[id(value)] = count + 1
+
+    def _unref(self, value):
+        count = self._refs[id(value)] - 1
+        if count:
+            self._refs[id(value)] = count
+        else: # that was the last key with that value
+            del self._refs[id(value)]
+            del value.dict_values[id(self)]
+
+    def _forget(self, key, value):
+        if isinstance(key, User):
+            key.dict_keys.pop(id(self), None)
+        if isinstance(value, User):
+            self._unref(value)
+
     def __setitem__(self, item, value):
-        old = self.get(item)
+        old = self.get(item, _missing)
         super().__setitem__(item, value)
-        if isinstance(old, User):
-            if old not in self.values():
-                old.dict_values.remove(self)
-
-        if isinstance(item, User):
-            if self not in item.dict_keys:
-                item.dict_keys.append(self)
+        Container.generation += 1
 
         if isinstance(value, User):
-            if self not in value.dict_values:
-                value.dict_values.append(self)
+            self._ref(value)
+
+        if old is _missing:
+            if isinstance(item, User):
+                item.dict_keys[id(self)] = self
+        elif isinstance(old, User):
+            self._unref(old)
 
     def __delitem__(self, item):
         if isinstance(item, slice): # special-case: delete if it exists, otherwise don't
@@ -298,12 +340,8 @@ class UserDict(Container, dict):
 
         value = self[item]
         super().__delitem__(item)
-        if isinstance(item, User):
-            item.dict_keys.remove(self)
-
-        if isinstance(value, User):
-            if value not in self.values():
-                value.dict_values.remove(self)
+        Container.generation += 1
+        self._forget(item, value)
 
         if isinstance(value, (UserSet, UserList, UserDict)):
             value.clear()
@@ -311,37 +349,33 @@ class UserDict(Container, dict):
     def clear(self):
         for key, value in self.items():
             if isinstance(key, User):
-                key.dict_keys.remove(self)
+                del key.dict_keys[id(self)]
             if isinstance(value, User):
-                if self in value.dict_values:
-                    value.dict_values.remove(self)
+                value.dict_values.pop(id(self), None)
 
             if isinstance(value, (UserList, UserSet, UserDict)):
                 value.clear()
 
+        self._refs.clear()
         super().clear()
+        Container.generation += 1
 
     @classmethod
     def fromkeys(cls, iterable, value=None):
         return cls(dict.fromkeys(iterable, value))
 
     def pop(self, key, *default):
-        value = super().pop(key, *default)
-        if isinstance(key, User):
-            if self in key.dict_keys:
-                key.dict_keys.remove(self)
-        if isinstance(value, User):
-            if value not in self.values():
-                value.dict_values.remove(self)
+        if key not in self:
+            return super().pop(key, *default)
+        value = super().pop(key)
+        Container.generation += 1
+        self._forget(key, value)
         return value
 
     def popitem(self):
         key, value = super().popitem()
-        if isinstance(key, User):
-            key.dict_keys.remove(self)
-        if isinstance(value, User):
-            if value not in self.values():
-                value.dict_values.remove(self)
+        Container.generation += 1
+        self._forget(key, value)
         return key, value
 
     def setdefault(self, key, default=None):
@@ -1,8 +1,15 @@
+import sys
+
 from collections import defaultdict
-from operator import attrgetter
+from operator import attrgetter, itemgetter
 
 from src.logger import debuglog
 
+# Priorities for queued messages; lower values are sent first
+PRIORITY_GAME = 0 # role notifications and other messages needed to play
+PRIORITY_DEFAULT = 5
+PRIORITY_FLAVOR = 10 # messages which can wait until everything else is out
+
 Features = {"CASEMAPPING": "rfc1459", "CHARSET": "utf-8", "STATUSMSG": {"@", "+"}, "CHANTYPES": {"#"}, "TARGMAX": {"PRIVMSG": 1, "NOTICE": 1}}
 
 def _who(cli, target, data=b""):
@@ -26,7 +33,7 @@ def _who(cli, target, data=b""):
 
     return int.from_bytes(data, "little")
 
-def _send(data, first, sep, client, send_type, name):
+def _send(data, first, sep, client, send_type, name, lane=None):
     full_address = "{cli.nickname}!{cli.ident}@{cli.hostmask}".format(cli=client)
 
     # Maximum length of sent data is 512 bytes. However, we have to
@@ -66,10 +73,28 @@ def _send(data, first, sep, client, send_type, name):
         messages.append(cur_sep)
         messages.append(line)
 
+    sent = 0
     for line in "".join(messages).split("\n"):
         while line:
             extra, line = line[:length], line[length:]
-            client.send("{0} {1} :{2}{3}".format(send_type, name, first, extra))
+            client.send("{0} {1} :{2}{3}".format(send_type, name, first, extra), lane=lane)
+            sent += 1
+
+    return sent
+
+# Translation tables for the supported CASEMAPPINGs; any other value is treated as rfc1459
+_casemaps = {
+    "rfc1459": str.maketrans("[]\\^", "{}|~"),
+    "strict-rfc1459": str.maketrans("[]\\", "{}|"),
+    "ascii": {},
+}
+
+# Folded strings seen so far, for each case mapping. The same nicks, accounts
+# and hosts get folded over and over again, so this saves most of the work.
+# Entries are keyed by the original string, so they never become outdated;
+# the caches are simply emptied once they grow too large.
+_folded = {name: {} for name in _casemaps}
+_FOLDED_MAX = 8192
 
 def lower(nick, *, casemapping=None):
     if nick is None:
@@ -78,20 +103,19 @@ def lower(nick, *, casemapping=None):
         return nick.lower()
     if casemapping is None:
         casemapping = Features["CASEMAPPING"]
+    if casemapping not in _casemaps:
+        casemapping = "rfc1459"
 
-    mapping = {
-        "[": "{",
-        "]": "}",
-        "\\": "|",
-        "^": "~",
-    }
+    cache = _folded[casemapping]
+    try:
+        return cache[nick]
+    except KeyError:
+        pass
 
-    if casemapping == "strict-rfc1459":
-        mapping.pop("^")
-    elif casemapping == "ascii":
-        mapping.clear()
-
-    return nick.lower().translate(str.maketrans(mapping))
+    if len(cache) >= _FOLDED_MAX:
+        cache.clear()
+    folded = cache[nick] = sys.intern(nick.lower().translate(_casemaps[casemapping]))
+    return folded
 
 def equals(nick1, nick2):
     return nick1 is not None and nick2 is not None and lower(nick1) == lower(nick2)
@@ -111,7 +135,7 @@ def context_types(*types):
 class IRCContext:
     """Base class for channels and users."""
 
-    _messages = defaultdict(list)
+    _messages = []
 
     def __init__(self, name, client):
         self.name = name
@@ -153,31 +177,52 @@ class IRCContext:
             return "NOTICE"
         return "PRIVMSG"
 
-    def queue_message(self, message):
+    def queue_message(self, message, *, priority=PRIORITY_DEFAULT):
         if self.is_fake:
             self.send(message) # Don't actually queue it
             return
 
-        if isinstance(message, list):
-            message = tuple(message)
+        if isinstance(message, str):
+            message = (message,)
 
-        self._messages[message].append(self)
+        self._messages.append((priority, tuple(message), self))
 
     @classmethod
     def send_messages(cls, *, notice=False, privmsg=False):
-        messages = list(cls._messages.items())
+        """Send all queued messages.
+
+        The messages queued for each target are sent in order of priority,
+        packed into as few lines as possible; targets which are getting the
+        same messages are combined as far as TARGMAX allows. Returns how
+        many seconds it is expected to take until all of it has been sent.
+
+        """
+        messages = sorted(cls._messages, key=itemgetter(0))
         cls._messages.clear()
-        for message, targets in messages:
-            if isinstance(message, str):
-                message = (message,)
-            send_types = defaultdict(list)
-            for target in targets:
-                send_types[target.get_send_type(is_notice=notice, is_privmsg=privmsg)].append(target)
-            for send_type, targets in send_types.items():
-                max_targets = Features["TARGMAX"][send_type]
-                while targets:
-                    using, targets = targets[:max_targets], targets[max_targets:]
-                    _send(message, "", " ", using[0].client, send_type, ",".join([t.nick for t in using]))
+
+        pending = {}
+        for priority, message, target in messages:
+            if id(target) not in pending:
+                # messages are sorted, so the first one has the most urgent priority
+                pending[id(target)] = (target, [], "game" if priority <= PRIORITY_GAME else None)
+            pending[id(target)][1].extend(message)
+
+        grouped = defaultdict(list)
+        for target, data, lane in pending.values():
+            send_type = target.get_send_type(is_notice=notice, is_privmsg=privmsg)
+            grouped[send_type, target.client, tuple(data), lane].append(target)
+
+        sent = defaultdict(int)
+        for (send_type, client, data, lane), targets in grouped.items():
+            max_targets = Features["TARGMAX"][send_type]
+            while targets:
+                using, targets = targets[:max_targets], targets[max_targets:]
+                sent[client] += _send(data, "", " ", client, send_type, ",".join([t.nick for t in using]), lane)
+
+        delay = max((client.send_delay() for client in sent), default=0)
+        if sent:
+            debuglog("Sent {0} queued lines, expected to be out in {1:.1f}s".format(sum(sent.values()), delay))
+        return delay
 
     @classmethod
     def get_context_type(cls, *, max_types=1):
@@ -209,7 +254,7 @@ class IRCContext:
 
         return _who(self.client, self.name, data)
 
-    def send(self, *data, first=None, sep=None, notice=False, privmsg=False, prefix=None):
+    def send(self, *data, first=None, sep=None, notice=False, privmsg=False, prefix=None, lane=None):
         if self.is_fake:
             # Leave out 'fake' from the message; get_context_type() takes care of that
             debuglog("Would message {0} {1}: {2!r}".format(self.get_context_type(), self.name, " ".join(data)))
@@ -223,6 +268,6 @@ class IRCContext:
             first = ""
         if sep is None:
             sep = " "
-        _send(data, first, sep, self.client, send_type, name)
+        _send(data, first, sep, self.client, send_type, name, lane)
 
 # vim: set sw=4 expandtab:
@@ -1,125 +1,264 @@
 import sqlite3
+import atexit
 import os
 import json
 import shutil
 import sys
 import time
+import queue
+import uuid
+import itertools
+import traceback
 from collections import defaultdict
 import threading
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
 import botconfig
 import src.settings as var
 from src.utilities import irc_lower, break_long_message, role_order, singular
+from src.logger import errlog
+from src import metrics
 
 # increment this whenever making a schema change so that the schema upgrade functions run on start
 # they do not run by default for performance reasons
-SCHEMA_VERSION = 5
+SCHEMA_VERSION = 6
 
 _ts = threading.local()
 
+# Games which still have to be written to the database; see add_game()
+GAME_SPOOL = "data.sqlite3.games"
+_game_queue = queue.Queue()
+_game_lock = threading.Lock()
+_game_writer = None
+_game_stats = {"written": 0, "batches": 0, "last_latency": 0.0, "max_latency": 0.0, "total_latency": 0.0}
+
+# Names of the tracking vars which are filled in from the database
+_TRACKING_VARS = ("SIMPLE_NOTIFY", "SIMPLE_NOTIFY_ACCS", "PREFER_NOTICE", "PREFER_NOTICE_ACCS",
+                  "STASISED", "STASISED_ACCS", "PING_IF_PREFS", "PING_IF_PREFS_ACCS",
+                  "PING_IF_NUMS", "PING_IF_NUMS_ACCS", "DEADCHAT_PREFS", "DEADCHAT_PREFS_ACCS",
+                  "FLAGS", "FLAGS_ACCS", "DENY", "DENY_ACCS", "WARNED", "WARNED_ACCS")
+
+# Stands in for the expiry of warnings which never expire in WARNED and WARNED_ACCS
+_NEVER = "9999-12-31 23:59:59"
+
+# When the tracking vars last dropped the sanctions of expired warnings
+_expired_until = None
+
 def init_vars():
+    """Rebuild all of the tracking vars from the database.
+
+    This is only needed on startup and when explicitly asked to refresh;
+    the functions in this module which modify the tracked data update the
+    tracking vars of the affected people on their own.
+
+    """
+    global _expired_until
+    with var.GRAVEYARD_LOCK:
+        _expired_until = _conn().execute("SELECT datetime('now')").fetchone()[0]
+        _init_vars(var)
+
+def check_vars():
+    """Return the names of the tracking vars which differ from the database.
+
+    This performs a full reload in a separate namespace and compares it
+    against the live tracking vars, without modifying them.
+
+    """
+    fresh = SimpleNamespace()
+    with var.GRAVEYARD_LOCK:
+        _init_vars(fresh)
+        # defaultdict lookups leave empty entries behind, so ignore those
+        return [name for name in _TRACKING_VARS if _live_entries(getattr(var, name)) != _live_entries(getattr(fresh, name))]
+
+def _live_entries(container):
+    if isinstance(container, dict):
+        return {key: value for key, value in container.items() if value}
+    return set(container)
+
+def _init_vars(ns):
+    ns.SIMPLE_NOTIFY = set()  # cloaks of people who !simple, who don't want detailed instructions
+    ns.SIMPLE_NOTIFY_ACCS = set() # same as above, except accounts. takes precedence
+    ns.PREFER_NOTICE = set()  # cloaks of people who !notice, who want everything /notice'd
+    ns.PREFER_NOTICE_ACCS = set() # Same as above, except accounts. takes precedence
+    ns.STASISED = defaultdict(int)
+    ns.STASISED_ACCS = defaultdict(int)
+    ns.PING_IF_PREFS = {}
+    ns.PING_IF_PREFS_ACCS = {}
+    ns.PING_IF_NUMS = defaultdict(set)
+    ns.PING_IF_NUMS_ACCS = defaultdict(set)
+    ns.DEADCHAT_PREFS = set()
+    ns.DEADCHAT_PREFS_ACCS = set()
+    ns.FLAGS = defaultdict(str)
+    ns.FLAGS_ACCS = defaultdict(str)
+    ns.DENY = defaultdict(set)
+    ns.DENY_ACCS = defaultdict(set)
+    ns.WARNED = {} # hostmasks with unacknowledged warnings, to when the last of those expires
+    ns.WARNED_ACCS = {} # same as above, except accounts
+
+    _load_vars(ns)
+
+def _update_vars(*peids):
+    """Refresh the tracking vars of the given people from the database."""
     with var.GRAVEYARD_LOCK:
         conn = _conn()
         c = conn.cursor()
-        c.execute("""SELECT
-                       pl.account,
-                       pl.hostmask,
-                       pe.notice,
-                       pe.simple,
-                       pe.deadchat,
-                       pe.pingif,
-                       pe.stasis_amount,
-                       pe.stasis_expires,
-                       COALESCE(at.flags, a.flags)
-                     FROM person pe
-                     JOIN player pl
-                       ON pl.person = pe.id
-                     LEFT JOIN access a
-                       ON a.person = pe.id
-                     LEFT JOIN access_template at
-                       ON at.id = a.template
-                     WHERE pl.active = 1""")
-
-        var.SIMPLE_NOTIFY = set()  # cloaks of people who !simple, who don't want detailed instructions
-        var.SIMPLE_NOTIFY_ACCS = set() # same as above, except accounts. takes precedence
-        var.PREFER_NOTICE = set()  # cloaks of people who !notice, who want everything /notice'd
-        var.PREFER_NOTICE_ACCS = set() # Same as above, except accounts. takes precedence
-        var.STASISED = defaultdict(int)
-        var.STASISED_ACCS = defaultdict(int)
-        var.PING_IF_PREFS = {}
-        var.PING_IF_PREFS_ACCS = {}
-        var.PING_IF_NUMS = defaultdict(set)
-        var.PING_IF_NUMS_ACCS = defaultdict(set)
-        var.DEADCHAT_PREFS = set()
-        var.DEADCHAT_PREFS_ACCS = set()
-        var.FLAGS = defaultdict(str)
-        var.FLAGS_ACCS = defaultdict(str)
-        var.DENY = defaultdict(set)
-        var.DENY_ACCS = defaultdict(set)
-
-        for acc, host, notice, simple, dc, pi, stasis, stasisexp, flags in c:
-            if acc is not None:
-                acc = irc_lower(acc)
-                if simple == 1:
-                    var.SIMPLE_NOTIFY_ACCS.add(acc)
-                if notice == 1:
-                    var.PREFER_NOTICE_ACCS.add(acc)
-                if stasis > 0:
-                    var.STASISED_ACCS[acc] = stasis
-                if pi is not None and pi > 0:
-                    var.PING_IF_PREFS_ACCS[acc] = pi
-                    var.PING_IF_NUMS_ACCS[pi].add(acc)
-                if dc == 1:
-                    var.DEADCHAT_PREFS_ACCS.add(acc)
-                if flags:
-                    var.FLAGS_ACCS[acc] = flags
-            elif host is not None:
-                # nick!ident lowercased per irc conventions, host uses normal casing
-                try:
-                    hl, hr = host.split("@", 1)
-                    host = irc_lower(hl) + "@" + hr.lower()
-                except ValueError:
-                    host = host.lower()
-                if simple == 1:
-                    var.SIMPLE_NOTIFY.add(host)
-                if notice == 1:
-                    var.PREFER_NOTICE.add(host)
-                if stasis > 0:
-                    var.STASISED[host] = stasis
-                if pi is not None and pi > 0:
-                    var.PING_IF_PREFS[host] = pi
-                    var.PING_IF_NUMS[pi].add(host)
-                if dc == 1:
-                    var.DEADCHAT_PREFS.add(host)
-                if flags:
-                    var.FLAGS[host] = flags
+        for peid in peids:
+            if peid is None:
+                continue
+            c.execute("SELECT account, hostmask FROM player WHERE person = ? AND active = 1", (peid,))
+            for acc, host in c.fetchall():
+                _forget_vars(var, acc, host)
+            _load_vars(var, peid)
+
+def _forget_vars(ns, acc, host):
+    if acc is not None:
+        acc = irc_lower(acc)
+        ns.SIMPLE_NOTIFY_ACCS.discard(acc)
+        ns.PREFER_NOTICE_ACCS.discard(acc)
+        ns.STASISED_ACCS.pop(acc, None)
+        pi = ns.PING_IF_PREFS_ACCS.pop(acc, None)
+        if pi is not None:
+            ns.PING_IF_NUMS_ACCS[pi].discard(acc)
+        ns.DEADCHAT_PREFS_ACCS.discard(acc)
+        ns.FLAGS_ACCS.pop(acc, None)
+        ns.DENY_ACCS.pop(acc, None)
+        ns.WARNED_ACCS.pop(acc, None)
+    elif host is not None:
+        ns.DENY.pop(irc_lower(host), None)
+        host = _lower_hostmask(host)
+        ns.SIMPLE_NOTIFY.discard(host)
+        ns.PREFER_NOTICE.discard(host)
+        ns.STASISED.pop(host, None)
+        pi = ns.PING_IF_PREFS.pop(host, None)
+        if pi is not None:
+            ns.PING_IF_NUMS[pi].discard(host)
+        ns.DEADCHAT_PREFS.discard(host)
+        ns.FLAGS.pop(host, None)
+        ns.WARNED.pop(host, None)
+
+def _lower_hostmask(host):
+    # nick!ident lowercased per irc conventions, host uses normal casing
+    try:
+        hl, hr = host.split("@", 1)
+        return irc_lower(hl) + "@" + hr.lower()
+    except ValueError:
+        return host.lower()
 
-        c.execute("""SELECT
-                       pl.account,
-                       pl.hostmask,
-                       ws.data
-                     FROM warning w
-                     JOIN warning_sanction ws
-                       ON ws.warning = w.id
-                     JOIN person pe
-                       ON pe.id = w.target
-                     JOIN player pl
-                       ON pl.person = pe.id
-                     WHERE
-                       ws.sanction = 'deny command'
-                       AND w.deleted = 0
-                       AND (
-                         w.expires IS NULL
-                         OR w.expires > datetime('now')
-                       )""")
-        for acc, host, command in c:
-            if acc is not None:
-                acc = irc_lower(acc)
-                var.DENY_ACCS[acc].add(command)
-            if host is not None:
-                host = irc_lower(host)
-                var.DENY[host].add(command)
+def _load_vars(ns, peid=None):
+    conn = _conn()
+    c = conn.cursor()
+    sql = """SELECT
+               pl.account,
+               pl.hostmask,
+               pe.notice,
+               pe.simple,
+               pe.deadchat,
+               pe.pingif,
+               pe.stasis_amount,
+               pe.stasis_expires,
+               COALESCE(at.flags, a.flags)
+             FROM person pe
+             JOIN player pl
+               ON pl.person = pe.id
+             LEFT JOIN access a
+               ON a.person = pe.id
+             LEFT JOIN access_template at
+               ON at.id = a.template
+             WHERE pl.active = 1"""
+    params = ()
+    if peid is not None:
+        sql += " AND pe.id = ?"
+        params = (peid,)
+    c.execute(sql, params)
+
+    for acc, host, notice, simple, dc, pi, stasis, stasisexp, flags in c:
+        if acc is not None:
+            acc = irc_lower(acc)
+            if simple == 1:
+                ns.SIMPLE_NOTIFY_ACCS.add(acc)
+            if notice == 1:
+                ns.PREFER_NOTICE_ACCS.add(acc)
+            if stasis > 0:
+                ns.STASISED_ACCS[acc] = stasis
+            if pi is not None and pi > 0:
+                ns.PING_IF_PREFS_ACCS[acc] = pi
+                ns.PING_IF_NUMS_ACCS[pi].add(acc)
+            if dc == 1:
+                ns.DEADCHAT_PREFS_ACCS.add(acc)
+            if flags:
+                ns.FLAGS_ACCS[acc] = flags
+        elif host is not None:
+            host = _lower_hostmask(host)
+            if simple == 1:
+                ns.SIMPLE_NOTIFY.add(host)
+            if notice == 1:
+                ns.PREFER_NOTICE.add(host)
+            if stasis > 0:
+                ns.STASISED[host] = stasis
+            if pi is not None and pi > 0:
+                ns.PING_IF_PREFS[host] = pi
+                ns.PING_IF_NUMS[pi].add(host)
+            if dc == 1:
+                ns.DEADCHAT_PREFS.add(host)
+            if flags:
+                ns.FLAGS[host] = flags
+
+    sql = """SELECT
+               pl.account,
+               pl.hostmask,
+               ws.data
+             FROM warning w
+             JOIN warning_sanction ws
+               ON ws.warning = w.id
+             JOIN person pe
+               ON pe.id = w.target
+             JOIN player pl
+               ON pl.person = pe.id
+             WHERE
+               ws.sanction = 'deny command'
+               AND w.deleted = 0
+               AND (
+                 w.expires IS NULL
+                 OR w.expires > datetime('now')
+               )"""
+    if peid is not None:
+        sql += " AND pe.id = ?"
+    c.execute(sql, params)
+    for acc, host, command in c:
+        if acc is not None:
+            acc = irc_lower(acc)
+            ns.DENY_ACCS[acc].add(command)
+        if host is not None:
+            host = irc_lower(host)
+            ns.DENY[host].add(command)
+
+    sql = """SELECT
+               pl.account,
+               pl.hostmask,
+               MAX(COALESCE(w.expires, ?))
+             FROM warning w
+             JOIN person pe
+               ON pe.id = w.target
+             JOIN player pl
+               ON pl.person = pe.id
+             WHERE
+               pl.active = 1
+               AND w.acknowledged = 0
+               AND w.deleted = 0
+               AND (
+                 w.expires IS NULL
+                 OR w.expires > datetime('now')
+               )"""
+    if peid is not None:
+        sql += " AND pe.id = ?"
+    sql += " GROUP BY pl.id"
+    c.execute(sql, (_NEVER,) + params)
+    for acc, host, expires in c:
+        if acc is not None:
+            ns.WARNED_ACCS[irc_lower(acc)] = expires
+        elif host is not None:
+            ns.WARNED[_lower_hostmask(host)] = expires
 
 def decrement_stasis(acc=None, hostmask=None):
     peid, plid = _get_ids(acc, hostmask)
@@ -134,11 +273,18 @@ def decrement_stasis(acc=None, hostmask=None):
     conn = _conn()
     with conn:
         c = conn.cursor()
+        if peid is not None:
+            peids = (peid,)
+        else:
+            c.execute("SELECT id FROM person WHERE stasis_amount > 0")
+            peids = [row[0] for row in c]
         c.execute(sql, params)
+    _update_vars(*peids)
 
 def set_stasis(newamt, acc=None, hostmask=None, relative=False):
     peid, plid = _get_ids(acc, hostmask, add=True)
     _set_stasis(int(newamt), peid, relative)
+    _update_vars(peid)
 
 def _set_stasis(newamt, peid, relative=False):
     conn = _conn()
@@ -169,16 +315,43 @@ def _set_stasis(newamt, peid, relative=False):
                          WHERE id = ?""", (newamt, peid))
 
 def expire_stasis():
+    """Expire stasis, and drop the sanctions of warnings which ran out.
+
+    The tracking vars only hold the sanctions of warnings which have not
+    expired yet, so the targets of warnings which expired since the last
+    call are refreshed along with the people whose stasis ran out.
+
+    """
+    global _expired_until
     conn = _conn()
     with conn:
         c = conn.cursor()
+        c.execute("SELECT datetime('now')")
+        now = c.fetchone()[0]
+        c.execute("""SELECT id
+                     FROM person
+                     WHERE
+                       stasis_expires IS NOT NULL
+                       AND stasis_expires <= ?""", (now,))
+        peids = {row[0] for row in c}
+        if _expired_until is not None:
+            c.execute("""SELECT DISTINCT target
+                         FROM warning
+                         WHERE
+                           deleted = 0
+                           AND expires IS NOT NULL
+                           AND expires > ?
+                           AND expires <= ?""", (_expired_until, now))
+            peids.update(row[0] for row in c)
         c.execute("""UPDATE person
                      SET
                        stasis_amount = 0,
                        stasis_expires = NULL
                      WHERE
                        stasis_expires IS NOT NULL
-                       AND stasis_expires <= datetime('now')""")
+                       AND stasis_expires <= ?""", (now,))
+    _update_vars(*peids)
+    _expired_until = now
 
 def get_template(name):
     conn = _conn()
@@ -205,17 +378,24 @@ def update_template(name, flags):
         c = conn.cursor()
         if tid is None:
             c.execute("INSERT INTO access_template (name, flags) VALUES (?, ?)", (name, flags))
-        else:
-            c.execute("UPDATE access_template SET flags = ? WHERE id = ?", (flags, tid))
+            return
+        c.execute("UPDATE access_template SET flags = ? WHERE id = ?", (flags, tid))
+        c.execute("SELECT person FROM access WHERE template = ?", (tid,))
+        peids = [row[0] for row in c]
+    _update_vars(*peids)
 
 def delete_template(name):
     conn = _conn()
     with conn:
         tid, _ = get_template(name)
-        if tid is not None:
-            c = conn.cursor()
-            c.execute("DELETE FROM access WHERE template = ?", (tid,))
-            c.execute("DELETE FROM access_template WHERE id = ?", (tid,))
+        if tid is None:
+            return
+        c = conn.cursor()
+        c.execute("SELECT person FROM access WHERE template = ?", (tid,))
+        peids = [row[0] for row in c]
+        c.execute("DELETE FROM access WHERE template = ?", (tid,))
+        c.execute("DELETE FROM access_template WHERE id = ?", (tid,))
+    _update_vars(*peids)
 
 def set_access(acc, hostmask, flags=None, tid=None):
     peid, plid = _get_ids(acc, hostmask, add=True)
@@ -234,6 +414,7 @@ def set_access(acc, hostmask, flags=None, tid=None):
             c.execute("""INSERT OR REPLACE INTO access
                          (person, template, flags)
                          VALUES (?, NULL, ?)""", (peid, flags))
+    _update_vars(peid)
 
 def toggle_simple(acc, hostmask):
     _toggle_thing("simple", acc, hostmask)
@@ -274,31 +455,290 @@ def add_game(mode, size, started, finished, winner, players, options):
         iwon: True/False
         dced: True/False
     }
+
+    The game is handed off to a background thread which writes it to the
+    database, so this returns without waiting on the disk. Until it has been
+    committed, the game is also kept in a spool file which is replayed on the
+    next start if the bot goes down first. Call flush_games() to wait until
+    every queued game has been written.
     """
 
+    record = {"mode": mode, "size": size, "started": started, "finished": finished,
+              "winner": winner, "options": options, "players": []}
+    for p in players:
+        p = dict(p)
+        # sets can't be stored in the spool
+        if "allroles" in p:
+            p["allroles"] = list(p["allroles"])
+        p["special"] = list(p["special"])
+        record["players"].append(p)
+
+    with _game_lock:
+        record["spool"] = uuid.uuid4().hex
+        with open(GAME_SPOOL, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        _queue_game(record)
+
+def flush_games():
+    """Block until all queued games have been written to the database."""
+    if _game_writer is not None:
+        _game_queue.join()
+
+def get_game_writer_stats():
+    """Return the counters of the background game writer.
+
+    queued: Games waiting to be written
+    written: Games written since startup
+    batches: Transactions used to write them
+    last_latency: Seconds spent writing the most recent batch
+    max_latency: Longest time spent writing a single batch
+    total_latency: Total time spent writing batches
+    """
+    with _game_lock:
+        stats = dict(_game_stats)
+    stats["queued"] = _game_queue.qsize()
+    return stats
+
+def _queue_game(record):
+    global _game_writer
+    if _game_writer is None:
+        _game_writer = threading.Thread(None, _game_writer_loop, name="game writer", daemon=True)
+        _game_writer.start()
+    _game_queue.put(record)
+
+def _game_writer_loop():
+    while True:
+        # write everything that piled up while the previous batch was being written
+        records = [_game_queue.get()]
+        while True:
+            try:
+                records.append(_game_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        start = time.perf_counter()
+        try:
+            _write_games(records)
+            _trim_spool(records)
+        except Exception:
+            # the games stay in the spool and are retried on the next start
+            errlog(traceback.format_exc())
+        else:
+            latency = time.perf_counter() - start
+            with _game_lock:
+                _game_stats["written"] += len(records)
+                _game_stats["batches"] += 1
+                _game_stats["last_latency"] = latency
+                _game_stats["max_latency"] = max(_game_stats["max_latency"], latency)
+                _game_stats["total_latency"] += latency
+        finally:
+            for record in records:
+                _game_queue.task_done()
+
+def _write_games(records):
     # Normalize players dict
     conn = _conn()
-    for p in players:
-        if p["account"] == "*":
-            p["account"] = None
-        p["hostmask"] = "{0}!{1}@{2}".format(p["nick"], p["ident"], p["host"])
-        c = conn.cursor()
-        p["personid"], p["playerid"] = _get_ids(p["account"], p["hostmask"], add=True)
+    for record in records:
+        for p in record["players"]:
+            if p["account"] == "*":
+                p["account"] = None
+            p["hostmask"] = "{0}!{1}@{2}".format(p["nick"], p["ident"], p["host"])
+            p["personid"], p["playerid"] = _get_ids(p["account"], p["hostmask"], add=True)
+
     with conn:
         c = conn.cursor()
-        c.execute("""INSERT INTO game (gamemode, options, started, finished, gamesize, winner)
-                     VALUES (?, ?, ?, ?, ?, ?)""", (mode, json.dumps(options), started, finished, size, winner))
-        gameid = c.lastrowid
-        for p in players:
-            c.execute("""INSERT INTO game_player (game, player, team_win, indiv_win, dced)
-                         VALUES (?, ?, ?, ?, ?)""", (gameid, p["playerid"], p["won"], p["iwon"], p["dced"]))
-            gpid = c.lastrowid
-            for role in p["allroles"]:
-                c.execute("""INSERT INTO game_player_role (game_player, role, special)
-                             VALUES (?, ?, 0)""", (gpid, role))
-            for sq in p["special"]:
-                c.execute("""INSERT INTO game_player_role (game_player, role, special)
-                             VALUES (?, ?, 1)""", (gpid, sq))
+        # this thread is the only one adding games, so the ids can be handed out up front
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM game")
+        gameid = c.fetchone()[0]
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM game_player")
+        gpid = c.fetchone()[0]
+        games = []
+        game_players = []
+        game_player_roles = []
+        stats = _StatsDelta()
+        for record in records:
+            # games replayed from the spool may have been committed right before the bot went down
+            c.execute("""SELECT 1 FROM game
+                         WHERE gamemode = ? AND gamesize = ? AND started = ? AND finished = ?""",
+                      (record["mode"], record["size"], record["started"], record["finished"]))
+            if c.fetchone():
+                continue
+            gameid += 1
+            games.append((gameid, record["mode"], json.dumps(record["options"]), record["started"],
+                          record["finished"], record["size"], record["winner"]))
+            for p in record["players"]:
+                gpid += 1
+                game_players.append((gpid, gameid, p["playerid"], p["won"], p["iwon"], p["dced"]))
+                game_player_roles.extend((gpid, role, 0) for role in p["allroles"])
+                game_player_roles.extend((gpid, sq, 1) for sq in p["special"])
+            stats.add_game(record)
+
+        c.executemany("""INSERT INTO game (id, gamemode, options, started, finished, gamesize, winner)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""", games)
+        c.executemany("""INSERT INTO game_player (id, game, player, team_win, indiv_win, dced)
+                         VALUES (?, ?, ?, ?, ?, ?)""", game_players)
+        c.executemany("""INSERT INTO game_player_role (game_player, role, special)
+                         VALUES (?, ?, ?)""", game_player_roles)
+        stats.apply(c)
+
+class _StatsDelta:
+    """Changes to the stats summary tables from a batch of new games."""
+
+    def __init__(self):
+        self.players = defaultdict(lambda: [0, 0])
+        self.player_roles = defaultdict(lambda: [0, 0, 0, 0])
+        self.games = defaultdict(lambda: [0])
+        self.roles = defaultdict(lambda: [0, 0, 0, 0])
+
+    def add_game(self, record):
+        self.games[(record["mode"], record["size"], record["winner"])][0] += 1
+        for p in record["players"]:
+            counts = (int(bool(p["won"])), int(bool(p["iwon"])), int(bool(p["won"] or p["iwon"])), 1)
+            player = self.players[p["playerid"]]
+            player[0] += 1
+            player[1] += counts[2]
+            for role in itertools.chain(p["allroles"], p["special"]):
+                for totals in (self.player_roles[(p["playerid"], role)], self.roles[(role, record["mode"])]):
+                    for i, count in enumerate(counts):
+                        totals[i] += count
+
+    def apply(self, c):
+        for table, key, columns, delta in (
+                ("player_stats", ("player",), ("games", "overall_wins"), self.players),
+                ("player_role_stats", ("player", "role"), _ROLE_COUNTS, self.player_roles),
+                ("game_stats", ("gamemode", "gamesize", "winner"), ("games",), self.games),
+                ("role_stats", ("role", "gamemode"), _ROLE_COUNTS, self.roles)):
+            update = "UPDATE {0} SET {1} WHERE {2}".format(table,
+                ", ".join("{0} = {0} + ?".format(col) for col in columns),
+                " AND ".join("{0} IS ?".format(col) for col in key))
+            insert = "INSERT INTO {0} ({1}) VALUES ({2})".format(table,
+                ", ".join(key + columns), ", ".join("?" * (len(key) + len(columns))))
+            for k, counts in delta.items():
+                if not isinstance(k, tuple):
+                    k = (k,)
+                c.execute(update, (*counts, *k))
+                if not c.rowcount:
+                    c.execute(insert, (*k, *counts))
+
+_ROLE_COUNTS = ("team_wins", "indiv_wins", "overall_wins", "games")
+
+# How each of the stats summary tables is computed from the game tables
+_STATS_QUERIES = {
+    "player_stats": """SELECT
+                         gp.player,
+                         COUNT(1),
+                         SUM(gp.team_win OR gp.indiv_win)
+                       FROM game_player gp
+                       GROUP BY gp.player""",
+    "player_role_stats": """SELECT
+                              gp.player,
+                              gpr.role,
+                              SUM(gp.team_win),
+                              SUM(gp.indiv_win),
+                              SUM(gp.team_win OR gp.indiv_win),
+                              COUNT(1)
+                            FROM game_player gp
+                            JOIN game_player_role gpr
+                              ON gpr.game_player = gp.id
+                            GROUP BY gp.player, gpr.role""",
+    "game_stats": """SELECT
+                       gamemode,
+                       gamesize,
+                       winner,
+                       COUNT(1)
+                     FROM game
+                     GROUP BY gamemode, gamesize, winner""",
+    "role_stats": """SELECT
+                       gpr.role,
+                       g.gamemode,
+                       SUM(gp.team_win),
+                       SUM(gp.indiv_win),
+                       SUM(gp.team_win OR gp.indiv_win),
+                       COUNT(1)
+                     FROM game g
+                     JOIN game_player gp
+                       ON gp.game = g.id
+                     JOIN game_player_role gpr
+                       ON gpr.game_player = gp.id
+                     GROUP BY gpr.role, g.gamemode""",
+}
+
+_STATS_COLUMNS = {
+    "player_stats": "player, games, overall_wins",
+    "player_role_stats": "player, role, team_wins, indiv_wins, overall_wins, games",
+    "game_stats": "gamemode, gamesize, winner, games",
+    "role_stats": "role, gamemode, team_wins, indiv_wins, overall_wins, games",
+}
+
+def check_stats():
+    """Compare the stats summary tables with the game tables.
+
+    Returns a dict of table name to the number of rows which differ,
+    only including the tables which are out of sync.
+
+    """
+    flush_games()
+    c = _conn().cursor()
+    drift = {}
+    for table, query in _STATS_QUERIES.items():
+        stored = "SELECT {0} FROM {1}".format(_STATS_COLUMNS[table], table)
+        c.execute("""SELECT
+                       (SELECT COUNT(1) FROM ({0} EXCEPT {1})),
+                       (SELECT COUNT(1) FROM ({1} EXCEPT {0}))""".format(query, stored))
+        missing, extra = c.fetchone()
+        if missing or extra:
+            drift[table] = missing + extra
+    return drift
+
+def rebuild_stats():
+    """Recompute the stats summary tables from the game tables."""
+    flush_games()
+    conn = _conn()
+    with conn:
+        _rebuild_stats(conn.cursor())
+
+def _rebuild_stats(c):
+    for table, query in _STATS_QUERIES.items():
+        c.execute("DELETE FROM {0}".format(table))
+        c.execute("INSERT INTO {0} ({1}) {2}".format(table, _STATS_COLUMNS[table], query))
+
+def _trim_spool(records):
+    done = {record["spool"] for record in records}
+    with _game_lock:
+        _write_spool([record for record in _read_spool() if record["spool"] not in done])
+
+def _read_spool():
+    try:
+        with open(GAME_SPOOL, encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # partial line left behind by a crash in the middle of a write
+            continue
+    return records
+
+def _write_spool(records):
+    if not records:
+        if os.path.exists(GAME_SPOOL):
+            os.remove(GAME_SPOOL)
+        return
+    with open(GAME_SPOOL + ".tmp", "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(GAME_SPOOL + ".tmp", GAME_SPOOL)
+
+def _replay_spool():
+    with _game_lock:
+        records = _read_spool()
+        # drop anything unreadable so that new games aren't appended onto a partial line
+        _write_spool(records)
+        for record in records:
+            _queue_game(record)
 
 def get_player_stats(acc, hostmask, role):
     peid, plid = _get_ids(acc, hostmask)
@@ -307,20 +747,16 @@ def get_player_stats(acc, hostmask, role):
     conn = _conn()
     c = conn.cursor()
     c.execute("""SELECT
-                   gpr.role AS role,
-                   SUM(gp.team_win) AS team,
-                   SUM(gp.indiv_win) AS indiv,
-                   SUM(gp.team_win OR gp.indiv_win) AS overall,
-                   COUNT(1) AS total
-                 FROM person pe
-                 JOIN player pl
-                   ON pl.person = pe.id
-                 JOIN game_player gp
-                   ON gp.player = pl.id
-                 JOIN game_player_role gpr
-                   ON gpr.game_player = gp.id
-                   AND gpr.role = ?
-                 WHERE pe.id = ?
+                   prs.role AS role,
+                   SUM(prs.team_wins) AS team,
+                   SUM(prs.indiv_wins) AS indiv,
+                   SUM(prs.overall_wins) AS overall,
+                   SUM(prs.games) AS total
+                 FROM player pl
+                 JOIN player_role_stats prs
+                   ON prs.player = pl.id
+                   AND prs.role = ?
+                 WHERE pl.person = ?
                  GROUP BY role""", (role, peid))
     row = c.fetchone()
     name = _get_display_name(peid)
@@ -337,28 +773,22 @@ def get_player_totals(acc, hostmask):
     conn = _conn()
     c = conn.cursor()
     c.execute("""SELECT
-                   gpr.role AS role,
-                   COUNT(1) AS total
-                 FROM person pe
-                 JOIN player pl
-                   ON pl.person = pe.id
-                 JOIN game_player gp
-                   ON gp.player = pl.id
-                 JOIN game_player_role gpr
-                   ON gpr.game_player = gp.id
-                 WHERE pe.id = ?
+                   prs.role AS role,
+                   SUM(prs.games) AS total
+                 FROM player pl
+                 JOIN player_role_stats prs
+                   ON prs.player = pl.id
+                 WHERE pl.person = ?
                  GROUP BY role""", (peid,))
     tmp = {}
     totals = []
     for row in c:
         tmp[row[0]] = row[1]
-    c.execute("""SELECT SUM(gp.team_win OR gp.indiv_win)
-                 FROM game_player gp
+    c.execute("""SELECT SUM(ps.overall_wins)
+                 FROM player_stats ps
                  JOIN player pl
-                   ON pl.id = gp.player
-                 JOIN person pe
-                   ON pe.id = pl.person
-                 WHERE pe.id = ?""", (peid,))
+                   ON pl.id = ps.player
+                 WHERE pl.person = ?""", (peid,))
     won_games = c.fetchone()[0]
     order = list(role_order())
     name = _get_display_name(peid)
@@ -373,9 +803,9 @@ def get_game_stats(mode, size):
     c = conn.cursor()
 
     if mode == "all":
-        c.execute("SELECT COUNT(1) FROM game WHERE gamesize = ?", (size,))
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats WHERE gamesize = ?", (size,))
     else:
-        c.execute("SELECT COUNT(1) FROM game WHERE gamemode = ? AND gamesize = ?", (mode, size))
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats WHERE gamemode = ? AND gamesize = ?", (mode, size))
 
     total_games = c.fetchone()[0]
     if not total_games:
@@ -384,12 +814,12 @@ def get_game_stats(mode, size):
     if mode == "all":
         c.execute("""SELECT
                        winner AS team,
-                       COUNT(1) AS games,
+                       SUM(games) AS games,
                        CASE winner
                          WHEN 'villagers' THEN 0
                          WHEN 'wolves' THEN 1
                          ELSE 2 END AS ord
-                     FROM game
+                     FROM game_stats
                      WHERE
                        gamesize = ?
                        AND winner IS NOT NULL
@@ -398,12 +828,12 @@ def get_game_stats(mode, size):
     else:
         c.execute("""SELECT
                        winner AS team,
-                       COUNT(1) AS games,
+                       SUM(games) AS games,
                        CASE winner
                          WHEN 'villagers' THEN 0
                          WHEN 'wolves' THEN 1
                          ELSE 2 END AS ord
-                     FROM game
+                     FROM game_stats
                      WHERE
                        gamemode = ?
                        AND gamesize = ?
@@ -431,9 +861,9 @@ def get_game_totals(mode):
     c = conn.cursor()
 
     if mode == "all":
-        c.execute("SELECT COUNT(1) FROM game")
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats")
     else:
-        c.execute("SELECT COUNT(1) FROM game WHERE gamemode = ?", (mode,))
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats WHERE gamemode = ?", (mode,))
 
     total_games = c.fetchone()[0]
     if not total_games:
@@ -442,15 +872,15 @@ def get_game_totals(mode):
     if mode == "all":
         c.execute("""SELECT
                        gamesize,
-                       COUNT(1) AS games
-                     FROM game
+                       SUM(games) AS games
+                     FROM game_stats
                      GROUP BY gamesize
                      ORDER BY gamesize ASC""")
     else:
         c.execute("""SELECT
                        gamesize,
-                       COUNT(1) AS games
-                     FROM game
+                       SUM(games) AS games
+                     FROM game_stats
                      WHERE gamemode = ?
                      GROUP BY gamesize
                      ORDER BY gamesize ASC""", (mode,))
@@ -469,31 +899,23 @@ def get_role_stats(role, mode=None):
     
     if mode is None:
         c.execute("""SELECT
-                   gpr.role AS role,
-                   SUM(gp.team_win) AS team,
-                   SUM(gp.indiv_win) AS indiv,
-                   SUM(gp.team_win OR gp.indiv_win) AS overall,
-                   COUNT(1) AS total
-                 FROM game g
-                 JOIN game_player gp
-                   ON gp.game = g.id
-                 JOIN game_player_role gpr
-                   ON gpr.game_player = gp.id
+                   role,
+                   SUM(team_wins) AS team,
+                   SUM(indiv_wins) AS indiv,
+                   SUM(overall_wins) AS overall,
+                   SUM(games) AS total
+                 FROM role_stats
                  WHERE role = ?
                  GROUP BY role""", (role,))
     else:
         c.execute("""SELECT
-                   gpr.role AS role,
-                   g.gamemode AS gamemode,
-                   SUM(gp.team_win) AS team,
-                   SUM(gp.indiv_win) AS indiv,
-                   SUM(gp.team_win OR gp.indiv_win) AS overall,
-                   COUNT(1) AS total
-                 FROM game g
-                 JOIN game_player gp
-                   ON gp.game = g.id
-                 JOIN game_player_role gpr
-                   ON gpr.game_player = gp.id
+                   role,
+                   gamemode,
+                   SUM(team_wins) AS team,
+                   SUM(indiv_wins) AS indiv,
+                   SUM(overall_wins) AS overall,
+                   SUM(games) AS total
+                 FROM role_stats
                  WHERE role = ?
                    AND gamemode = ?
                  GROUP BY role, gamemode""", (role, mode))
@@ -516,9 +938,9 @@ def get_role_totals(mode=None):
     conn = _conn()
     c = conn.cursor()
     if mode is None:
-        c.execute("SELECT COUNT(1) FROM game")
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats")
     else:
-        c.execute("SELECT COUNT(1) FROM game WHERE gamemode = ?", (mode,))
+        c.execute("SELECT COALESCE(SUM(games), 0) FROM game_stats WHERE gamemode = ?", (mode,))
     total_games = c.fetchone()[0]
     if not total_games:
         if mode is None:
@@ -528,21 +950,17 @@ def get_role_totals(mode=None):
 
     if mode is None:
         c.execute("""SELECT
-                   gpr.role AS role,
-                  COUNT(1) AS count
-                  FROM game_player_role gpr
+                   role,
+                   SUM(games) AS count
+                  FROM role_stats
                   GROUP BY role
                   ORDER BY count DESC""")
     else:
         c.execute("""SELECT
-                   gpr.role AS role,
-                  COUNT(1) AS count
-                  FROM game_player_role gpr
-                  JOIN game_player gp
-                    ON gp.id = gpr.game_player
-                  JOIN game g
-                    ON g.id = gp.game
-                  WHERE g.gamemode = ?
+                   role,
+                   SUM(games) AS count
+                  FROM role_stats
+                  WHERE gamemode = ?
                   GROUP BY role
                   ORDER BY count DESC""", (mode,))
 
@@ -589,6 +1007,21 @@ def has_unacknowledged_warnings(acc, hostmask):
     row = c.fetchone()
     return not bool(row[0])
 
+def is_warned(acc, hostmask):
+    """Return whether acc or hostmask has unacknowledged warnings.
+
+    This answers the same as has_unacknowledged_warnings() from the
+    tracking vars, without a query. The hostmask must be lowercased the
+    same way as the PING_IF_NUMS keys.
+
+    """
+    now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    if acc is not None:
+        return var.WARNED_ACCS.get(irc_lower(acc), "") > now
+    if hostmask is not None:
+        return var.WARNED.get(hostmask, "") > now
+    return False
+
 def list_all_warnings(list_all=False, skip=0, show=0):
     conn = _conn()
     c = conn.cursor()
@@ -801,6 +1234,7 @@ def add_warning(tacc, thm, sacc, shm, amount, reason, notes, expires):
                        ?, ?,
                        0
                      )""", (teid, seid, amount, expires, reason, notes))
+    _update_vars(teid)
     return c.lastrowid
 
 def add_warning_sanction(warning, sanction, data):
@@ -812,13 +1246,14 @@ def add_warning_sanction(warning, sanction, data):
                      VALUES
                      (?, ?, ?)""", (warning, sanction, data))
 
+        c.execute("SELECT target FROM warning WHERE id = ?", (warning,))
+        peid = c.fetchone()[0]
+
         if sanction == "tempban":
             # we want to return a list of all banned accounts/hostmasks
             idlist = set()
             acclist = set()
             hmlist = set()
-            c.execute("SELECT target FROM warning WHERE id = ?", (warning,))
-            peid = c.fetchone()[0]
             c.execute("SELECT id, account, hostmask FROM player WHERE person = ? AND active = 1", (peid,))
             if isinstance(data, datetime):
                 sql = "INSERT OR REPLACE INTO bantrack (player, expires) values (?, ?)"
@@ -834,6 +1269,9 @@ def add_warning_sanction(warning, sanction, data):
                 c.execute(sql, (plid, data))
             return (acclist, hmlist)
 
+    if sanction == "deny command":
+        _update_vars(peid)
+
 def del_warning(warning, acc, hm):
     peid, plid = _get_ids(acc, hm)
     conn = _conn()
@@ -848,6 +1286,10 @@ def del_warning(warning, acc, hm):
                      WHERE
                        id = ?
                        AND deleted = 0""", (peid, warning))
+        c.execute("SELECT target FROM warning WHERE id = ?", (warning,))
+        row = c.fetchone()
+    if row is not None:
+        _update_vars(row[0])
 
 def set_warning(warning, expires, reason, notes):
     conn = _conn()
@@ -856,12 +1298,20 @@ def set_warning(warning, expires, reason, notes):
         c.execute("""UPDATE warning
                      SET reason = ?, notes = ?, expires = ?
                      WHERE id = ?""", (reason, notes, expires, warning))
+        c.execute("SELECT target FROM warning WHERE id = ?", (warning,))
+        row = c.fetchone()
+    if row is not None:
+        _update_vars(row[0])
 
 def acknowledge_warning(warning):
     conn = _conn()
     with conn:
         c = conn.cursor()
         c.execute("UPDATE warning SET acknowledged = 1 WHERE id = ?", (warning,))
+        c.execute("SELECT target FROM warning WHERE id = ?", (warning,))
+        row = c.fetchone()
+    if row is not None:
+        _update_vars(row[0])
 
 def expire_tempbans():
     conn = _conn()
@@ -963,6 +1413,12 @@ def _upgrade(oldversion):
             if oldversion < 5:
                 print ("Upgrade from version 4 to 5...", file=sys.stderr)
                 c.execute("CREATE INDEX game_gamesize_idx ON game (gamesize)")
+            if oldversion < 6:
+                print ("Upgrade from version 5 to 6...", file=sys.stderr)
+                # Add summary tables for the stats commands and fill them in from existing games
+                with open(os.path.join(dn, "db", "upgrade6.sql"), "rt") as f:
+                    c.executescript(f.read())
+                _rebuild_stats(c)
 
             print ("Rebuilding indexes...", file=sys.stderr)
             c.execute("REINDEX")
@@ -1073,14 +1529,12 @@ def _total_games(peid):
         return 0
     conn = _conn()
     c = conn.cursor()
-    c.execute("""SELECT COUNT(DISTINCT gp.game)
-                 FROM person pe
-                 JOIN player pl
-                   ON pl.person = pe.id
-                 JOIN game_player gp
-                   ON gp.player = pl.id
+    c.execute("""SELECT COALESCE(SUM(ps.games), 0)
+                 FROM player pl
+                 JOIN player_stats ps
+                   ON ps.player = pl.id
                  WHERE
-                   pe.id = ?""", (peid,))
+                   pl.person = ?""", (peid,))
     # aggregates without GROUP BY always have exactly one row,
     # so no need to check for None here
     return c.fetchone()[0]
@@ -1100,11 +1554,58 @@ def _set_thing(thing, val, acc, hostmask, raw=False):
 def _toggle_thing(thing, acc, hostmask):
     _set_thing(thing, "CASE {0} WHEN 1 THEN 0 ELSE 1 END".format(thing), acc, hostmask, raw=True)
 
+class _Cursor(sqlite3.Cursor):
+    """Cursor which adds the time spent running queries to the running command.
+
+    Only the calls below are timed; rows fetched by iterating over the
+    cursor are not, so queries read that way are undercounted.
+
+    """
+
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            metrics.add_db_time(time.perf_counter() - start)
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            metrics.add_db_time(time.perf_counter() - start)
+
+    def executescript(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executescript(*args)
+        finally:
+            metrics.add_db_time(time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            metrics.add_db_time(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.add_db_time(time.perf_counter() - start)
+
+class _Connection(sqlite3.Connection):
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
 def _conn():
     try:
         return _ts.conn
     except AttributeError:
-        _ts.conn = sqlite3.connect("data.sqlite3")
+        _ts.conn = sqlite3.connect("data.sqlite3", factory=_Connection)
         with _ts.conn:
             c = _ts.conn.cursor()
             c.execute("PRAGMA foreign_keys = ON")
@@ -1157,4 +1658,7 @@ elif ver < SCHEMA_VERSION:
 
 del need_install, conn, c, ver
 
+_replay_spool()
+atexit.register(flush_games)
+
 # vim: set expandtab:sw=4:ts=4:
@@ -0,0 +1,49 @@
+-- upgrade script to migrate from version 5 to version 6
+-- the new tables are filled in by _rebuild_stats() in src/db.py
+
+-- Summary tables for the stats commands, kept up to date as games are added so that the
+-- commands do not need to aggregate over every game played. They can be checked against
+-- (and rebuilt from) the game tables with the checkstats command.
+
+-- Per-player totals
+CREATE TABLE player_stats (
+    player INTEGER NOT NULL PRIMARY KEY REFERENCES player(id) DEFERRABLE INITIALLY DEFERRED,
+    -- Number of games played
+    games INTEGER NOT NULL,
+    -- Number of games with either a team or an individual win
+    overall_wins INTEGER NOT NULL
+);
+
+-- Per-player totals for each role and special quality
+CREATE TABLE player_role_stats (
+    player INTEGER NOT NULL REFERENCES player(id) DEFERRABLE INITIALLY DEFERRED,
+    role TEXT NOT NULL COLLATE NOCASE,
+    team_wins INTEGER NOT NULL,
+    indiv_wins INTEGER NOT NULL,
+    overall_wins INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (player, role)
+);
+
+-- Number of games won by each team, per gamemode and game size
+CREATE TABLE game_stats (
+    gamemode TEXT NOT NULL COLLATE NOCASE,
+    gamesize INTEGER NOT NULL,
+    -- Winning team (NULL if no winner)
+    winner TEXT COLLATE NOCASE,
+    games INTEGER NOT NULL
+);
+
+CREATE INDEX game_stats_idx ON game_stats (gamemode, gamesize);
+CREATE INDEX game_stats_gamesize_idx ON game_stats (gamesize);
+
+-- Totals for each role and special quality, per gamemode
+CREATE TABLE role_stats (
+    role TEXT NOT NULL COLLATE NOCASE,
+    gamemode TEXT NOT NULL COLLATE NOCASE,
+    team_wins INTEGER NOT NULL,
+    indiv_wins INTEGER NOT NULL,
+    overall_wins INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (role, gamemode)
+);
@@ -18,13 +18,39 @@ from src.dispatcher import MessageDispatcher
 from src.utilities import *
 from src.functions import get_players
 from src.messages import messages
-from src import channels, users, logger, errlog, events
+from src import channels, users, logger, errlog, events, metrics
 
 adminlog = logger.logger("audit.log")
 
 COMMANDS = defaultdict(list)
 HOOKS = defaultdict(list)
 
+# For each phase, the commands which can be used in it; see get_dispatch_table()
+_dispatch_tables = {}
+
+def get_dispatch_table(phase):
+    """Return a dict of command name to the commands usable in the given phase.
+
+    Each value is a tuple of (commands, has_role_commands), where commands
+    are in the same order as in COMMANDS. Names which have no command usable
+    in the phase are not in the dict. The tables are built when first needed
+    and thrown away by invalidate_dispatch() when COMMANDS changes.
+
+    """
+    table = _dispatch_tables.get(phase)
+    if table is None:
+        table = {}
+        for name, fns in COMMANDS.items():
+            fns = tuple(fn for fn in fns if not fn.phases or phase in fn.phases)
+            if fns:
+                table[name] = (fns, any(fn.roles for fn in fns))
+        _dispatch_tables[phase] = table
+    return table
+
+def invalidate_dispatch():
+    """Must be called after adding commands to or removing them from COMMANDS."""
+    _dispatch_tables.clear()
+
 # Error handler decorators and context managers
 
 class _local(threading.local):
@@ -239,6 +265,7 @@ class command:
                     raise ValueError("exclusive command already exists for {0}".format(name))
 
             COMMANDS[name].append(self)
+            invalidate_dispatch()
             if name in botconfig.ALLOWED_ALT_CHANNELS_COMMANDS:
                 self.alt_allowed = True
             if name in getattr(botconfig, "OWNERS_ONLY_COMMANDS", ()):
@@ -258,6 +285,10 @@ class command:
         self.__doc__ = func.__doc__
         return self
 
+    def _run(self, *args):
+        with metrics.track(self.name):
+            return self.func(*args)
+
     @handle_error
     def caller(self, cli, rawnick, chan, rest):
         _ignore_locals_ = True
@@ -281,7 +312,7 @@ class command:
                 return # commands not allowed in alt channels
 
         if "" in self.commands:
-            self.func(var, dispatcher, rest)
+            self._run(var, dispatcher, rest)
             return
 
         if self.phases and var.PHASE not in self.phases:
@@ -302,7 +333,7 @@ class command:
             return
 
         if self.roles or (self.users is not None and user in self.users):
-            self.func(var, dispatcher, rest) # don't check restrictions for role commands
+            self._run(var, dispatcher, rest) # don't check restrictions for role commands
             # Role commands might end the night if it's nighttime
             if var.PHASE == "night":
                 from src.wolfgame import chk_nightdone
@@ -312,36 +343,39 @@ class command:
         if self.owner_only:
             if user.is_owner():
                 adminlog(chan, rawnick, self.name, rest)
-                self.func(var, dispatcher, rest)
+                self._run(var, dispatcher, rest)
                 return
 
+            metrics.denied(self.name)
             dispatcher.pm(messages["not_owner"])
             return
 
         temp = user.lower()
 
-        flags = var.FLAGS[temp.rawnick] + var.FLAGS_ACCS[temp.account] # TODO: add flags handling to User
-
         if self.flag and (user.is_admin() or user.is_owner()):
             adminlog(chan, rawnick, self.name, rest)
-            return self.func(var, dispatcher, rest)
-
-        denied_commands = var.DENY[temp.rawnick] | var.DENY_ACCS[temp.account] # TODO: add denied commands handling to User
+            return self._run(var, dispatcher, rest)
 
-        if self.commands & denied_commands:
+        # use .get() so that lookups don't fill the defaultdicts with empty entries
+        # TODO: add denied commands handling to User
+        if (not self.commands.isdisjoint(var.DENY.get(temp.rawnick, ())) or
+                not self.commands.isdisjoint(var.DENY_ACCS.get(temp.account, ()))):
+            metrics.denied(self.name)
             dispatcher.pm(messages["invalid_permissions"])
             return
 
         if self.flag:
+            flags = var.FLAGS.get(temp.rawnick, "") + var.FLAGS_ACCS.get(temp.account, "") # TODO: add flags handling to User
             if self.flag in flags:
                 adminlog(chan, rawnick, self.name, rest)
-                self.func(var, dispatcher, rest)
+                self._run(var, dispatcher, rest)
                 return
 
+            metrics.denied(self.name)
             dispatcher.pm(messages["not_an_admin"])
             return
 
-        self.func(var, dispatcher, rest)
+        self._run(var, dispatcher, rest)
 
 class cmd:
     def __init__(self, *cmds, raw_nick=False, flag=None, owner_only=False,
@@ -378,6 +412,7 @@ class cmd:
                     raise ValueError("exclusive command already exists for {0}".format(name))
 
             COMMANDS[name].append(self)
+            invalidate_dispatch()
             if alias:
                 self.aliases.append(name)
             alias = True
@@ -389,6 +424,10 @@ class cmd:
         self.__doc__ = self.func.__doc__
         return self
 
+    def _run(self, *args):
+        with metrics.track(self.name):
+            return self.func(*args)
+
     @handle_error
     def caller(self, cli, rawnick, chan, rest):
         _ignore_locals_ = True
@@ -436,7 +475,7 @@ class cmd:
         hostmask = nick + "!" + ident + "@" + host
 
         if "" in self.cmds:
-            self.func(*largs)
+            self._run(*largs)
             return
 
         if self.phases and var.PHASE not in self.phases:
@@ -460,7 +499,7 @@ class cmd:
             return
 
         if self.roles or (self.nicks is not None and nick in self.nicks):
-            self.func(*largs) # don't check restrictions for role commands
+            self._run(*largs) # don't check restrictions for role commands
             # Role commands might end the night if it's nighttime
             if var.PHASE == "night":
                 from src.wolfgame import chk_nightdone
@@ -478,25 +517,28 @@ class cmd:
         if self.owner_only or forced_owner_only:
             if owner:
                 adminlog(chan, rawnick, self.name, rest)
-                self.func(*largs)
+                self._run(*largs)
                 return
 
+            metrics.denied(self.name)
             if chan == nick:
                 pm(cli, nick, messages["not_owner"])
             else:
                 cli.notice(nick, messages["not_owner"])
             return
 
-        flags = var.FLAGS[hostmask] + var.FLAGS_ACCS[acc]
+        flags = var.FLAGS.get(hostmask, "") + var.FLAGS_ACCS.get(acc, "")
         admin = is_admin(rawnick)
         if self.flag and (admin or owner):
             adminlog(chan, rawnick, self.name, rest)
-            self.func(*largs)
+            self._run(*largs)
             return
 
-        denied_cmds = var.DENY[hostmask] | var.DENY_ACCS[acc]
+        denied_cmds = var.DENY.get(hostmask, frozenset())
+        denied_accs = var.DENY_ACCS.get(acc, frozenset())
         for command in self.cmds:
-            if command in denied_cmds:
+            if command in denied_cmds or command in denied_accs:
+                metrics.denied(self.name)
                 if chan == nick:
                     pm(cli, nick, messages["invalid_permissions"])
                 else:
@@ -506,15 +548,16 @@ class cmd:
         if self.flag:
             if self.flag in flags:
                 adminlog(chan, rawnick, self.name, rest)
-                self.func(*largs)
+                self._run(*largs)
                 return
-            elif chan == nick:
+            metrics.denied(self.name)
+            if chan == nick:
                 pm(cli, nick, messages["not_an_admin"])
             else:
                 cli.notice(nick, messages["not_an_admin"])
             return
 
-        self.func(*largs)
+        self._run(*largs)
 
 class hook:
     def __init__(self, name, hookid=-1):
@@ -1,19 +1,65 @@
 from src.messages import messages
-from src.events import Event
-from src.cats import Wolfteam, Neutral, Hidden
+from src.events import Event, EVENT_CALLBACKS
+from src.cats import Wolf, Wolfchat, Wolfteam, Killer, Neutral, Hidden
 from src import settings as var
 from src import users
+from src.containers import Container
 
 __all__ = [
-    "get_players", "get_all_players", "get_participants",
+    "get_players", "get_all_players", "get_participants", "get_team_counts",
     "get_target", "change_role",
     "get_main_role", "get_all_roles", "get_reveal_role",
     ]
 
+# Views of the game state (player lists, roles and the results of the events
+# which compute them), built as needed. They are dropped as soon as any
+# container changes (see Container.generation) or the phase changes. Views
+# which come from events are also keyed by the listeners of that event.
+_views = {}
+_views_state = None
+
+def _state():
+    return (Container.generation, var.PHASE)
+
+def _view(name, build):
+    global _views_state
+    state = _state()
+    if _views_state != state:
+        _views.clear()
+        _views_state = state
+
+    try:
+        value = _views[name]
+    except KeyError:
+        value = build()
+        if _state() == state: # building it didn't change anything
+            _views[name] = value
+        return value
+
+    if var.CHECK_CACHED_VIEWS:
+        fresh = build()
+        if fresh != value:
+            raise RuntimeError("Cached view {0!r} is outdated: {1!r} != {2!r}".format(name, value, fresh))
+    return value
+
+def _players_by_main_role():
+    byrole = {}
+    for user, role in var.MAIN_ROLES.items():
+        byrole.setdefault(role, set()).add(user)
+    return byrole
+
+def _roles_by_user():
+    byuser = {}
+    for role, players in var.ROLES.items():
+        for user in players:
+            byuser.setdefault(user, set()).add(role)
+    return byuser
+
 def get_players(roles=None, *, mainroles=None):
     from src.status import is_dying
     if mainroles is None:
-        mainroles = var.MAIN_ROLES
+        key = None if roles is None else frozenset(roles)
+        return list(_view(("players", key), lambda: _live_players(key)))
     if roles is None:
         roles = set(mainroles.values())
     pl = set()
@@ -27,10 +73,21 @@ def get_players(roles=None, *, mainroles=None):
         return list(pl)
     return [p for p in var.ALL_PLAYERS if p in pl and not is_dying(var, p)]
 
+def _live_players(roles):
+    from src.status import is_dying
+    byrole = _view("players_by_main_role", _players_by_main_role)
+    if roles is None:
+        roles = byrole.keys()
+    pl = set()
+    for role in roles:
+        pl.update(byrole.get(role, ()))
+    return tuple(p for p in var.ALL_PLAYERS if p in pl and not is_dying(var, p))
+
 def get_all_players(roles=None, *, rolemap=None):
     from src.status import is_dying
     if rolemap is None:
-        rolemap = var.ROLES
+        key = None if roles is None else frozenset(roles)
+        return set(_view(("all_players", key), lambda: _all_live_players(key)))
     if roles is None:
         roles = set(rolemap.keys())
     pl = set()
@@ -43,11 +100,55 @@ def get_all_players(roles=None, *, rolemap=None):
 
     return {p for p in pl if not is_dying(var, p)}
 
+def _all_live_players(roles):
+    from src.status import is_dying
+    if roles is None:
+        roles = var.ROLES.keys()
+    pl = set()
+    for role in roles:
+        pl.update(var.ROLES.get(role, ()))
+    return frozenset(p for p in pl if not is_dying(var, p))
+
 def get_participants():
     """List all players who are still able to participate in the game."""
+    return list(_view(("participants", EVENT_CALLBACKS.get("get_participants")), _participants))
+
+def _participants():
     evt = Event("get_participants", {"players": get_players()})
     evt.dispatch(var)
-    return evt.data["players"]
+    return tuple(evt.data["players"])
+
+def get_team_counts(*, mainroles=None):
+    """Return the numbers the win conditions are checked against.
+
+    This is a (players, wolves, real wolves) tuple of the living players,
+    which during the day only counts those who can vote. Wolves are the
+    players who count as wolves under RESTRICT_WOLFCHAT, and real wolves
+    are the players whose main role is both Wolf and Killer.
+
+    """
+    if mainroles is None or mainroles is var.MAIN_ROLES:
+        return _view(("team_counts", var.RESTRICT_WOLFCHAT, EVENT_CALLBACKS.get("get_voters")), _team_counts)
+    return _team_counts(mainroles)
+
+def _team_counts(mainroles=None):
+    if var.PHASE == "day":
+        evt = Event("get_voters", {"voters": set(get_players())})
+        evt.dispatch(var)
+        pl = evt.data["voters"]
+    else:
+        pl = set(get_players(mainroles=mainroles))
+
+    if var.RESTRICT_WOLFCHAT & var.RW_REM_NON_WOLVES:
+        if var.RESTRICT_WOLFCHAT & var.RW_TRAITOR_NON_WOLF:
+            wcroles = Wolf
+        else:
+            wcroles = Wolf | {"traitor"}
+    else:
+        wcroles = Wolfchat
+
+    wolves = pl.intersection(get_players(wcroles, mainroles=mainroles))
+    return (len(pl), len(wolves), len(get_players(Wolf & Killer, mainroles=mainroles)))
 
 def get_target(var, wrapper, message, *, allow_self=False, allow_bot=False, not_self_message=None):
     if not message:
@@ -103,20 +204,21 @@ def get_main_role(user):
         return role
     # not found in player list, see if they're a special participant
     if user in get_participants():
-        evt = Event("get_participant_role", {"role": None})
-        evt.dispatch(var, user)
-        role = evt.data["role"]
+        role = _view(("participant_role", user, EVENT_CALLBACKS.get("get_participant_role")), lambda: _participant_role(user))
     if role is None:
         raise ValueError("User {0} isn't playing and has no defined participant role".format(user))
     return role
 
 def get_all_roles(user):
-    return {role for role, users in var.ROLES.items() if user in users}
+    return set(_view("roles_by_user", _roles_by_user).get(user, ()))
 
-def get_reveal_role(user):
-    evt = Event("get_reveal_role", {"role": get_main_role(user)})
+def _participant_role(user):
+    evt = Event("get_participant_role", {"role": None})
     evt.dispatch(var, user)
-    role = evt.data["role"]
+    return evt.data["role"]
+
+def get_reveal_role(user):
+    role = _view(("reveal_role", user, EVENT_CALLBACKS.get("get_reveal_role")), lambda: _reveal_role(user))
 
     if var.ROLE_REVEAL != "team":
         return role
@@ -128,4 +230,9 @@ def get_reveal_role(user):
     else:
         return "village member"
 
+def _reveal_role(user):
+    evt = Event("get_reveal_role", {"role": get_main_role(user)})
+    evt.dispatch(var, user)
+    return evt.data["role"]
+
 # vim: set sw=4 expandtab:
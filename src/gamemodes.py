@@ -1,9 +1,7 @@
 import random
 import math
-import threading
 import copy
 import functools
-from datetime import datetime
 from collections import defaultdict, OrderedDict, Counter
 
 import botconfig
@@ -14,8 +12,8 @@ from src.functions import get_players, get_all_players, get_main_role, change_ro
 from src.decorators import handle_error, command
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.status import add_dying
-from src import events, channels, users, cats
-from src.cats import All, Wolf, Cursed, Innocent, Killer, Village, Neutral, Hidden, Team_Switcher, Win_Stealer, Spy, Nocturnal
+from src import events, channels, users, scheduler, cats
+from src.cats import All, Wolf, Wolfchat, Cursed, Innocent, Killer, Village, Neutral, Hidden, Team_Switcher, Win_Stealer, Spy, Nocturnal
 
 class InvalidModeException(Exception): pass
 
@@ -26,6 +24,51 @@ def game_mode(name, minp, maxp, likelihood=0):
         return c
     return decor
 
+def draw_main_roles(first, roles, size):
+    """Draw size main roles at random: one from first and the rest from roles.
+
+    Each role is drawn uniformly and independently, except that the roles
+    counting towards the wolf win condition must stay under half of the
+    players, as the game would otherwise be over before it started. The
+    number of such roles is drawn from the binomial distribution limited
+    to the allowed numbers, which gives every role set the same odds as
+    drawing until one is allowed, with a single draw. Return a Counter.
+
+    """
+    if var.RESTRICT_WOLFCHAT & var.RW_REM_NON_WOLVES: # same as in chk_win_conditions
+        if var.RESTRICT_WOLFCHAT & var.RW_TRAITOR_NON_WOLF:
+            wcroles = Wolf
+        else:
+            wcroles = Wolf | {"traitor"}
+    else:
+        wcroles = Wolfchat
+
+    wolves = [role for role in roles if role in wcroles]
+    others = [role for role in roles if role not in wcroles]
+    first = random.choice(first)
+    left = size - 1
+    most = min((size - 1) // 2 - (first in wcroles), left)
+
+    # weight of drawing exactly k wolves: C(left, k) * len(wolves) ** k * len(others) ** (left - k)
+    weights = []
+    ways = 1
+    for k in range(most + 1):
+        weights.append(ways * len(wolves) ** k * len(others) ** (left - k))
+        ways = ways * (left - k) // (k + 1)
+    if not any(weights):
+        raise ValueError("no set of {0} roles leaves the game undecided".format(size))
+
+    pick = random.randrange(sum(weights))
+    k = 0
+    while pick >= weights[k]:
+        pick -= weights[k]
+        k += 1
+
+    addroles = Counter(random.choice(wolves) for i in range(k))
+    addroles.update(random.choice(others) for i in range(left - k))
+    addroles[first] += 1
+    return addroles
+
 class GameMode:
     def __init__(self, arg=""):
         # Default values for the role sets and secondary roles restrictions
@@ -110,6 +153,22 @@ class GameMode:
                 if role not in chances:
                     chances[role] = value
 
+    def decides_game(self, chk_win_conditions, addroles):
+        """Return True if a game with these roles would be won right away."""
+        rolemap = defaultdict(set)
+        mainroles = {}
+        i = 0
+        for role, count in addroles.items():
+            if count > 0:
+                for j in range(count):
+                    u = users.FakeUser.from_nick(str(i + j))
+                    rolemap[role].add(u)
+                    if role not in self.SECONDARY_ROLES:
+                        mainroles[u] = role
+                i += count
+
+        return chk_win_conditions(rolemap, mainroles, end_game=False)
+
     # Here so any game mode can use it
     def lovers_chk_win(self, evt, var, rolemap, mainroles, lpl, lwolves, lrealwolves):
         winner = evt.data["winner"]
@@ -280,7 +339,7 @@ class VillagergameMode(GameMode):
         if rand <= 0 and nspecials > 0:
             transition_day(gameid=gameid)
         else:
-            t = threading.Timer(abs(rand), transition_day, kwargs={"gameid": gameid})
+            t = scheduler.Timer(abs(rand), transition_day, kwargs={"gameid": gameid})
             t.start()
 
     def transition_day(self, evt, var):
@@ -599,32 +658,17 @@ class RandomMode(GameMode):
         events.remove_listener("chk_win", self.lovers_chk_win)
 
     def role_attribution(self, evt, var, chk_win_conditions, villagers):
-        lpl = len(villagers) - 1
-        addroles = evt.data["addroles"]
-        addroles[random.choice(list(Wolf & Killer))] += 1 # make sure there's at least one wolf role
         roles = list(All - self.SECONDARY_ROLES.keys() - {"villager", "cultist", "amnesiac"})
-        while lpl:
-            addroles[random.choice(roles)] += 1
-            lpl -= 1
-
-        addroles["gunner/sharpshooter"] = random.randrange(int(len(villagers) ** 1.2 / 4))
-        addroles["assassin"] = random.randrange(max(int(len(villagers) ** 1.2 / 8), 1))
-
-        rolemap = defaultdict(set)
-        mainroles = {}
-        i = 0
-        for role, count in addroles.items():
-            if count > 0:
-                for j in range(count):
-                    u = users.FakeUser.from_nick(str(i + j))
-                    rolemap[role].add(u.nick)
-                    if role not in self.SECONDARY_ROLES:
-                        mainroles[u] = role
-                i += count
-
-        if chk_win_conditions(rolemap, mainroles, end_game=False):
-            return self.role_attribution(evt, var, chk_win_conditions, villagers)
-
+        while True:
+            # make sure there's at least one wolf role
+            addroles = draw_main_roles(list(Wolf & Killer), roles, len(villagers))
+            addroles["gunner/sharpshooter"] = random.randrange(int(len(villagers) ** 1.2 / 4))
+            addroles["assassin"] = random.randrange(max(int(len(villagers) ** 1.2 / 8), 1))
+            # draw_main_roles() already rules out the usual wins; this catches anything else
+            if not self.decides_game(chk_win_conditions, addroles):
+                break
+
+        evt.data["addroles"].update(addroles)
         evt.prevent_default = True
 
 # Credits to Metacity for designing and current name
@@ -824,6 +868,7 @@ class SleepyMode(GameMode):
                 decorators.COMMANDS[name].remove(command)
             else:
                 del decorators.COMMANDS[name]
+            decorators.invalidate_dispatch()
         remove_command("north", self.north_cmd)
         remove_command("n", self.north_cmd)
         remove_command("east", self.east_cmd)
@@ -841,7 +886,7 @@ class SleepyMode(GameMode):
     def setup_nightmares(self, evt, var):
         if random.random() < 1/5:
             with var.WARNING_LOCK:
-                t = threading.Timer(60, self.do_nightmare, (var, random.choice(get_players()), var.NIGHT_COUNT))
+                t = scheduler.Timer(60, self.do_nightmare, (var, random.choice(get_players()), var.NIGHT_COUNT))
                 t.daemon = True
                 t.start()
 
@@ -1057,7 +1102,8 @@ class MaelstromMode(GameMode):
         var.FINAL_ROLES[wrapper.source.nick] = role # FIXME: once FINAL_ROLES stores users
         var.MAIN_ROLES[wrapper.source] = role
         var.ORIGINAL_MAIN_ROLES[wrapper.source] = role
-        var.LAST_SAID_TIME[wrapper.source.nick] = datetime.now()
+        from src.wolfgame import reset_idle
+        reset_idle(wrapper.source.nick)
         if wrapper.source.nick in var.USERS:
             var.PLAYERS[wrapper.source.nick] = var.USERS[wrapper.source.nick]
 
@@ -1114,38 +1160,20 @@ class MaelstromMode(GameMode):
                 var.ORIGINAL_MAIN_ROLES[p] = role
 
     def _role_attribution(self, var, villagers, do_templates):
-        lpl = len(villagers) - 1
-        addroles = Counter()
-        addroles[random.choice(list(Wolf & Killer))] += 1 # make sure there's at least one wolf role
-        roles = list(self.roles)
-        while lpl:
-            addroles[random.choice(roles)] += 1
-            lpl -= 1
-
-        if do_templates:
-            addroles["gunner/sharpshooter"] = random.randrange(6)
-            addroles["assassin"] = random.randrange(3)
-            addroles["cursed villager"] = random.randrange(3)
-            addroles["mayor"] = random.randrange(2)
-            if random.randrange(100) == 0 and addroles.get("villager", 0) > 0:
-                addroles["blessed villager"] = 1
-
-        rolemap = defaultdict(set)
-        mainroles = {}
-        i = 0
-        for role, count in addroles.items():
-            if count > 0:
-                for j in range(count):
-                    u = users.FakeUser.from_nick(str(i + j))
-                    rolemap[role].add(u)
-                    if role not in self.SECONDARY_ROLES:
-                        mainroles[u] = role
-                i += count
-
-        if self.chk_win_conditions(rolemap, mainroles, end_game=False):
-            return self._role_attribution(var, villagers, do_templates)
-
-        return addroles
+        while True:
+            # make sure there's at least one wolf role
+            addroles = draw_main_roles(list(Wolf & Killer), list(self.roles), len(villagers))
+
+            if do_templates:
+                addroles["gunner/sharpshooter"] = random.randrange(6)
+                addroles["assassin"] = random.randrange(3)
+                addroles["cursed villager"] = random.randrange(3)
+                addroles["mayor"] = random.randrange(2)
+                if random.randrange(100) == 0 and addroles.get("villager", 0) > 0:
+                    addroles["blessed villager"] = 1
+
+            if not self.decides_game(self.chk_win_conditions, addroles):
+                return addroles
 
 # someone let woffle commit while drunk again... tsk tsk
 @game_mode("mudkip", minp=5, maxp=15, likelihood=5)
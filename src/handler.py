@@ -3,7 +3,6 @@
 import base64
 import socket
 import sys
-import threading
 import time
 import traceback
 import functools
@@ -12,7 +11,7 @@ import math
 
 import botconfig
 import src.settings as var
-from src import decorators, wolfgame, events, channels, hooks, users, errlog as log, stream_handler as alog
+from src import decorators, wolfgame, events, channels, hooks, users, scheduler, errlog as log, stream_handler as alog
 from src.messages import messages
 from src.functions import get_participants, get_all_roles
 from src.dispatcher import MessageDispatcher
@@ -45,7 +44,7 @@ def on_privmsg(cli, rawnick, chan, msg, *, notice=False, force_role=None):
         return  # not allowed in settings
 
     if force_role is None: # if force_role isn't None, that indicates recursion; don't fire these off twice
-        for fn in decorators.COMMANDS[""]:
+        for fn in decorators.get_dispatch_table(var.PHASE).get("", ((), False))[0]:
             fn.caller(cli, rawnick, ch, msg)
 
     parts = msg.split(sep=" ", maxsplit=1)
@@ -64,11 +63,20 @@ def on_privmsg(cli, rawnick, chan, msg, *, notice=False, force_role=None):
     if not key: # empty key ("") already handled above
         return
 
-    # Don't change this into decorators.COMMANDS[key] even though it's a defaultdict,
-    # as we don't want to insert bogus command keys into the dict.
-    cmds = []
+    # Only the commands which can be used in this phase are in the table
     phase = var.PHASE
-    if user in get_participants():
+    table = decorators.get_dispatch_table(phase)
+    if key not in table:
+        return
+
+    fns, has_role_cmds = table[key]
+    cmds = []
+    if not has_role_cmds:
+        # nothing here depends on the user's roles
+        if force_role is not None:
+            return # see below
+        cmds = fns
+    elif user in get_participants():
         roles = get_all_roles(user)
         # A user can be a participant but not have a role, for example, dead vengeful ghost
         has_roles = len(roles) != 0
@@ -77,7 +85,7 @@ def on_privmsg(cli, rawnick, chan, msg, *, notice=False, force_role=None):
 
         common_roles = set(roles) # roles shared by every eligible role command
         have_role_cmd = False
-        for fn in decorators.COMMANDS.get(key, []):
+        for fn in fns:
             if not fn.roles:
                 cmds.append(fn)
                 continue
@@ -118,7 +126,7 @@ def on_privmsg(cli, rawnick, chan, msg, *, notice=False, force_role=None):
             wrapper.pm(messages["ambiguous_command"].format(key, info[0], info[1]))
             return
     elif force_role is None:
-        cmds = decorators.COMMANDS.get(key, [])
+        cmds = fns
 
     for fn in cmds:
         if phase == var.PHASE:
@@ -282,7 +290,7 @@ def connect_callback(cli):
             def ping_server_timer(cli):
                 ping_server(cli)
 
-                t = threading.Timer(var.SERVER_PING_INTERVAL, ping_server_timer, args=(cli,))
+                t = scheduler.Timer(var.SERVER_PING_INTERVAL, ping_server_timer, args=(cli,))
                 t.daemon = True
                 t.start()
 
@@ -339,7 +347,7 @@ def connect_callback(cli):
         hook("unavailresource", hookid=240)(mustrelease)
         hook("nicknameinuse", hookid=241)(mustregain)
 
-    request_caps = {"account-notify", "extended-join", "multi-prefix", "chghost"}
+    request_caps = {"account-notify", "away-notify", "extended-join", "multi-prefix", "chghost"}
 
     if botconfig.SASL_AUTHENTICATION:
         request_caps.add("sasl")
@@ -694,4 +694,27 @@ def on_chghost(cli, rawnick, ident, host):
             chan.users.add(new)
         user.swap(new)
 
+        Event("host_change", {}).dispatch(var, user, new)
+
+### AWAY handling
+
+@hook("away")
+def on_away(cli, rawnick, message=None):
+    """Handle a user going away or coming back, if enabled.
+
+    Ordering and meaning of arguments for an AWAY notification:
+
+    0 - The IRCClient instance (like everywhere else)
+    1 - The raw nick (nick!ident@host) of the user
+    2 - The away message, or None if the user came back
+
+    This fires off the "away_change" event, and dispatches it with three
+    arguments: the game state namespace, the User, and whether they are
+    now away. We only get these if the away-notify capability is enabled.
+
+    """
+
+    user = users._get(rawnick) # FIXME
+    Event("away_change", {}).dispatch(var, user, message is not None)
+
 # vim: set sw=4 expandtab:
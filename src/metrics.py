@@ -0,0 +1,167 @@
+"""Counters and latency histograms for bot commands.
+
+The command decorators record every command they run here. The numbers
+can be seen with !fperf, or scraped in the Prometheus text format from a
+local HTTP port if METRICS_PORT is set.
+
+"""
+
+import bisect
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+__all__ = ["track", "denied", "rate_limited", "add_db_time", "get_command_stats", "exposition", "start_server"]
+
+# upper bounds (in seconds) of the latency histogram buckets; the last bucket is for longer runs
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class CommandStats:
+    __slots__ = ("calls", "denied", "rate_limited", "errors", "total", "db_total", "longest", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.denied = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.total = 0.0
+        self.db_total = 0.0
+        self.longest = 0.0
+        self.histogram = [0] * (len(latency_buckets) + 1)
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket the given fraction of calls falls in."""
+        wanted = self.calls * fraction
+        seen = 0
+        for bound, count in zip(latency_buckets, self.histogram):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.longest)
+        return self.longest
+
+_stats = {}
+_lock = threading.Lock()
+# the command running on this thread and the time it spent in the database so far
+_local = threading.local()
+
+def _get(name):
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = CommandStats()
+    return stats
+
+class track:
+    """Context manager which records one run of a command."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.outer = (getattr(_local, "command", None), getattr(_local, "db_time", 0.0))
+        _local.command = self.name
+        _local.db_time = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        elapsed = time.perf_counter() - self.start
+        db_time = _local.db_time
+        # a command may run another one (e.g. role commands); the outer one includes its time
+        _local.command, _local.db_time = self.outer[0], self.outer[1] + db_time
+        with _lock:
+            stats = _get(self.name)
+            stats.calls += 1
+            stats.total += elapsed
+            stats.db_total += db_time
+            stats.longest = max(stats.longest, elapsed)
+            stats.histogram[bisect.bisect_left(latency_buckets, elapsed)] += 1
+            if exc_type is not None:
+                stats.errors += 1
+        return False
+
+def denied(name):
+    """Record that someone was not allowed to use a command."""
+    with _lock:
+        _get(name).denied += 1
+
+def rate_limited():
+    """Record that the running command was refused because of rate limiting."""
+    name = getattr(_local, "command", None)
+    if name is not None:
+        with _lock:
+            _get(name).rate_limited += 1
+
+def add_db_time(elapsed):
+    """Add time spent in the database to the running command."""
+    _local.db_time = getattr(_local, "db_time", 0.0) + elapsed
+
+def get_command_stats():
+    """Return a dict of command name to a copy of its CommandStats."""
+    with _lock:
+        copies = {}
+        for name, stats in _stats.items():
+            new = copies[name] = CommandStats()
+            for attr in CommandStats.__slots__:
+                setattr(new, attr, getattr(stats, attr))
+            new.histogram = list(stats.histogram)
+        return copies
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+_counters = (
+    ("calls", "lykos_command_calls_total", "Number of times a command was run"),
+    ("denied", "lykos_command_denied_total", "Number of times someone was not allowed to use a command"),
+    ("rate_limited", "lykos_command_rate_limited_total", "Number of times a command was refused due to rate limiting"),
+    ("errors", "lykos_command_errors_total", "Number of times a command raised an exception"),
+    ("db_total", "lykos_command_db_seconds_total", "Time commands spent in database calls"),
+)
+
+def exposition():
+    """Return the command metrics in the Prometheus text format."""
+    stats = get_command_stats()
+    lines = []
+    for attr, metric, doc in _counters:
+        lines.append("# HELP {0} {1}".format(metric, doc))
+        lines.append("# TYPE {0} counter".format(metric))
+        for name in sorted(stats):
+            lines.append("{0}{{command=\"{1}\"}} {2}".format(metric, _label(name), getattr(stats[name], attr)))
+
+    metric = "lykos_command_duration_seconds"
+    lines.append("# HELP {0} Time taken to run a command".format(metric))
+    lines.append("# TYPE {0} histogram".format(metric))
+    for name in sorted(stats):
+        command = _label(name)
+        cumulative = 0
+        for bound, count in zip(latency_buckets + ("+Inf",), stats[name].histogram):
+            cumulative += count
+            lines.append("{0}_bucket{{command=\"{1}\",le=\"{2}\"}} {3}".format(metric, command, bound, cumulative))
+        lines.append("{0}_sum{{command=\"{1}\"}} {2}".format(metric, command, stats[name].total))
+        lines.append("{0}_count{{command=\"{1}\"}} {2}".format(metric, command, stats[name].calls))
+
+    lines.append("")
+    return "\n".join(lines)
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # don't clutter the bot's output with every scrape
+
+def start_server(host, port):
+    """Serve the metrics over HTTP from a thread of their own."""
+    server = HTTPServer((host, port), _Handler)
+    threading.Thread(None, server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+# vim: set sw=4 expandtab:
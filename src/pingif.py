@@ -0,0 +1,148 @@
+"""Find who to ping when enough players have joined a game.
+
+The !pingif preferences are kept in the PING_IF_NUMS and PING_IF_NUMS_ACCS
+tracking vars, which map each player count to the accounts and hostmasks
+wanting a ping at that count. This module keeps the other half: the
+members of the main channel by account and by hostmask, along with who
+is away. It follows the channel through the join, part, kick, quit,
+account, host and away events, so finding who to ping needs neither a WHO
+nor any database query.
+
+"""
+
+from src.containers import UserDict, UserSet
+from src.decorators import event_listener
+from src import channels, users, settings as var
+
+__all__ = ["get_pingers"]
+
+_accounts = {} # lowercased account -> UserSet of members
+_hosts = {} # lowercased ident@host -> UserSet of members
+_keys = UserDict() # member -> (account, userhost) they are filed under
+_away = UserSet()
+
+def _add(user):
+    if user is users.Bot or user in _keys:
+        return
+    temp = user.lower()
+    _keys[user] = (temp.account, temp.userhost)
+    for index, key in ((_accounts, temp.account), (_hosts, temp.userhost)):
+        if key is not None:
+            if key not in index:
+                index[key] = UserSet()
+            index[key].add(user)
+
+def _discard(user):
+    keys = _keys.pop(user, None)
+    if keys is None:
+        return
+    for index, key in zip((_accounts, _hosts), keys):
+        members = index.get(key)
+        if members is not None:
+            members.discard(user)
+            if not members:
+                del index[key]
+
+def _forget(user):
+    _discard(user)
+    _away.discard(user)
+
+def _reset():
+    for index in (_accounts, _hosts):
+        for members in index.values():
+            members.clear()
+        index.clear()
+    _keys.clear()
+    _away.clear()
+
+def get_pingers(count):
+    """Return who wants to be pinged once count players have joined.
+
+    This is a dict of channel members who are not away, to a list of the
+    lowercased account and userhost their preference is set on. Either
+    of these is None if there is no preference on it at or below count.
+
+    """
+    found = {}
+    if not var.DISABLE_ACCOUNTS:
+        for num, accounts in var.PING_IF_NUMS_ACCS.items():
+            if num <= count:
+                for acc in accounts:
+                    for user in _accounts.get(acc, ()):
+                        if user not in _away:
+                            found[user] = [acc, None]
+
+    if not var.ACCOUNTS_ONLY:
+        for num, hostmasks in var.PING_IF_NUMS.items():
+            if num <= count:
+                for hostmask in hostmasks:
+                    for user in _hosts.get(hostmask, ()):
+                        if user not in _away:
+                            found.setdefault(user, [None, None])[1] = hostmask
+
+    return found
+
+@event_listener("who_result")
+def on_who_result(evt, var, chan, user):
+    if chan is channels.Main:
+        _add(user)
+        if evt.params.away:
+            _away.add(user)
+        else:
+            _away.discard(user)
+
+@event_listener("chan_join")
+def on_join(evt, var, chan, user):
+    if chan is channels.Main:
+        if user is users.Bot:
+            _reset() # our WHO of the channel will fill this in
+        else:
+            _add(user)
+
+@event_listener("chan_part")
+def on_part(evt, var, chan, user, reason):
+    if chan is channels.Main:
+        if user is users.Bot:
+            _reset()
+        else:
+            _forget(user)
+
+@event_listener("chan_kick")
+def on_kick(evt, var, chan, actor, user, reason):
+    if chan is channels.Main:
+        if user is users.Bot:
+            _reset()
+        else:
+            _forget(user)
+
+@event_listener("server_quit")
+def on_quit(evt, var, user, reason):
+    if user is users.Bot:
+        _reset()
+    else:
+        _forget(user)
+
+@event_listener("cleanup_user")
+def on_cleanup_user(evt, var, user):
+    _forget(user)
+
+@event_listener("account_change")
+def on_account_change(evt, var, user):
+    if user in _keys:
+        _discard(user)
+        _add(user)
+
+@event_listener("host_change")
+def on_host_change(evt, var, old, new):
+    # the old user left the channel before being swapped out for the new one
+    if channels.Main in new.channels:
+        _add(new)
+
+@event_listener("away_change")
+def on_away_change(evt, var, user, away):
+    if away and user in _keys:
+        _away.add(user)
+    else:
+        _away.discard(user)
+
+# vim: set sw=4 expandtab:
@@ -7,6 +7,7 @@ from src.functions import get_players, get_all_players, get_all_roles, get_targe
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_lycanthropy, add_lycanthropy_scope
 from src.cats import Wolf, All
 from src.roles.helper.wolves import is_known_wolf_ally, send_wolfchat_message, get_wolfchat_roles, register_killer
@@ -114,8 +115,7 @@ def on_transition_night_end(evt, var):
     can_bite = get_all_players(("alpha wolf",)) - ALPHAS
     if can_bite:
         for alpha in can_bite:
-            alpha.queue_message(messages["wolf_bite"])
-        alpha.send_messages()
+            alpha.queue_message(messages["wolf_bite"], priority=PRIORITY_GAME)
 
 @event_listener("get_role_metadata")
 def on_get_role_metadata(evt, var, kind):
@@ -11,6 +11,7 @@ from src.functions import get_players, get_all_players, get_target, get_main_rol
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_protection, add_dying
 from src.cats import Wolf
 
@@ -122,7 +123,7 @@ def on_transition_night_end(evt, var):
         to_send = "guardian_angel_notify"
         if gangel.prefers_simple():
             to_send = "guardian_angel_simple"
-        gangel.send(messages[to_send].format(warning, gself), messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        gangel.queue_message((messages[to_send].format(warning, gself), messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("player_protected")
 def on_player_protected(evt, var, target, attacker, attacker_role, protector, protector_role, reason):
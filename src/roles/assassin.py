@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 from src.status import try_misdirection, try_exchange, try_protection, add_dying
 
@@ -78,10 +79,10 @@ def on_transition_night_end(evt, var):
             PREV_ACTED.add(ass)
         else:
             if ass.prefers_simple():
-                ass.send(messages["assassin_simple"])
+                ass.queue_message(messages["assassin_simple"], priority=PRIORITY_GAME)
             else:
-                ass.send(messages["assassin_notify"])
-            ass.send(messages["players_list"].format(", ".join(p.nick for p in pl)))
+                ass.queue_message(messages["assassin_notify"], priority=PRIORITY_GAME)
+            ass.queue_message(messages["players_list"].format(", ".join(p.nick for p in pl)), priority=PRIORITY_GAME)
 
 @event_listener("del_player")
 def on_del_player(evt, var, player, all_roles, death_triggers):
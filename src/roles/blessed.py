@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 @event_listener("transition_night_end", priority=5)
@@ -20,7 +21,7 @@ def on_transition_night_end(evt, var):
             to_send = "blessed_notify"
             if blessed.prefers_simple():
                 to_send = "blessed_simple"
-            blessed.send(messages[to_send])
+            blessed.queue_message(messages[to_send], priority=PRIORITY_GAME)
 
 @event_listener("myrole")
 def on_myrole(evt, var, user):
@@ -11,6 +11,7 @@ from src.functions import get_players, get_all_players, get_target, get_main_rol
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_protection, add_dying
 from src.cats import Wolf
 
@@ -109,7 +110,7 @@ def on_transition_night_end(evt, var):
         to_send = "bodyguard_notify"
         if bg.prefers_simple():
             to_send = "bodyguard_simple"
-        bg.send(messages[to_send].format(warning), messages["players_list"].format(", ".join(p.nick for p in pl), sep="\n"))
+        bg.queue_message((messages[to_send].format(warning), messages["players_list"].format(", ".join(p.nick for p in pl), sep="\n")), priority=PRIORITY_GAME)
 
 @event_listener("try_protection")
 def on_try_protection(evt, var, target, attacker, attacker_role, reason):
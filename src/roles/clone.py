@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Win_Stealer
 
@@ -97,10 +98,10 @@ def on_transition_night_end(evt, var):
         random.shuffle(pl)
         pl.remove(clone)
         if clone.prefers_simple():
-            clone.send(messages["clone_simple"])
+            clone.queue_message(messages["clone_simple"], priority=PRIORITY_GAME)
         else:
-            clone.send(messages["clone_notify"])
-        clone.send(messages["players_list"].format(", ".join(p.nick for p in pl)))
+            clone.queue_message(messages["clone_notify"], priority=PRIORITY_GAME)
+        clone.queue_message(messages["players_list"].format(", ".join(p.nick for p in pl)), priority=PRIORITY_GAME)
 
 @event_listener("chk_nightdone")
 def on_chk_nightdone(evt, var):
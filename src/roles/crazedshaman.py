@@ -10,6 +10,7 @@ from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.dispatcher import MessageDispatcher
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Win_Stealer
 
@@ -77,10 +78,10 @@ def on_transition_night_end(evt, var):
                 TOTEMS[shaman] = t
                 break
         if shaman.prefers_simple():
-            shaman.send(messages["shaman_simple"].format("crazed shaman"))
+            shaman.queue_message(messages["shaman_simple"].format("crazed shaman"), priority=PRIORITY_GAME)
         else:
-            shaman.send(messages["shaman_notify"].format("crazed shaman", "random "))
-        shaman.send(messages["players_list"].format(", ".join(p.nick for p in pl)))
+            shaman.queue_message(messages["shaman_notify"].format("crazed shaman", "random "), priority=PRIORITY_GAME)
+        shaman.queue_message(messages["players_list"].format(", ".join(p.nick for p in pl)), priority=PRIORITY_GAME)
 
 @event_listener("get_role_metadata")
 def on_get_role_metadata(evt, var, kind):
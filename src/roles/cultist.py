@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Hidden
 
@@ -25,8 +26,7 @@ def on_transition_night_end(evt, var):
                 to_send = "cultist_notify"
                 if cultist.prefers_simple():
                     to_send = "cultist_simple"
-                cultist.queue_message(messages[to_send])
-            cultist.send_messages()
+                cultist.queue_message(messages[to_send], priority=PRIORITY_GAME)
 
 @event_listener("chk_win", priority=3)
 def on_chk_win(evt, var, rolemap, mainroles, lpl, lwolves, lrealwolves):
@@ -10,15 +10,16 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 @event_listener("transition_night_end")
 def on_transition_night_end(evt, var):
     for demoniac in get_all_players(("demoniac",)):
         if demoniac.prefers_simple():
-            demoniac.send(messages["demoniac_simple"])
+            demoniac.queue_message(messages["demoniac_simple"], priority=PRIORITY_GAME)
         else:
-            demoniac.send(messages["demoniac_notify"])
+            demoniac.queue_message(messages["demoniac_notify"], priority=PRIORITY_GAME)
 
 # monster is at priority 4, and we want demoniac to take precedence
 @event_listener("chk_win", priority=4.1) # FIXME: Kill the priorities
@@ -9,6 +9,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_targe
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.events import Event
 from src.cats import Wolf, Wolfchat
@@ -80,7 +81,7 @@ def on_transition_night_end(evt, var):
         to_send = "detective_notify"
         if dttv.prefers_simple():
             to_send = "detective_simple"
-        dttv.send(messages[to_send].format(warning), messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        dttv.queue_message((messages[to_send].format(warning), messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("transition_night_begin")
 def on_transition_night_begin(evt, var):
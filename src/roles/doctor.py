@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 from src.status import try_misdirection, try_exchange, remove_lycanthropy, remove_disease
 
@@ -63,10 +64,10 @@ def on_transition_night_end(evt, var):
             pl = ps[:]
             random.shuffle(pl)
             if doctor.prefers_simple():
-                doctor.send(messages["doctor_simple"])
+                doctor.queue_message(messages["doctor_simple"], priority=PRIORITY_GAME)
             else:
-                doctor.send(messages["doctor_notify"])
-            doctor.send(messages["doctor_immunizations"].format(DOCTORS[doctor], "s" if DOCTORS[doctor] > 1 else ""))
+                doctor.queue_message(messages["doctor_notify"], priority=PRIORITY_GAME)
+            doctor.queue_message(messages["doctor_immunizations"].format(DOCTORS[doctor], "s" if DOCTORS[doctor] > 1 else ""), priority=PRIORITY_GAME)
 
 @event_listener("revealroles")
 def on_revealroles(evt, var, wrapper):
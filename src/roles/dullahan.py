@@ -9,6 +9,7 @@ from src import users, channels, debuglog, errlog, plog
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 from src.status import try_misdirection, try_exchange, try_protection, add_dying
 
@@ -138,14 +139,14 @@ def on_transition_night_end(evt, var):
             if target in var.DEAD:
                 targets.remove(target)
         if not targets: # already all dead
-            dullahan.send("{0} {1}".format(messages["dullahan_simple"], messages["dullahan_targets_dead"]))
+            dullahan.queue_message("{0} {1}".format(messages["dullahan_simple"], messages["dullahan_targets_dead"]), priority=PRIORITY_GAME)
             continue
         random.shuffle(targets)
         to_send = "dullahan_notify"
         if dullahan.prefers_simple():
             to_send = "dullahan_simple"
         t = messages["dullahan_targets"] if targets == list(TARGETS[dullahan]) else messages["dullahan_remaining_targets"]
-        dullahan.send(messages[to_send], t + ", ".join(t.nick for t in targets), sep="\n")
+        dullahan.queue_message((messages[to_send], t + ", ".join(t.nick for t in targets)), priority=PRIORITY_GAME)
 
 @event_listener("succubus_visit")
 def on_succubus_visit(evt, var, succubus, target):
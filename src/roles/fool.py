@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 VOTED = None # type: Optional[users.User]
@@ -45,9 +46,9 @@ def on_player_win(evt, var, player, role, winner, survived):
 def on_transition_night_end(evt, var):
     for fool in get_all_players(("fool",)):
         if fool.prefers_simple():
-            fool.send(messages["fool_simple"])
+            fool.queue_message(messages["fool_simple"], priority=PRIORITY_GAME)
         else:
-            fool.send(messages["fool_notify"])
+            fool.queue_message(messages["fool_notify"], priority=PRIORITY_GAME)
 
 @event_listener("reset")
 def on_reset(evt, var):
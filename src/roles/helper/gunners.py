@@ -5,6 +5,7 @@ from src.decorators import command, event_listener
 from src.containers import UserDict
 from src.functions import get_players, get_all_players, get_target, get_main_role, get_reveal_role
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_dying, kill_players, add_absent
 from src.events import Event
 from src.cats import Wolf, Wolfchat
@@ -85,9 +86,9 @@ def setup_variables(rolename):
         for gunner in get_all_players((rolename,)):
             if GUNNERS[gunner]:
                 if gunner.prefers_simple(): # gunner and sharpshooter share the same key for simple
-                    gunner.send(messages["gunner_simple"].format(rolename, GUNNERS[gunner], "s" if GUNNERS[gunner] > 1 else ""))
+                    gunner.queue_message(messages["gunner_simple"].format(rolename, GUNNERS[gunner], "s" if GUNNERS[gunner] > 1 else ""), priority=PRIORITY_GAME)
                 else:
-                    gunner.send(messages["{0}_notify".format(rolename)].format(botconfig.CMD_CHAR, GUNNERS[gunner], "s" if GUNNERS[gunner] > 1 else ""))
+                    gunner.queue_message(messages["{0}_notify".format(rolename)].format(botconfig.CMD_CHAR, GUNNERS[gunner], "s" if GUNNERS[gunner] > 1 else ""), priority=PRIORITY_GAME)
 
     @event_listener("transition_day_resolve_end", priority=4)
     def on_transition_day_resolve_end(evt, var, victims):
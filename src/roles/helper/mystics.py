@@ -8,6 +8,7 @@ from src.functions import get_players, get_all_players
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 
 # Generated message keys used in this file:
@@ -53,8 +54,8 @@ def setup_variables(rolename, *, send_role, types):
             LAST_COUNT[mystic] = (value, plural)
             if send_role:
                 to_send = "{0}_{1}".format(role, ("simple" if mystic.prefers_simple() else "notify"))
-                mystic.send(messages[to_send])
-            mystic.send(msg)
+                mystic.queue_message(messages[to_send], priority=PRIORITY_GAME)
+            mystic.queue_message(msg, priority=PRIORITY_GAME)
 
     @event_listener("new_role")
     def on_new_role(evt, var, player, old_role):
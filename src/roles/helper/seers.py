@@ -8,6 +8,7 @@ from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.functions import get_players, get_all_players, get_main_role
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 
 def setup_variables(rolename):
@@ -43,7 +44,7 @@ def setup_variables(rolename):
             to_send = "seer_role_info"
             if seer.prefers_simple():
                 to_send = "seer_simple"
-            seer.send(messages[to_send].format(a, rolename, what), messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+            seer.queue_message((messages[to_send].format(a, rolename, what), messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
     @event_listener("begin_day")
     def on_begin_day(evt, var):
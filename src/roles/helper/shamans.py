@@ -289,6 +289,14 @@ def on_chk_decision(evt, var, force):
             nl.remove(p)
     evt.data["not_lynching"].update(nl)
 
+    if not (IMPATIENCE or PACIFISM or INFLUENCE):
+        # no totem changes anything, so every vote counts once
+        for votee, voters in evt.data["votelist"].items():
+            if voters:
+                evt.data["weights"][votee] = dict.fromkeys(voters, 1)
+            evt.data["numvotes"][votee] = len(voters)
+        return
+
     for votee, voters in evt.data["votelist"].items():
         numvotes = 0
         random.shuffle(IMPATIENCE)
@@ -9,6 +9,7 @@ from src.functions import get_main_role, get_players, get_all_roles, get_all_pla
 from src.decorators import event_listener, command
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.events import Event
 from src.cats import Wolf, Wolfchat, Wolfteam, Killer, Hidden
@@ -267,14 +268,14 @@ def on_transition_night_end(evt, var):
                     tags2 = " ".join(wevt.data["tags"] - {"cursed"})
                     if tags2:
                         tags2 += " "
-                    wolf.send(messages[cmsg].format(tags2))
+                    wolf.queue_message(messages[cmsg].format(tags2), priority=PRIORITY_GAME)
                 except KeyError:
-                    wolf.send(messages[msg].format(tags))
+                    wolf.queue_message(messages[msg].format(tags), priority=PRIORITY_GAME)
             else:
-                wolf.send(messages[msg].format(tags))
+                wolf.queue_message(messages[msg].format(tags), priority=PRIORITY_GAME)
 
             if len(wolves) > 1 and wccond is not None and role in talkroles:
-                wolf.send(messages["wolfchat_notify"].format(wccond))
+                wolf.queue_message(messages["wolfchat_notify"].format(wccond), priority=PRIORITY_GAME)
         else:
             an = ""
             if tags:
@@ -282,13 +283,13 @@ def on_transition_night_end(evt, var):
                     an = "n"
             elif role.startswith(("a", "e", "i", "o", "u")):
                 an = "n"
-            wolf.send(messages["wolf_simple"].format(an, tags, role))  # !simple
+            wolf.queue_message(messages["wolf_simple"].format(an, tags, role), priority=PRIORITY_GAME)  # !simple
 
 
         if wolf not in KNOWS_MINIONS:
             minions = len(get_all_players(("minion",)))
             if minions > 0:
-                wolf.send(messages["has_minions"].format(minions, plural("minion", minions)))
+                wolf.queue_message(messages["has_minions"].format(minions, plural("minion", minions)), priority=PRIORITY_GAME)
             KNOWS_MINIONS.add(wolf)
 
         pl = ps[:]
@@ -317,11 +318,11 @@ def on_transition_night_end(evt, var):
                 else:
                     players.append(player.nick)
 
-        wolf.send(messages["players_list"].format(", ".join(players)))
+        wolf.queue_message(messages["players_list"].format(", ".join(players)), priority=PRIORITY_GAME)
         nevt = Event("wolf_numkills", {"numkills": 1, "message": ""})
         nevt.dispatch(var)
         if role in Wolf & Killer and not nevt.data["numkills"] and nevt.data["message"]:
-            wolf.send(messages[nevt.data["message"]])
+            wolf.queue_message(messages[nevt.data["message"]], priority=PRIORITY_GAME)
 
 @event_listener("gun_chances")
 def on_gun_chances(evt, var, user, role):
@@ -8,6 +8,7 @@ from src.functions import get_players, get_all_players, get_target, get_main_rol
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 KILLS = UserDict() # type: Dict[users.User, users.User]
@@ -108,7 +109,7 @@ def on_transition_night_end(evt, var):
         to_send = "hunter_notify"
         if hunter.prefers_simple():
             to_send = "hunter_simple"
-        hunter.send(messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        hunter.queue_message((messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("begin_day")
 def on_begin_day(evt, var):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.events import Event
 from src.cats import Neutral, Wolfteam
@@ -104,7 +105,7 @@ def on_transition_night_end(evt, var):
         to_send = "investigator_notify"
         if inv.prefers_simple():
             to_send = "investigator_simple"
-        inv.send(messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        inv.queue_message((messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("transition_night_begin")
 def on_transition_night_begin(evt, var):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 JESTERS = UserSet() # type: UserSet[users.User]
@@ -28,9 +29,9 @@ def on_player_win(evt, var, player, role, winner, survived):
 def on_transition_night_end(evt, var):
     for jester in get_all_players(("jester",)):
         if jester.prefers_simple():
-            jester.send(messages["jester_simple"])
+            jester.queue_message(messages["jester_simple"], priority=PRIORITY_GAME)
         else:
-            jester.send(messages["jester_notify"])
+            jester.queue_message(messages["jester_notify"], priority=PRIORITY_GAME)
 
 @event_listener("reset")
 def on_reset(evt, var):
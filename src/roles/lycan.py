@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_lycanthropy, add_lycanthropy_scope, remove_lycanthropy
 from src.cats import Wolf
 
@@ -21,9 +22,9 @@ def on_transition_night_end(evt, var):
     for lycan in lycans:
         add_lycanthropy(var, lycan)
         if lycan.prefers_simple():
-            lycan.send(messages["lycan_simple"])
+            lycan.queue_message(messages["lycan_simple"], priority=PRIORITY_GAME)
         else:
-            lycan.send(messages["lycan_notify"])
+            lycan.queue_message(messages["lycan_notify"], priority=PRIORITY_GAME)
 
 @event_listener("doctor_immunize")
 def on_doctor_immunize(evt, var, doctor, target):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, try_protection, add_dying
 
 def _get_targets(var, pl, user):
@@ -107,7 +108,7 @@ def on_transition_night_end(evt, var):
         to_send = "mad_scientist_notify"
         if ms.prefers_simple():
             to_send = "mad_scientist_simple"
-        ms.send(messages[to_send].format(target1, target2))
+        ms.queue_message(messages[to_send].format(target1, target2), priority=PRIORITY_GAME)
 
 @event_listener("myrole")
 def on_myrole(evt, var, user):
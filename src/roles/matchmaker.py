@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_dying
 from src.cats import Win_Stealer
 
@@ -124,10 +125,10 @@ def on_transition_night_end(evt, var):
         pl = ps[:]
         random.shuffle(pl)
         if mm.prefers_simple():
-            mm.send(messages["matchmaker_simple"])
+            mm.queue_message(messages["matchmaker_simple"], priority=PRIORITY_GAME)
         else:
-            mm.send(messages["matchmaker_notify"])
-        mm.send("Players: " + ", ".join(p.nick for p in pl))
+            mm.queue_message(messages["matchmaker_notify"], priority=PRIORITY_GAME)
+        mm.queue_message("Players: " + ", ".join(p.nick for p in pl), priority=PRIORITY_GAME)
 
 @event_listener("del_player")
 def on_del_player(evt, var, player, all_roles, death_triggers):
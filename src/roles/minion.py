@@ -11,6 +11,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Wolf
 
@@ -30,8 +31,8 @@ def on_transition_night_end(evt, var):
             to_send = "minion_simple"
         else:
             to_send = "minion_notify"
-        minion.send(messages[to_send])
-        minion.send(wolf_list(var))
+        minion.queue_message(messages[to_send], priority=PRIORITY_GAME)
+        minion.queue_message(wolf_list(var), priority=PRIORITY_GAME)
         RECEIVED_INFO.add(minion)
 
 @event_listener("new_role")
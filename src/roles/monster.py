@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_protection
 from src.cats import Wolf
 
@@ -37,9 +38,9 @@ def on_transition_night_end(evt, var):
     for monster in get_all_players(("monster",)):
         add_protection(var, monster, protector=None, protector_role="monster", scope=Wolf)
         if monster.prefers_simple():
-            monster.send(messages["monster_simple"])
+            monster.queue_message(messages["monster_simple"], priority=PRIORITY_GAME)
         else:
-            monster.send(messages["monster_notify"])
+            monster.queue_message(messages["monster_notify"], priority=PRIORITY_GAME)
 
 @event_listener("remove_protection")
 def on_remove_protection(evt, var, target, attacker, attacker_role, protector, protector_role, reason):
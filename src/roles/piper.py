@@ -10,6 +10,7 @@ from src import channels, users, debuglog, errlog, plog
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 TOBECHARMED = UserDict() # type: Dict[users.User, Set[users.User]]
@@ -184,7 +185,7 @@ def on_transition_night_end(evt, var):
         to_send = "piper_notify"
         if piper.prefers_simple():
             to_send = "piper_simple"
-        piper.send(messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        piper.queue_message((messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("new_role")
 def on_new_role(evt, var, player, old_role):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.events import Event
 from src.status import try_misdirection, try_exchange, add_absent
 
@@ -70,9 +71,9 @@ def consecrate(var, wrapper, message):
 def on_transition_night_end(evt, var):
     for priest in get_all_players(("priest",)):
         if priest.prefers_simple():
-            priest.send(messages["priest_simple"])
+            priest.queue_message(messages["priest_simple"], priority=PRIORITY_GAME)
         else:
-            priest.send(messages["priest_notify"])
+            priest.queue_message(messages["priest_notify"], priority=PRIORITY_GAME)
 
 @event_listener("reset")
 def on_reset(evt, var):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 PRAYED = UserSet() # type: Set[users.User]
@@ -88,9 +89,9 @@ def pray(var, wrapper, message):
 def on_transition_night_end(evt, var):
     for pht in get_all_players(("prophet",)):
         if pht.prefers_simple():
-            pht.send(messages["prophet_simple"])
+            pht.queue_message(messages["prophet_simple"], priority=PRIORITY_GAME)
         else:
-            pht.send(messages["prophet_notify"])
+            pht.queue_message(messages["prophet_notify"], priority=PRIORITY_GAME)
 
 @event_listener("chk_nightdone")
 def on_chk_nightdone(evt, var):
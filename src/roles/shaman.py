@@ -10,6 +10,7 @@ from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.dispatcher import MessageDispatcher
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 from src.roles.helper.shamans import setup_variables, get_totem_target, give_totem
@@ -71,15 +72,15 @@ def on_transition_night_end(evt, var):
                 TOTEMS[shaman] = t
                 break
         if shaman.prefers_simple():
-            shaman.send(messages["shaman_simple"].format("shaman"))
-            shaman.send(messages["totem_simple"].format(TOTEMS[shaman]))
+            shaman.queue_message(messages["shaman_simple"].format("shaman"), priority=PRIORITY_GAME)
+            shaman.queue_message(messages["totem_simple"].format(TOTEMS[shaman]), priority=PRIORITY_GAME)
         else:
-            shaman.send(messages["shaman_notify"].format("shaman", ""))
+            shaman.queue_message(messages["shaman_notify"].format("shaman", ""), priority=PRIORITY_GAME)
             totem = TOTEMS[shaman]
             tmsg = messages["shaman_totem"].format(totem)
             tmsg += messages[totem + "_totem"]
-            shaman.send(tmsg)
-        shaman.send(messages["players_list"].format(", ".join(p.nick for p in pl)))
+            shaman.queue_message(tmsg, priority=PRIORITY_GAME)
+        shaman.queue_message(messages["players_list"].format(", ".join(p.nick for p in pl)), priority=PRIORITY_GAME)
 
 @event_listener("get_role_metadata")
 def on_get_role_metadata(evt, var, kind):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.events import Event
 
@@ -167,7 +168,7 @@ def on_transition_night_end(evt, var):
                 succ.append("{0} (succubus)".format(p))
             else:
                 succ.append(p.nick)
-        succubus.send(messages[to_send], messages["players_list"].format(", ".join(succ)), sep="\n")
+        succubus.queue_message((messages[to_send], messages["players_list"].format(", ".join(succ))), priority=PRIORITY_GAME)
 
 @event_listener("gun_shoot")
 def on_gun_shoot(evt, var, user, target):
@@ -2,12 +2,11 @@ import re
 import random
 import itertools
 import math
-import threading
 import time
 from collections import defaultdict
 
 from src.utilities import *
-from src import channels, users, debuglog, errlog, plog
+from src import channels, users, scheduler, debuglog, errlog, plog
 from src.functions import get_players, get_all_players, get_main_role, get_reveal_role, get_target
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
@@ -52,7 +51,7 @@ def on_del_player(evt, var, player, all_roles, death_triggers):
 
         if time_left > time_limit > 0:
             from src.wolfgame import hurry_up
-            t = threading.Timer(time_limit, hurry_up, [phase_id, True])
+            t = scheduler.Timer(time_limit, hurry_up, [phase_id, True])
             var.TIMERS[var.GAMEPHASE] = (t, time.time(), time_limit)
             t.daemon = True
             t.start()
@@ -62,7 +61,7 @@ def on_del_player(evt, var, player, all_roles, death_triggers):
                 timer = var.TIMERS[timer_name][0]
                 if timer.isAlive():
                     timer.cancel()
-                    t = threading.Timer(time_warn, hurry_up, [phase_id, False])
+                    t = scheduler.Timer(time_warn, hurry_up, [phase_id, False])
                     var.TIMERS[timer_name] = (t, time.time(), time_warn)
                     t.daemon = True
                     t.start()
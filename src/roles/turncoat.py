@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 TURNCOATS = UserDict() # type: Dict[users.User, Tuple[str, int]]
@@ -64,14 +65,14 @@ def on_transition_night_end(evt, var):
             TURNCOATS[turncoat] = ("none", -1)
 
         if turncoat.prefers_simple():
-            turncoat.send(messages["turncoat_simple"].format(TURNCOATS[turncoat][0]))
+            turncoat.queue_message(messages["turncoat_simple"].format(TURNCOATS[turncoat][0]), priority=PRIORITY_GAME)
         else:
             message = messages["turncoat_notify"]
             if TURNCOATS[turncoat][0] != "none":
                 message += messages["turncoat_current_team"].format(TURNCOATS[turncoat][0])
             else:
                 message += messages["turncoat_no_team"]
-            turncoat.send(message)
+            turncoat.queue_message(message, priority=PRIORITY_GAME)
 
 @event_listener("chk_nightdone")
 def on_chk_nightdone(evt, var):
@@ -8,6 +8,7 @@ from src.functions import get_players, get_target, get_main_role
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import All, Wolfteam
 
@@ -191,7 +192,7 @@ def on_transition_night_end(evt, var):
         to_send = "vengeful_ghost_notify"
         if v_ghost.prefers_simple():
             to_send = "vengeful_ghost_simple"
-        v_ghost.send(messages[to_send].format(who), who.capitalize() + ": " + ", ".join(p.nick for p in pl), sep="\n")
+        v_ghost.queue_message((messages[to_send].format(who), who.capitalize() + ": " + ", ".join(p.nick for p in pl)), priority=PRIORITY_GAME)
         debuglog("GHOST: {0} (target: {1}) - players: {2}".format(v_ghost, who, ", ".join(p.nick for p in pl)))
 
 @event_listener("myrole")
@@ -8,6 +8,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_targe
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange, add_dying
 from src.cats import Wolf, Win_Stealer
 
@@ -92,7 +93,7 @@ def on_transition_night_end(evt, var):
         to_send = "vigilante_notify"
         if vigilante.prefers_simple():
             to_send = "vigilante_simple"
-        vigilante.send(messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl)), sep="\n")
+        vigilante.queue_message((messages[to_send], messages["players_list"].format(", ".join(p.nick for p in pl))), priority=PRIORITY_GAME)
 
 @event_listener("begin_day")
 def on_begin_day(evt, var):
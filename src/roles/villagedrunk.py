@@ -10,15 +10,16 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 @event_listener("transition_night_end")
 def on_transition_night_end(evt, var):
     for drunk in get_all_players(("village drunk",)):
         if drunk.prefers_simple():
-            drunk.send(messages["village_drunk_simple"])
+            drunk.queue_message(messages["village_drunk_simple"], priority=PRIORITY_GAME)
         else:
-            drunk.send(messages["village_drunk_notify"])
+            drunk.queue_message(messages["village_drunk_notify"], priority=PRIORITY_GAME)
 
 @event_listener("assassin_target")
 def on_assassin_target(evt, var, assassin, players):
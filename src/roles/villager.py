@@ -4,6 +4,7 @@ from src.functions import get_players
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Hidden
 
@@ -19,8 +20,7 @@ def on_transition_night_end(evt, var):
                 to_send = "villager_notify"
                 if villager.prefers_simple():
                     to_send = "villager_simple"
-                villager.queue_message(messages[to_send])
-            villager.send_messages()
+                villager.queue_message(messages[to_send], priority=PRIORITY_GAME)
 
 @event_listener("chk_win", priority=3)
 def on_chk_win(evt, var, rolemap, mainroles, lpl, lwolves, lrealwolves):
@@ -10,6 +10,7 @@ from src.functions import get_players, get_all_players, get_main_role, get_revea
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 from src.roles.helper.wolves import get_wolfchat_roles
@@ -104,9 +105,9 @@ def on_transition_night_end(evt, var):
         if child in wolves:
             continue
         if child.prefers_simple():
-            child.send(messages["wild_child_simple"])
+            child.queue_message(messages["wild_child_simple"], priority=PRIORITY_GAME)
         else:
-            child.send(messages["wild_child_notify"])
+            child.queue_message(messages["wild_child_notify"], priority=PRIORITY_GAME)
 
 @event_listener("revealroles_role")
 def on_revealroles_role(evt, var, user, role):
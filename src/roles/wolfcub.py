@@ -8,6 +8,7 @@ from src import debuglog, errlog, plog, users, channels
 from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 from src.cats import Wolf, Killer
 
@@ -41,9 +42,7 @@ def on_transition_night_end(evt, var):
         return
 
     for wofl in wolves:
-        wofl.queue_message(messages["angry_wolves"])
-
-    wofl.send_messages()
+        wofl.queue_message(messages["angry_wolves"], priority=PRIORITY_GAME)
 
 @event_listener("chk_win", priority=1)
 def on_chk_win(evt, var, rolemap, mainroles, lpl, lwolves, lrealwolves):
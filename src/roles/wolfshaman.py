@@ -10,6 +10,7 @@ from src.decorators import command, event_listener
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.dispatcher import MessageDispatcher
 from src.messages import messages
+from src.context import PRIORITY_GAME
 from src.status import try_misdirection, try_exchange
 
 from src.roles.helper.shamans import get_totem_target, give_totem, setup_variables
@@ -78,12 +79,12 @@ def on_transition_night_end(evt, var):
                 break
         if shaman.prefers_simple():
             # Message about role was sent with wolfchat
-            shaman.send(messages["totem_simple"].format(TOTEMS[shaman]))
+            shaman.queue_message(messages["totem_simple"].format(TOTEMS[shaman]), priority=PRIORITY_GAME)
         else:
             totem = TOTEMS[shaman]
             tmsg = messages["shaman_totem"].format(totem)
             tmsg += messages[totem + "_totem"]
-            shaman.send(tmsg)
+            shaman.queue_message(tmsg, priority=PRIORITY_GAME)
 
 @event_listener("get_role_metadata")
 def on_get_role_metadata(evt, var, kind):
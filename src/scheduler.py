@@ -0,0 +1,162 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+from src.logger import errlog
+
+__all__ = ["Scheduler", "VirtualClock", "Timer", "default"]
+
+class VirtualClock:
+    """Clock which only moves when told to, for simulating games."""
+
+    def __init__(self, start=0.0):
+        self.now = float(start)
+
+    def __call__(self):
+        return self.now
+
+class Timer:
+    """A function to be called after a delay.
+
+    This has the same interface as threading.Timer, but instead of starting
+    a thread of its own, start() adds it to a Scheduler which runs all the
+    timers one after the other.
+
+    """
+
+    def __init__(self, interval, function, args=None, kwargs=None, *, scheduler=None):
+        self.interval = interval
+        self.function = function
+        self.args = args if args is not None else []
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.scheduler = scheduler if scheduler is not None else default
+        self.daemon = True # only here for compatibility with threading.Timer
+        self.when = None
+        self._cancelled = False
+        self._finished = False
+
+    def start(self):
+        if self.when is not None:
+            raise RuntimeError("timers can only be started once")
+        self.scheduler._push(self)
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_alive(self):
+        return self.when is not None and not self._cancelled and not self._finished
+
+    isAlive = is_alive
+
+    def _run(self):
+        if self._cancelled:
+            return
+        self._finished = True
+        try:
+            self.function(*self.args, **self.kwargs)
+        except Exception:
+            errlog(traceback.format_exc())
+
+class Scheduler:
+    """Runs timers in order of their deadlines, one at a time.
+
+    The timers are kept in a heap; whoever drives the scheduler calls
+    timeout() to know how long it may wait and run_due() when that time
+    has passed. The IRC client does this from its reactor loop, so that
+    timers run on the same thread as everything else; otherwise, start()
+    runs them from a single thread of their own. With a VirtualClock,
+    advance() runs through the timers without waiting.
+
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else time.monotonic
+        # called from _push() when the earliest deadline changes
+        self.wakeup = None
+        self._queue = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = None
+
+    def __len__(self):
+        with self._cond:
+            return sum(1 for when, seq, timer in self._queue if not timer._cancelled)
+
+    def call_later(self, delay, function, *args, **kwargs):
+        """Schedule a call and return the started Timer for it."""
+        timer = Timer(delay, function, args, kwargs, scheduler=self)
+        timer.start()
+        return timer
+
+    def _push(self, timer):
+        with self._cond:
+            timer.when = self.clock() + timer.interval
+            heapq.heappush(self._queue, (timer.when, next(self._counter), timer))
+            earliest = self._queue[0][2] is timer
+            self._cond.notify()
+        if earliest and self.wakeup is not None:
+            self.wakeup()
+
+    def _next(self):
+        # cancelled timers are only dropped once they reach the front
+        while self._queue and self._queue[0][2]._cancelled:
+            heapq.heappop(self._queue)
+        if self._queue:
+            return self._queue[0][0]
+        return None
+
+    def timeout(self):
+        """Return the number of seconds until the next timer is due,
+        or None if there are no timers."""
+        with self._cond:
+            when = self._next()
+        if when is None:
+            return None
+        return max(0.0, when - self.clock())
+
+    def run_due(self):
+        """Run every timer whose deadline has passed."""
+        while True:
+            with self._cond:
+                when = self._next()
+                if when is None or when > self.clock():
+                    return
+                timer = heapq.heappop(self._queue)[2]
+            timer._run()
+
+    def advance(self, seconds):
+        """Move a VirtualClock forward, running the timers that become due
+        on the way with the clock set to their deadline."""
+        if not isinstance(self.clock, VirtualClock):
+            raise RuntimeError("only schedulers with a virtual clock can be advanced")
+        target = self.clock.now + seconds
+        while True:
+            with self._cond:
+                when = self._next()
+            if when is None or when > target:
+                break
+            self.clock.now = max(self.clock.now, when)
+            self.run_due()
+        self.clock.now = target
+
+    def start(self):
+        """Run the timers from a dedicated thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(None, self._run_forever, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def _run_forever(self):
+        while True:
+            with self._cond:
+                when = self._next()
+                if when is None:
+                    self._cond.wait()
+                else:
+                    self._cond.wait(max(0.0, when - self.clock()))
+            self.run_due()
+
+default = Scheduler()
+
+# vim: set sw=4 expandtab:
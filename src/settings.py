@@ -14,6 +14,7 @@ WAIT_AFTER_JOIN = 25 # Wait at least this many seconds after the last join
 IRC_TB_INIT = 23 # initial number of tokens
 IRC_TB_DELAY = 1.73 # wait time between adding tokens
 IRC_TB_BURST = 23 # maximum number of tokens that can be accumulated
+IRC_REACTOR = False # write to IRC from a single thread instead of blocking whichever thread is sending (needed for the outbound lanes)
 # !wait uses a token bucket
 WAIT_TB_INIT  = 2   # initial number of tokens
 WAIT_TB_DELAY = 240 # wait time between adding tokens
@@ -139,6 +140,9 @@ DISABLE_DEBUG_MODE_TIMERS = True
 DISABLE_DEBUG_MODE_TIME_LORD = False
 DISABLE_DEBUG_MODE_REAPER = True
 DISABLE_DEBUG_MODE_STASIS = True
+# Recompute the cached player and role lookups (see src/functions.py) on every use
+# and raise an error if the cached result is outdated; this is slow
+CHECK_CACHED_VIEWS = False
 
 # Minimum number of players needed for mad scientist to skip over dead people when determining who is next to them
 # Set to 0 to always skip over dead players. Note this is number of players that !joined, NOT number of players currently alive
@@ -204,6 +208,15 @@ PASTEBIN_ERRORS = False
 
 TRACEBACK_VERBOSITY = 2 # 0 = no locals at all, 1 = innermost frame's locals, 2 = all locals
 
+# Time every event listener; the timings can be seen with !eventprof and are
+# written to EVENT_PROFILE_FILE (if set) at the end of every game
+EVENT_PROFILING = False
+EVENT_PROFILE_FILE = "event_profile.json"
+
+# Serve command metrics in the Prometheus text format over HTTP on this port; 0 to disable
+METRICS_PORT = 0
+METRICS_HOST = "127.0.0.1"
+
 # How often to ping the server (in seconds) to detect unclean disconnection
 SERVER_PING_INTERVAL = 120
 
@@ -1,4 +1,5 @@
 import fnmatch
+import itertools
 import time
 import re
 
@@ -13,6 +14,15 @@ Bot = None # bot instance
 _users = set()
 _ghosts = set()
 
+# Secondary indexes over _users, used to narrow down lookups to a handful
+# of candidates instead of comparing against every user we know about.
+# Comparisons between users are exact, so the keys only need to group
+# together users which might compare equal; a plain str.lower() is enough
+# for that, and has the benefit of not depending on the CASEMAPPING.
+_nick_index = {}
+_host_index = {}
+_account_index = {}
+
 _arg_msg = "(nick={0!r}, ident={1!r}, host={2!r}, realname={3!r}, account={4!r}, allow_bot={5})"
 
 class _user:
@@ -53,20 +63,19 @@ def _get(nick=None, ident=None, host=None, realname=None, account=None, *, allow
         nick, ident, host = parse_rawnick(nick)
 
     potential = []
-    users = set(_users)
-    if allow_bot:
-        users.add(Bot)
-
     sentinel = object()
 
     temp = User(sentinel, nick, ident, host, realname, account)
     if temp.client is not sentinel: # actual client
         return [temp] if allow_multiple else temp
 
-    for user in users:
+    for user in _candidates(temp):
         if user == temp:
             potential.append(user)
 
+    if allow_bot and Bot is not None and Bot == temp:
+        potential.append(Bot)
+
     if allow_multiple:
         return potential
 
@@ -110,7 +119,7 @@ def _add(cli, *, nick, ident=None, host=None, realname=None, account=None):
         except ValueError:
             pass
         else:
-            _users.add(new)
+            _register(new)
 
     return new
 
@@ -121,6 +130,66 @@ def add(nick, **blah): # backwards-compatible API
 def exists(nick, *stuff, **morestuff): # backwards-compatible API
     return nick in var.USERS
 
+def _fold(value):
+    if value is None:
+        return None
+    return value.lower()
+
+def _register(user):
+    """Add a user to the registry and its indexes."""
+    _users.add(user)
+    if user._index_keys is None:
+        _index(user)
+
+def _unregister(user):
+    """Remove a user from the registry and its indexes."""
+    _users.discard(user)
+    _unindex(user)
+
+def _index(user):
+    keys = (_fold(user.nick), _fold(user.host), _fold(user.account))
+    for index, key in zip((_nick_index, _host_index, _account_index), keys):
+        if key is not None:
+            if key not in index:
+                index[key] = set()
+            index[key].add(user)
+    user._index_keys = keys
+
+def _unindex(user):
+    keys = user._index_keys
+    if keys is None:
+        return
+    for index, key in zip((_nick_index, _host_index, _account_index), keys):
+        if key is not None and key in index:
+            index[key].discard(user)
+            if not index[key]:
+                del index[key]
+    user._index_keys = None
+
+def _reindex(user):
+    """Update the indexes after one of the indexed attributes changed."""
+    if user._index_keys is not None:
+        _unindex(user)
+        _index(user)
+
+def _candidates(temp):
+    """Return the registered users which may compare equal to temp.
+
+    Every registered user has a nick, and every registered user that
+    isn't fake has a host, so those can always be used to narrow down
+    the search. The account can only be used if nothing else would be
+    compared, as users without an account could otherwise match.
+
+    """
+
+    if temp.nick is not None:
+        return _nick_index.get(_fold(temp.nick), ())
+    if temp.host is not None:
+        return _host_index.get(_fold(temp.host), ())
+    if temp.account is not None and temp.ident is None and temp.realname is None:
+        return _account_index.get(_fold(temp.account), ())
+    return _users
+
 def users():
     """Iterate over the users in the registry."""
     yield from _users
@@ -161,13 +230,13 @@ def _cleanup_user(evt, var, user):
     if var.PHASE in var.GAME_PHASES and user in var.ALL_PLAYERS:
         _ghosts.add(user)
     else:
-        _users.discard(user)
+        _unregister(user)
 
 def _reset(evt, var):
     """Cleans up users that left during game during game end."""
     for user in _ghosts:
         if not user.channels:
-            _users.discard(user)
+            _unregister(user)
     _ghosts.clear()
 
 # Can't use @event_listener decorator since src/decorators.py imports us
@@ -183,16 +252,20 @@ class User(IRCContext):
         self = super().__new__(cls)
         super(__class__, self).__init__(nick, cli)
 
+        self._index_keys = None
+        self._lowered = None
+        self._hash = None
         self._ident = ident
         self._host = host
         self.realname = realname
         self.account = account
         self.channels = {}
         self.timestamp = time.time()
-        self.sets = []
-        self.lists = []
-        self.dict_keys = []
-        self.dict_values = []
+        # The containers holding this user, keyed by their id()
+        self.sets = {}
+        self.lists = {}
+        self.dict_keys = {}
+        self.dict_values = {}
 
         if Bot is not None and Bot.nick == nick and {Bot.ident, Bot.host, Bot.realname, Bot.account} == {None}:
             self = Bot
@@ -203,13 +276,13 @@ class User(IRCContext):
             self.timestamp = time.time()
 
         elif ident is not None and host is not None:
-            users = set(_users)
-            users.add(Bot)
-            if self in users:
-                for user in users:
-                    if self == user:
-                        self = user
-                        break
+            for user in _candidates(self):
+                if self == user:
+                    self = user
+                    break
+            else:
+                if Bot is not None and self == Bot:
+                    self = Bot
 
         else:
             # This takes a different code path because of slightly different
@@ -245,9 +318,7 @@ class User(IRCContext):
             # and instead opt for the sake of clarity that this separation provides.
 
             potential = None
-            users = set(_users)
-            users.add(Bot)
-            for user in users:
+            for user in itertools.chain(_candidates(self), (Bot,)):
                 if self == user:
                     if potential is None:
                         potential = user
@@ -269,9 +340,12 @@ class User(IRCContext):
         return "{self.__class__.__name__}({self.nick!r}, {self.ident!r}, {self.host!r}, {self.realname!r}, {self.account!r}, {self.channels!r})".format(self=self)
 
     def __hash__(self):
-        if self.ident is None or self.host is None:
-            raise ValueError("cannot hash a User with no ident or host")
-        return hash((self.ident, self.host))
+        # the ident and host can't change once they're set, so neither can the hash
+        if self._hash is None:
+            if self._ident is None or self._host is None:
+                raise ValueError("cannot hash a User with no ident or host")
+            self._hash = hash((self._ident, self._host))
+        return self._hash
 
     def __eq__(self, other):
         return self._compare(other, __class__, "nick", "ident", "host", "realname", "account")
@@ -294,33 +368,42 @@ class User(IRCContext):
 
         _ghosts.discard(self)
         if not self.channels:
-            _users.discard(self) # Goodbye, my old friend
+            _unregister(self) # Goodbye, my old friend
 
-        for l in self.lists[:]:
-            while self in l:
-                l[l.index(self)] = new
+        for l in list(self.lists.values()):
+            for i, item in enumerate(l):
+                if item is self:
+                    l[i] = new
 
-        for s in self.sets[:]:
+        for s in list(self.sets.values()):
             s.remove(self)
             s.add(new)
 
-        for dk in self.dict_keys[:]:
+        for dk in list(self.dict_keys.values()):
             dk[new] = dk.pop(self)
 
-        for dv in self.dict_values[:]:
+        for dv in list(self.dict_values.values()):
             for key in dv:
                 if dv[key] is self:
                     dv[key] = new
 
         # It is the containers' reponsibility to properly remove themself from the users
-        # So if any list is non-empty, something went terribly wrong
-        assert not self.lists + self.sets + self.dict_keys + self.dict_values
+        # So if any of these is non-empty, something went terribly wrong
+        assert not (self.lists or self.sets or self.dict_keys or self.dict_values)
 
     def lower(self):
-        temp = type(self)(self.client, lower(self.nick), lower(self.ident), lower(self.host, casemapping="ascii"), lower(self.realname), lower(self.account))
-        if temp is not self: # If everything is already lowercase, we'll get back the same instance
+        # The lowercased instance is kept until one of our attributes or
+        # the case mapping changes, so that repeated calls are cheap
+        casemapping = Features["CASEMAPPING"]
+        if self._lowered is None or self._lowered[0] != casemapping:
+            temp = User.__new__(type(self), self.client, lower(self.nick), lower(self.ident), lower(self.host, casemapping="ascii"), lower(self.realname), lower(self.account))
+            if temp is not self: # If everything is already lowercase, we'll get back the same instance
+                temp.ref = self.ref or self
+            self._lowered = (casemapping, temp)
+
+        temp = self._lowered[1]
+        if temp is not self:
             temp.channels = self.channels
-            temp.ref = self.ref or self
         return temp
 
     def is_owner(self):
@@ -345,7 +428,8 @@ class User(IRCContext):
         if self.is_fake:
             return False
 
-        flags = var.FLAGS[self.rawnick] + var.FLAGS_ACCS[self.account]
+        temp = self.lower()
+        flags = var.FLAGS.get(temp.rawnick, "") + var.FLAGS_ACCS.get(temp.account, "")
 
         if "F" not in flags:
             try:
@@ -501,6 +585,8 @@ class User(IRCContext):
     @nick.setter
     def nick(self, nick):
         self.name = nick
+        self._lowered = None
+        _reindex(self)
         if self is Bot: # update the client's nickname as well
             self.client.nickname = nick
 
@@ -512,6 +598,7 @@ class User(IRCContext):
     def ident(self, ident):
         if self._ident is None:
             self._ident = ident
+            self._lowered = None
             if self is Bot:
                 self.client.ident = ident
         elif self._ident != ident:
@@ -525,6 +612,8 @@ class User(IRCContext):
     def host(self, host):
         if self._host is None:
             self._host = host
+            self._lowered = None
+            _reindex(self)
             if self is Bot:
                 self.client.hostmask = host
         elif self._host != host:
@@ -537,6 +626,7 @@ class User(IRCContext):
     @realname.setter
     def realname(self, realname):
         self._realname = realname
+        self._lowered = None
         if self is Bot:
             self.client.real_name = realname
 
@@ -549,6 +639,8 @@ class User(IRCContext):
         if account in ("0", "*") or var.DISABLE_ACCOUNTS:
             account = None
         self._account = account
+        self._lowered = None
+        _reindex(self)
 
     @property
     def rawnick(self):
@@ -582,7 +674,7 @@ class User(IRCContext):
             _ghosts.discard(self)
             # ensure dangling users aren't left around in our tracking var
             if not self.channels:
-                _users.discard(self)
+                _unregister(self)
 
 class FakeUser(User):
 
@@ -630,13 +722,6 @@ class BotUser(User): # TODO: change all the 'if x is Bot' for 'if isinstance(x,
             new.channels = {chan: set(modes) for chan, modes in self.channels.items()}
         return new
 
-    def lower(self):
-        temp = super().__new__(type(self), self.client, lower(self.nick), lower(self.ident), lower(self.host, casemapping="ascii"), lower(self.realname), lower(self.account))
-        if temp is not self: # If everything is already lowercase, we'll get back the same instance
-            temp.channels = self.channels
-            temp.ref = self.ref or self
-        return temp
-
     def change_nick(self, nick=None):
         if nick is None:
             nick = self.nick
@@ -7,6 +7,7 @@ from collections import defaultdict
 import botconfig
 import src.settings as var
 from src import debuglog
+from src.context import lower
 from src.events import Event
 from src.messages import messages
 
@@ -63,7 +64,6 @@ def relay_wolfchat_command(cli, nick, message, roles, is_wolf_command=False, is_
     send_wolfchat_message(var, users._get(nick), message, roles, role=role, command=command)
 
 def irc_lower(nick):
-    from src.context import lower
     return lower(nick)
 
 def is_owner(nick, ident=None, host=None, acc=None):
@@ -21,9 +21,8 @@ def decrement_stasis(user=None):
                 db.decrement_stasis(hostmask=hostmask)
     else:
         db.decrement_stasis()
-    # Also expire any expired stasis and tempbans and update our tracking vars
+    # Also expire any expired stasis; this updates our tracking vars as well
     db.expire_stasis()
-    db.init_vars()
 
 def expire_tempbans():
     acclist, hmlist = db.expire_tempbans()
@@ -182,9 +181,6 @@ def add_warning(cli, target, amount, actor, reason, notes=None, expires=None, sa
             elif user.host in hmlist:
                 channels.Main.kick(user, messages["tempban_kick"].format(nick=user, botnick=users.Bot.nick, reason=reason))
 
-    # Update any tracking vars that may have changed due to this
-    db.init_vars()
-
     return sid
 
 @command("stasis", chan=True, pm=True)
@@ -242,7 +238,6 @@ def fstasis(var, wrapper, message):
                     return
 
             db.set_stasis(amt, acc, hostmask)
-            db.init_vars()
             if amt > 0:
                 plural = "" if amt == 1 else "s"
                 if acc is not None:
@@ -421,7 +416,6 @@ def warn(var, wrapper, message):
         # only add stasis if this is the first time this warning is being acknowledged
         if not warning["ack"] and warning["sanctions"].get("stasis", 0) > 0:
             db.set_stasis(warning["sanctions"]["stasis"], acc, hm, relative=True)
-            db.init_vars()
         db.acknowledge_warning(warn_id)
         wrapper.reply(messages["fwarn_done"])
         return
@@ -19,9 +19,9 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
 # ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import copy
 import fnmatch
 import functools
+import heapq
 import itertools
 import json
 import math
@@ -34,13 +34,13 @@ import socket
 import string
 import subprocess
 import sys
-import threading
 import time
 import traceback
 import urllib.request
 
 from collections import defaultdict, deque, Counter
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from typing import Set
 
 from oyoyo.parse import parse_nick
@@ -49,19 +49,19 @@ import botconfig
 import src
 import src.settings as var
 from src.utilities import *
-from src import db, events, dispatcher, channels, users, hooks, logger, debuglog, errlog, plog, cats
+from src import db, events, dispatcher, channels, users, hooks, logger, scheduler, metrics, pingif, debuglog, errlog, plog, cats
 from src.users import User
 
 from src.containers import UserList, UserSet, UserDict, DefaultUserDict
 from src.decorators import command, cmd, hook, handle_error, event_listener, COMMANDS
 from src.messages import messages
 from src.warnings import *
-from src.context import IRCContext
+from src.context import IRCContext, PRIORITY_FLAVOR
 from src.status import try_protection, add_dying, is_dying, kill_players
 from src.cats import All, Wolf, Wolfchat, Wolfteam, Killer, Neutral, Hidden
 
 from src.functions import (
-    get_players, get_all_players, get_participants,
+    get_players, get_all_players, get_participants, get_team_counts,
     get_main_role, get_all_roles, get_reveal_role,
     get_target, change_role
    )
@@ -90,7 +90,6 @@ var.PLAYERS = {}
 var.DCED_PLAYERS = {}
 var.ADMIN_TO_PING = None
 var.AFTER_FLASTGAME = None
-var.PINGING_IFS = False
 var.TIMERS = {}
 var.PHASE = "none"
 var.OLD_MODES = defaultdict(set)
@@ -126,6 +125,9 @@ var.RESTARTING = False
 
 var.START_VOTES = UserSet()
 
+if var.EVENT_PROFILING:
+    events.enable_profiling()
+
 if botconfig.DEBUG_MODE and var.DISABLE_DEBUG_MODE_TIMERS:
     var.NIGHT_TIME_LIMIT = 0 # 120
     var.NIGHT_TIME_WARN = 0 # 90
@@ -387,12 +389,80 @@ def sync_modes(var):
 
 @command("refreshdb", flag="m", pm=True)
 def refreshdb(var, wrapper, message):
-    """Updates our tracking vars to the current db state."""
+    """Updates our tracking vars to the current db state, or checks them with 'check'."""
+    if message.strip() == "check":
+        drift = db.check_vars()
+        if drift:
+            wrapper.reply(messages["tracking_vars_out_of_sync"].format(", ".join(drift)))
+        else:
+            wrapper.reply(messages["tracking_vars_in_sync"])
+        return
     db.expire_stasis()
     db.init_vars()
     expire_tempbans()
     wrapper.reply("Done.")
 
+@command("checkstats", flag="m", pm=True)
+def check_stats(var, wrapper, message):
+    """Checks the game stats summaries against the recorded games, or rebuilds them with 'rebuild'."""
+    if message.strip() == "rebuild":
+        db.rebuild_stats()
+        wrapper.reply(messages["stats_rebuilt"])
+        return
+    drift = db.check_stats()
+    if drift:
+        wrapper.reply(messages["stats_out_of_sync"].format(", ".join(messages["stats_out_of_sync_table"].format(table, rows) for table, rows in drift.items())))
+    else:
+        wrapper.reply(messages["stats_in_sync"])
+
+@command("eventprof", flag="D", pm=True)
+def event_profile(var, wrapper, message):
+    """Shows the slowest event listeners, or turns event profiling 'on' or 'off', 'reset's or 'dump's it."""
+    arg = message.strip()
+    if arg == "on":
+        events.enable_profiling()
+    elif arg == "off":
+        events.disable_profiling()
+    elif arg == "reset":
+        events.reset_profile()
+    elif arg == "dump":
+        if not var.EVENT_PROFILE_FILE:
+            wrapper.reply(messages["event_profile_no_file"])
+            return
+        events.dump_profile(var.EVENT_PROFILE_FILE)
+    elif arg:
+        wrapper.reply(messages["event_profile_usage"])
+        return
+
+    if arg:
+        wrapper.reply(messages["event_profile_updated"])
+        return
+
+    profile = [x for x in events.get_profile() if x["listener"] is not None]
+    if not profile:
+        if events.profiling_enabled():
+            wrapper.reply(messages["event_profile_empty_on"])
+        else:
+            wrapper.reply(messages["event_profile_empty_off"])
+        return
+    for x in profile[:10]:
+        wrapper.pm(messages["event_profile_entry"].format(
+            p50_ms=x["p50"] * 1000, p99_ms=x["p99"] * 1000, max_ms=x["max"] * 1000, **x))
+
+@command("fperf", flag="D", pm=True)
+def command_perf(var, wrapper, message):
+    """Shows the commands which took the most time to run."""
+    stats = metrics.get_command_stats()
+    if not stats:
+        wrapper.reply(messages["command_perf_empty"])
+        return
+    names = sorted(stats, key=lambda x: stats[x].total, reverse=True)
+    for name in names[:10]:
+        x = stats[name]
+        wrapper.pm(messages["command_perf_entry"].format(
+            name or messages["command_perf_messages"], x.calls, x.denied, x.rate_limited, x.errors, x.total, x.db_total,
+            x.percentile(0.5) * 1000, x.percentile(0.99) * 1000, x.longest * 1000))
+
 @command("fdie", "fbye", flag="F", pm=True)
 def forced_exit(var, wrapper, message):
     """Forces the bot to close."""
@@ -431,6 +501,9 @@ def forced_exit(var, wrapper, message):
 def _restart_program(mode=None):
     plog("RESTARTING")
 
+    # exec replaces the process without running atexit handlers
+    db.flush_games()
+
     python = sys.executable
 
     if mode is not None:
@@ -678,78 +751,31 @@ def altpinger(var, wrapper, message):
 @handle_error
 def join_timer_handler(var):
     with var.WARNING_LOCK:
-        var.PINGING_IFS = True
-        to_ping = []
-        pl = list_players()
-
-        checker = set()
-        chk_acc = set()
-
-        # Add accounts/hosts to the list of possible players to ping
-        if not var.DISABLE_ACCOUNTS:
-            for num in var.PING_IF_NUMS_ACCS:
-                if num <= len(pl):
-                    for acc in var.PING_IF_NUMS_ACCS[num]:
-                        if db.has_unacknowledged_warnings(acc, None):
-                            continue
-                        chk_acc.add(users.lower(acc))
-
-        if not var.ACCOUNTS_ONLY:
-            for num in var.PING_IF_NUMS:
-                if num <= len(pl):
-                    for hostmask in var.PING_IF_NUMS[num]:
-                        if db.has_unacknowledged_warnings(None, hostmask):
-                            continue
-                        checker.add(users.lower(hostmask, casemapping="ascii"))
+        pl = get_players()
 
         # Don't ping alt connections of users that have already joined
         if not var.DISABLE_ACCOUNTS:
             for player in pl:
-                user = users._get(player) # FIXME
-                var.PINGED_ALREADY_ACCS.add(users.lower(user.account))
-
-        # Remove players who have already been pinged from the list of possible players to ping
-        chk_acc -= var.PINGED_ALREADY_ACCS
-        checker -= var.PINGED_ALREADY
-
-        # If there is nobody to ping, do nothing
-        if not chk_acc and not checker:
-            var.PINGING_IFS = False
-            return
-
-        def get_altpingers(event, var, chan, user):
-            if event.params.away or user.stasis_count() or not var.PINGING_IFS or user is users.Bot or user.nick in pl: # FIXME: Fix this when list_players() returns User instances
-                return
-
-            temp = user.lower()
-            if temp.account in chk_acc:
-                to_ping.append(temp)
-                var.PINGED_ALREADY_ACCS.add(temp.account)
-                return
-
-            if not var.ACCOUNTS_ONLY:
-                if temp.userhost in checker:
-                    to_ping.append(temp)
-                    var.PINGED_ALREADY.add(temp.userhost)
+                var.PINGED_ALREADY_ACCS.add(player.lower().account)
 
-        def ping_altpingers(event, var, request):
-            if request is channels.Main:
-                var.PINGING_IFS = False
-                if to_ping:
-                    to_ping.sort(key=lambda x: x.nick)
-                    user_list = [(user.ref or user).nick for user in to_ping]
-
-                    msg_prefix = messages["ping_player"].format(len(pl), "" if len(pl) == 1 else "s")
-                    channels.Main.send(*user_list, first=msg_prefix)
-                    del to_ping[:]
+        to_ping = []
+        for user, (account, userhost) in pingif.get_pingers(len(pl)).items():
+            if user in pl or user.stasis_count():
+                continue
 
-                events.remove_listener("who_result", get_altpingers)
-                events.remove_listener("who_end", ping_altpingers)
+            if account is not None and account not in var.PINGED_ALREADY_ACCS and not db.is_warned(account, None):
+                var.PINGED_ALREADY_ACCS.add(account)
+            elif userhost is not None and userhost not in var.PINGED_ALREADY and not db.is_warned(None, userhost):
+                var.PINGED_ALREADY.add(userhost)
+            else:
+                continue
 
-        events.add_listener("who_result", get_altpingers)
-        events.add_listener("who_end", ping_altpingers)
+            to_ping.append(user)
 
-        channels.Main.who()
+        if to_ping:
+            to_ping.sort(key=lambda x: x.lower().nick)
+            msg_prefix = messages["ping_player"].format(len(pl), "" if len(pl) == 1 else "s")
+            channels.Main.send(*(user.nick for user in to_ping), first=msg_prefix)
 
 def join_deadchat(var, *all_users):
     if not var.ENABLE_DEADCHAT or var.PHASE not in var.GAME_PHASES:
@@ -915,7 +941,7 @@ def join_player(var, wrapper, who=None, forced=False, *, sanity=True):
 
         # Set join timer
         if var.JOIN_TIME_LIMIT > 0:
-            t = threading.Timer(var.JOIN_TIME_LIMIT, kill_join, [var, wrapper])
+            t = scheduler.Timer(var.JOIN_TIME_LIMIT, kill_join, [var, wrapper])
             var.TIMERS["join"] = (t, time.time(), var.JOIN_TIME_LIMIT)
             t.daemon = True
             t.start()
@@ -985,7 +1011,7 @@ def join_player(var, wrapper, who=None, forced=False, *, sanity=True):
         if "join_pinger" in var.TIMERS:
             var.TIMERS["join_pinger"][0].cancel()
 
-        t = threading.Timer(10, join_timer_handler, (var,))
+        t = scheduler.Timer(10, join_timer_handler, (var,))
         var.TIMERS["join_pinger"] = (t, time.time(), 10)
         t.daemon = True
         t.start()
@@ -1005,7 +1031,6 @@ def kill_join(var, wrapper):
     wrapper.send(messages["game_idle_cancel"])
     # use this opportunity to expire pending stasis
     db.expire_stasis()
-    db.init_vars()
     expire_tempbans()
     if var.AFTER_FLASTGAME is not None:
         var.AFTER_FLASTGAME()
@@ -1168,6 +1193,7 @@ def stats(cli, nick, chan, rest):
         # only do this rate-limiting stuff if the person is in game
         if (var.LAST_STATS and
             var.LAST_STATS + timedelta(seconds=var.STATS_RATE_LIMIT) > datetime.now()):
+            metrics.rate_limited()
             cli.notice(nick, messages["command_ratelimited"])
             return
 
@@ -1347,28 +1373,28 @@ def hurry_up(gameid, change):
     avail = len(pl)
     votesneeded = avail // 2 + 1
 
-    with copy.deepcopy(var.VOTES) as votelist:
-        # Note: this event can be differentiated between regular chk_decision
-        # by checking evt.params.timeout.
-        event = Event("chk_decision", {
-            "not_lynching": not_lynching,
-            "votelist": votelist,
-            "numvotes": {}, # filled as part of a priority 1 event
-            "weights": {}, # filled as part of a priority 1 event
-            "transition_night": transition_night
-            }, voters=pl, timeout=True)
-        if not event.dispatch(var, None):
-            return
-        numvotes = event.data["numvotes"]
+    votelist = _copy_votes()
+    # Note: this event can be differentiated between regular chk_decision
+    # by checking evt.params.timeout.
+    event = Event("chk_decision", {
+        "not_lynching": not_lynching,
+        "votelist": votelist,
+        "numvotes": {}, # filled as part of a priority 1 event
+        "weights": {}, # filled as part of a priority 1 event
+        "transition_night": transition_night
+        }, voters=pl, timeout=True)
+    if not event.dispatch(var, None):
+        return
+    numvotes = event.data["numvotes"]
 
-        found_dup = False
-        maxfound = (0, "")
-        for votee, voters in votelist.items():
-            if numvotes[votee] > maxfound[0]:
-                maxfound = (numvotes[votee], votee)
-                found_dup = False
-            elif numvotes[votee] == maxfound[0]:
-                found_dup = True
+    found_dup = False
+    maxfound = (0, "")
+    for votee, voters in votelist.items():
+        if numvotes[votee] > maxfound[0]:
+            maxfound = (numvotes[votee], votee)
+            found_dup = False
+        elif numvotes[votee] == maxfound[0]:
+            found_dup = True
 
     if maxfound[0] > 0 and not found_dup:
         channels.Main.send(messages["sunset_lynch"])
@@ -1394,6 +1420,16 @@ def fday(cli, nick, chan, rest):
     else:
         transition_day()
 
+def _copy_votes():
+    """Return a copy of var.VOTES which the chk_decision listeners may change.
+
+    This only lives for one check, during which no one can be swapped out,
+    so plain dicts and lists do; copying the User containers themselves is
+    much slower.
+
+    """
+    return {votee: list(voters) for votee, voters in var.VOTES.items()}
+
 # Specify force = user to force user to be lynched
 def chk_decision(force=None, end_game=True):
     with var.GRAVEYARD_LOCK:
@@ -1409,59 +1445,58 @@ def chk_decision(force=None, end_game=True):
         avail = len(pl)
         votesneeded = avail // 2 + 1
 
-        with copy.deepcopy(var.VOTES) as votelist:
+        votelist = _copy_votes()
+        event = Event("chk_decision", {
+            "not_lynching": not_lynching,
+            "votelist": votelist,
+            "numvotes": {}, # filled as part of a priority 1 event
+            "weights": {}, # filled as part of a priority 1 event
+            "transition_night": transition_night
+            }, voters=pl, timeout=False)
+        if not event.dispatch(var, force):
+            return
 
-            event = Event("chk_decision", {
-                "not_lynching": not_lynching,
-                "votelist": votelist,
-                "numvotes": {}, # filled as part of a priority 1 event
-                "weights": {}, # filled as part of a priority 1 event
-                "transition_night": transition_night
-                }, voters=pl, timeout=False)
-            if not event.dispatch(var, force):
-                return
+        numvotes = event.data["numvotes"]
 
-            numvotes = event.data["numvotes"]
+        # we only need 50%+ to not lynch, instead of an actual majority, because a tie would time out day anyway
+        # don't check for ABSTAIN_ENABLED here since we may have a case where the majority of people have pacifism totems or something
+        if len(not_lynching) >= math.ceil(avail / 2):
+            abs_evt = Event("chk_decision_abstain", {}, votelist=votelist, numvotes=numvotes)
+            abs_evt.dispatch(var, not_lynching)
+            channels.Main.send(messages["village_abstain"], lane="game")
+            var.ABSTAINED = True
+            event.data["transition_night"]()
+            return
+        for votee, voters in votelist.items():
+            if numvotes[votee] >= votesneeded or votee is force:
+                # priorities:
+                # 1 = displaying impatience totem messages
+                # 3 = mayor/revealing totem
+                # 4 = fool
+                # 5 = desperation totem, other things that happen on generic lynch
+                vote_evt = Event("chk_decision_lynch", {"votee": votee},
+                    original_votee=votee,
+                    force=(votee is force),
+                    votelist=votelist,
+                    not_lynching=not_lynching)
+                if vote_evt.dispatch(var, voters):
+                    votee = vote_evt.data["votee"]
 
-            # we only need 50%+ to not lynch, instead of an actual majority, because a tie would time out day anyway
-            # don't check for ABSTAIN_ENABLED here since we may have a case where the majority of people have pacifism totems or something
-            if len(not_lynching) >= math.ceil(avail / 2):
-                abs_evt = Event("chk_decision_abstain", {}, votelist=votelist, numvotes=numvotes)
-                abs_evt.dispatch(var, not_lynching)
-                channels.Main.send(messages["village_abstain"])
-                var.ABSTAINED = True
-                event.data["transition_night"]()
-                return
-            for votee, voters in votelist.items():
-                if numvotes[votee] >= votesneeded or votee is force:
-                    # priorities:
-                    # 1 = displaying impatience totem messages
-                    # 3 = mayor/revealing totem
-                    # 4 = fool
-                    # 5 = desperation totem, other things that happen on generic lynch
-                    vote_evt = Event("chk_decision_lynch", {"votee": votee},
-                        original_votee=votee,
-                        force=(votee is force),
-                        votelist=votelist,
-                        not_lynching=not_lynching)
-                    if vote_evt.dispatch(var, voters):
-                        votee = vote_evt.data["votee"]
-
-                        if var.ROLE_REVEAL in ("on", "team"):
-                            rrole = get_reveal_role(votee)
-                            an = "n" if rrole.startswith(("a", "e", "i", "o", "u")) else ""
-                            lmsg = random.choice(messages["lynch_reveal"]).format(votee, an, rrole)
-                        else:
-                            lmsg = random.choice(messages["lynch_no_reveal"]).format(votee)
-                        channels.Main.send(lmsg)
-                        add_dying(var, votee, "villager", "lynch")
-                        kill_players(var, end_game=False) # temporary hack; end_game=True calls chk_decision and we don't want that
-                        if end_game and chk_win():
-                            return
-                    do_night_transision = True
-                    break
-            if do_night_transision:
-                event.data["transition_night"]()
+                    if var.ROLE_REVEAL in ("on", "team"):
+                        rrole = get_reveal_role(votee)
+                        an = "n" if rrole.startswith(("a", "e", "i", "o", "u")) else ""
+                        lmsg = random.choice(messages["lynch_reveal"]).format(votee, an, rrole)
+                    else:
+                        lmsg = random.choice(messages["lynch_no_reveal"]).format(votee)
+                    channels.Main.send(lmsg, lane="game")
+                    add_dying(var, votee, "villager", "lynch")
+                    kill_players(var, end_game=False) # temporary hack; end_game=True calls chk_decision and we don't want that
+                    if end_game and chk_win():
+                        return
+                do_night_transision = True
+                break
+        if do_night_transision:
+            event.data["transition_night"]()
 
 @cmd("votes", pm=True, phases=("join", "day", "night"))
 def show_votes(cli, nick, chan, rest):
@@ -1500,6 +1535,7 @@ def show_votes(cli, nick, chan, rest):
         if (chan != nick and var.LAST_VOTES and var.VOTES_RATE_LIMIT and
                 var.LAST_VOTES + timedelta(seconds=var.VOTES_RATE_LIMIT) >
                 datetime.now()):
+            metrics.rate_limited()
             cli.notice(nick, messages["command_ratelimited"])
             return
 
@@ -1564,7 +1600,7 @@ def stop_game(var, winner="", abort=False, additional_winners=None, log=True):
                                                 nitemin, nitesec)
 
     if not abort:
-        channels.Main.send(gameend_msg)
+        channels.Main.send(gameend_msg, lane="game")
 
     roles_msg = []
 
@@ -1724,20 +1760,23 @@ def stop_game(var, winner="", abort=False, additional_winners=None, log=True):
         # spit out the list of winners
         winners = sorted(winners)
         if len(winners) == 1:
-            channels.Main.send(messages["single_winner"].format(winners[0]))
+            channels.Main.send(messages["single_winner"].format(winners[0]), lane="game")
         elif len(winners) == 2:
-            channels.Main.send(messages["two_winners"].format(winners[0], winners[1]))
+            channels.Main.send(messages["two_winners"].format(winners[0], winners[1]), lane="game")
         elif len(winners) > 2:
             nicklist = ("\u0002" + x + "\u0002" for x in winners[0:-1])
-            channels.Main.send(messages["many_winners"].format(", ".join(nicklist), winners[-1]))
+            channels.Main.send(messages["many_winners"].format(", ".join(nicklist), winners[-1]), lane="game")
 
     # Message players in deadchat letting them know that the game has ended
     if var.DEADCHAT_PLAYERS:
         for user in var.DEADCHAT_PLAYERS:
-            user.queue_message(messages["endgame_deadchat"].format(channels.Main))
+            user.queue_message(messages["endgame_deadchat"].format(channels.Main), priority=PRIORITY_FLAVOR)
 
         user.send_messages()
 
+    if events.profiling_enabled() and var.EVENT_PROFILE_FILE:
+        events.dump_profile(var.EVENT_PROFILE_FILE)
+
     reset_modes_timers(var)
     reset()
     expire_tempbans()
@@ -1778,49 +1817,36 @@ def chk_win(*, end_game=True, winner=None):
 def chk_win_conditions(rolemap, mainroles, end_game=True, winner=None):
     """Internal handler for the chk_win function."""
     with var.GRAVEYARD_LOCK:
-        if var.PHASE == "day":
-            evt = Event("get_voters", {"voters": set(get_players())})
-            evt.dispatch(var)
-            pl = evt.data["voters"]
-            lpl = len(pl)
+        # chk_win listeners which change roles (e.g. traitor turning) ask for
+        # another check; each such change can only happen once per player
+        for i in range(len(mainroles) + 1):
+            lpl, lwolves, lrealwolves = get_team_counts(mainroles=mainroles)
+
+            message = ""
+            if lpl < 1:
+                message = messages["no_win"]
+                # still want people like jesters, dullahans, etc. to get wins if they fulfilled their win conds
+                winner = "no_team_wins"
+
+            # TODO: flip priority order (so that things like fool run last, and therefore override previous win conds)
+            # Priorities:
+            # 0 = fool, other roles that end game immediately
+            # 1 = things that could short-circuit game ending, such as cub growing up or traitor turning
+            #     Such events should also set stop_processing and prevent_default to True to force a re-calcuation
+            # 2 = win stealers not dependent on winners, such as succubus
+            # Events in priority 3 and 4 should check if a winner was already set and short-circuit if so
+            # it is NOT recommended that events in priorities 0 and 2 set stop_processing to True, as doing so
+            # will prevent gamemode-specific win conditions from happening
+            # 3 = normal roles
+            # 4 = win stealers dependent on who won, such as demoniac and monster
+            #     (monster's message changes based on who would have otherwise won)
+            # 5 = gamemode-specific win conditions
+            event = Event("chk_win", {"winner": winner, "message": message, "additional_winners": None})
+            if event.dispatch(var, rolemap, mainroles, lpl, lwolves, lrealwolves):
+                break
         else:
-            pl = set(get_players(mainroles=mainroles))
-            lpl = len(pl)
+            raise RuntimeError("chk_win listeners kept asking for the win conditions to be checked again")
 
-        if var.RESTRICT_WOLFCHAT & var.RW_REM_NON_WOLVES:
-            if var.RESTRICT_WOLFCHAT & var.RW_TRAITOR_NON_WOLF:
-                wcroles = Wolf
-            else:
-                wcroles = Wolf | {"traitor"}
-        else:
-            wcroles = Wolfchat
-
-        wolves = set(get_players(wcroles, mainroles=mainroles))
-        lwolves = len(wolves & pl)
-        lrealwolves = len(get_players(Wolf & Killer, mainroles=mainroles))
-
-        message = ""
-        if lpl < 1:
-            message = messages["no_win"]
-            # still want people like jesters, dullahans, etc. to get wins if they fulfilled their win conds
-            winner = "no_team_wins"
-
-        # TODO: flip priority order (so that things like fool run last, and therefore override previous win conds)
-        # Priorities:
-        # 0 = fool, other roles that end game immediately
-        # 1 = things that could short-circuit game ending, such as cub growing up or traitor turning
-        #     Such events should also set stop_processing and prevent_default to True to force a re-calcuation
-        # 2 = win stealers not dependent on winners, such as succubus
-        # Events in priority 3 and 4 should check if a winner was already set and short-circuit if so
-        # it is NOT recommended that events in priorities 0 and 2 set stop_processing to True, as doing so
-        # will prevent gamemode-specific win conditions from happening
-        # 3 = normal roles
-        # 4 = win stealers dependent on who won, such as demoniac and monster
-        #     (monster's message changes based on who would have otherwise won)
-        # 5 = gamemode-specific win conditions
-        event = Event("chk_win", {"winner": winner, "message": message, "additional_winners": None})
-        if not event.dispatch(var, rolemap, mainroles, lpl, lwolves, lrealwolves):
-            return chk_win_conditions(rolemap, mainroles, end_game, winner)
         winner = event.data["winner"]
         message = event.data["message"]
 
@@ -1947,120 +1973,249 @@ def on_kill_players(evt: Event, var, players: Set[User]):
         # HACK: notify kill_players that game is ending so it can pass it to its caller
         evt.prevent_default = True
 
-@handle_error
+# Idle and disconnection deadlines of the running game. Every player has at most
+# one entry, ("idle", nick), due when their next warning or idle death is, and
+# every disconnected player has one, ("dc", user), due when their grace time
+# runs out. Entries are replaced by pushing a newer one; _deadlines holds the
+# current deadline for each key, so outdated heap entries are skipped.
+_deadlines = {}
+_deadline_heap = []
+_deadline_seq = itertools.count()
+_reaper = SimpleNamespace(cli=None, gameid=None, timer=None, due=None, paused=None)
+
 def reaper(cli, gameid):
     # check to see if idlers need to be killed.
     var.IDLE_WARNED    = set()
     var.IDLE_WARNED_PM = set()
+
+    with var.GRAVEYARD_LOCK:
+        if _reaper.timer is not None:
+            _reaper.timer.cancel()
+        _deadlines.clear()
+        _deadline_heap.clear()
+        _reaper.cli = cli
+        _reaper.gameid = gameid
+        _reaper.timer = _reaper.due = _reaper.paused = None
+        if var.DEVOICE_DURING_NIGHT and var.PHASE == "night":
+            _reaper.paused = datetime.now()
+
+        for nick in list_players():
+            _refresh_idle(nick)
+        for user in var.DISCONNECTED:
+            _refresh_dc(user)
+
+def _reaping():
+    return _reaper.gameid is not None and _reaper.gameid == var.GAME_ID
+
+def _set_deadline(key, when):
+    if when is None:
+        _deadlines.pop(key, None)
+    elif _deadlines.get(key) != when:
+        _deadlines[key] = when
+        heapq.heappush(_deadline_heap, (when, next(_deadline_seq), key))
+        if _reaper.due is None or when < _reaper.due:
+            _arm_reaper()
+
+def _arm_reaper():
+    """Make sure the reaper runs when the earliest deadline is due."""
+    while _deadline_heap and _deadlines.get(_deadline_heap[0][2]) != _deadline_heap[0][0]:
+        heapq.heappop(_deadline_heap)
+    when = _deadline_heap[0][0] if _deadline_heap else None
+    if when == _reaper.due:
+        return
+    if _reaper.timer is not None:
+        _reaper.timer.cancel()
+        _reaper.timer = None
+    _reaper.due = when
+    if when is not None:
+        delay = max(0, (when - datetime.now()).total_seconds())
+        _reaper.timer = scheduler.Timer(delay, _reap, (_reaper.cli, _reaper.gameid))
+        _reaper.timer.start()
+
+def _idle_deadline(nick):
+    if _reaper.paused is not None or is_fake_nick(nick) or nick not in list_players():
+        return None
+    lst = var.LAST_SAID_TIME.get(nick, var.GAME_START_TIME)
+    # this follows the order in which _reap() checks them
+    if var.WARN_IDLE_TIME and nick not in var.IDLE_WARNED:
+        return lst + timedelta(seconds=var.WARN_IDLE_TIME)
+    if var.PM_WARN_IDLE_TIME and nick not in var.IDLE_WARNED_PM:
+        return lst + timedelta(seconds=var.PM_WARN_IDLE_TIME)
+    if var.KILL_IDLE_TIME:
+        return lst + timedelta(seconds=var.KILL_IDLE_TIME)
+    return None
+
+def _dc_deadline(user):
+    if user not in var.DISCONNECTED:
+        return None
+    timeofdc, what = var.DISCONNECTED[user]
+    if what in ("quit", "badnick"):
+        return timeofdc + timedelta(seconds=var.QUIT_GRACE_TIME)
+    if what == "part":
+        return timeofdc + timedelta(seconds=var.PART_GRACE_TIME)
+    if what == "account":
+        return timeofdc + timedelta(seconds=var.ACC_GRACE_TIME)
+    return None
+
+def _refresh_idle(nick):
+    with var.GRAVEYARD_LOCK:
+        if _reaping():
+            _set_deadline(("idle", nick), _idle_deadline(nick))
+
+def _refresh_dc(user):
+    with var.GRAVEYARD_LOCK:
+        if _reaping():
+            _set_deadline(("dc", user), _dc_deadline(user))
+
+def reset_idle(nick):
+    """Note that the player has just been active."""
+    with var.GRAVEYARD_LOCK:
+        var.LAST_SAID_TIME[nick] = datetime.now()
+        if _reaping():
+            if var.WARN_IDLE_TIME:
+                var.IDLE_WARNED.discard(nick)  # player saved themselves from death
+                var.IDLE_WARNED_PM.discard(nick)
+            _set_deadline(("idle", nick), _idle_deadline(nick))
+
+def pause_idle():
+    """Stop counting time towards idling, until resume_idle() is called."""
+    with var.GRAVEYARD_LOCK:
+        if not _reaping() or _reaper.paused is not None:
+            return
+        _reaper.paused = datetime.now()
+        for key in list(_deadlines):
+            if key[0] == "idle":
+                del _deadlines[key]
+        _arm_reaper()
+
+def resume_idle():
+    with var.GRAVEYARD_LOCK:
+        if not _reaping() or _reaper.paused is None:
+            return
+        paused = datetime.now() - _reaper.paused
+        _reaper.paused = None
+        for nick in var.LAST_SAID_TIME:
+            var.LAST_SAID_TIME[nick] += paused
+        var.GAME_START_TIME += paused
+        for nick in list_players():
+            _refresh_idle(nick)
+
+@handle_error
+def _reap(cli, gameid):
+    if gameid != var.GAME_ID:
+        return
     chan = botconfig.CHANNEL
+    with var.GRAVEYARD_LOCK:
+        # Terminate reaper when game ends
+        if var.PHASE not in ("day", "night") or _reaper.gameid != gameid:
+            return
+        _reaper.timer = _reaper.due = None
 
-    last_day_id = var.DAY_COUNT
-    num_night_iters = 0
+        now = datetime.now()
+        due = []
+        while _deadline_heap and _deadline_heap[0][0] <= now:
+            when, seq, key = heapq.heappop(_deadline_heap)
+            if _deadlines.get(key) == when:
+                del _deadlines[key]
+                due.append(key)
+
+        to_warn    = []
+        to_warn_pm = []
+        to_kill    = []
+        to_check   = []
+        dced       = []
+        pl = list_players()
+        for kind, who in due:
+            if kind == "dc":
+                dced.append(who)
+                continue
+            if who not in pl:
+                continue
+            lst = var.LAST_SAID_TIME.get(who, var.GAME_START_TIME)
+            tdiff = now - lst
+            if var.WARN_IDLE_TIME and (tdiff >= timedelta(seconds=var.WARN_IDLE_TIME) and
+                                    who not in var.IDLE_WARNED):
+                to_warn.append(who)
+                var.IDLE_WARNED.add(who)
+                var.LAST_SAID_TIME[who] = (now -
+                    timedelta(seconds=var.WARN_IDLE_TIME))  # Give them a chance
+            elif var.PM_WARN_IDLE_TIME and (tdiff >= timedelta(seconds=var.PM_WARN_IDLE_TIME) and
+                                    who not in var.IDLE_WARNED_PM):
+                to_warn_pm.append(who)
+                var.IDLE_WARNED_PM.add(who)
+                var.LAST_SAID_TIME[who] = (now -
+                    timedelta(seconds=var.PM_WARN_IDLE_TIME))
+            elif var.KILL_IDLE_TIME and (tdiff >= timedelta(seconds=var.KILL_IDLE_TIME) and
+                                    (not var.WARN_IDLE_TIME or who in var.IDLE_WARNED) and
+                                    (not var.PM_WARN_IDLE_TIME or who in var.IDLE_WARNED_PM)):
+                to_kill.append(who)
+                continue
+            to_check.append(who)
 
-    while gameid == var.GAME_ID:
-        skip = False
-        with var.GRAVEYARD_LOCK:
-            # Terminate reaper when game ends
-            if var.PHASE not in ("day", "night"):
-                return
-            if var.DEVOICE_DURING_NIGHT:
-                if var.PHASE == "night":
-                    # don't count nighttime towards idling
-                    # this doesn't do an exact count, but is good enough
-                    num_night_iters += 1
-                    skip = True
-                elif var.PHASE == "day" and var.DAY_COUNT != last_day_id:
-                    last_day_id = var.DAY_COUNT
-                    num_night_iters += 1
-                    for nick in var.LAST_SAID_TIME:
-                        var.LAST_SAID_TIME[nick] += timedelta(seconds=10*num_night_iters)
-                    num_night_iters = 0
-
-
-            if not skip and (var.WARN_IDLE_TIME or var.PM_WARN_IDLE_TIME or var.KILL_IDLE_TIME):  # only if enabled
-                to_warn    = []
-                to_warn_pm = []
-                to_kill    = []
-                for nick in list_players():
-                    if is_fake_nick(nick):
-                        continue
-                    lst = var.LAST_SAID_TIME.get(nick, var.GAME_START_TIME)
-                    tdiff = datetime.now() - lst
-                    if var.WARN_IDLE_TIME and (tdiff > timedelta(seconds=var.WARN_IDLE_TIME) and
-                                            nick not in var.IDLE_WARNED):
-                        to_warn.append(nick)
-                        var.IDLE_WARNED.add(nick)
-                        var.LAST_SAID_TIME[nick] = (datetime.now() -
-                            timedelta(seconds=var.WARN_IDLE_TIME))  # Give them a chance
-                    elif var.PM_WARN_IDLE_TIME and (tdiff > timedelta(seconds=var.PM_WARN_IDLE_TIME) and
-                                            nick not in var.IDLE_WARNED_PM):
-                        to_warn_pm.append(nick)
-                        var.IDLE_WARNED_PM.add(nick)
-                        var.LAST_SAID_TIME[nick] = (datetime.now() -
-                            timedelta(seconds=var.PM_WARN_IDLE_TIME))
-                    elif var.KILL_IDLE_TIME and (tdiff > timedelta(seconds=var.KILL_IDLE_TIME) and
-                                            (not var.WARN_IDLE_TIME or nick in var.IDLE_WARNED) and
-                                            (not var.PM_WARN_IDLE_TIME or nick in var.IDLE_WARNED_PM)):
-                        to_kill.append(nick)
-                    elif (tdiff < timedelta(seconds=var.WARN_IDLE_TIME) and
-                                            (nick in var.IDLE_WARNED or nick in var.IDLE_WARNED_PM)):
-                        var.IDLE_WARNED.discard(nick)  # player saved themselves from death
-                        var.IDLE_WARNED_PM.discard(nick)
-                for nck in to_kill:
-                    if nck not in list_players():
-                        continue
-                    if var.ROLE_REVEAL in ("on", "team"):
-                        cli.msg(chan, messages["idle_death"].format(nck, get_reveal_role(users._get(nck)))) # FIXME
-                    else:
-                        cli.msg(chan, (messages["idle_death_no_reveal"]).format(nck))
-                    user = users._get(nck) # FIXME
-                    user.disconnected = True
-                    if var.PHASE in var.GAME_PHASES:
-                        var.DCED_LOSERS.add(user)
-                    if var.IDLE_PENALTY:
-                        add_warning(cli, nck, var.IDLE_PENALTY, users.Bot.nick, messages["idle_warning"], expires=var.IDLE_EXPIRY)
-                    add_dying(var, user, "bot", "idle", death_triggers=False)
-                pl = list_players()
-                x = [a for a in to_warn if a in pl]
-                if x:
-                    cli.msg(chan, messages["channel_idle_warning"].format(", ".join(x)))
-                msg_targets = [p for p in to_warn_pm if p in pl]
-                mass_privmsg(cli, msg_targets, messages["player_idle_warning"].format(chan), privmsg=True)
-            for dcedplayer, (timeofdc, what) in list(var.DISCONNECTED.items()):
-                mainrole = get_main_role(dcedplayer)
-                revealrole = get_reveal_role(dcedplayer)
-                if what in ("quit", "badnick") and (datetime.now() - timeofdc) > timedelta(seconds=var.QUIT_GRACE_TIME):
-                    if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
-                        channels.Main.send(messages["quit_death"].format(dcedplayer, revealrole))
-                    else:
-                        channels.Main.send(messages["quit_death_no_reveal"].format(dcedplayer))
-                    if var.PHASE != "join" and var.PART_PENALTY:
-                        add_warning(cli, dcedplayer.nick, var.PART_PENALTY, users.Bot.nick, messages["quit_warning"], expires=var.PART_EXPIRY) # FIXME
-                    if var.PHASE in var.GAME_PHASES:
-                        var.DCED_LOSERS.add(dcedplayer)
-                    add_dying(var, dcedplayer, "bot", "quit", death_triggers=False)
-                elif what == "part" and (datetime.now() - timeofdc) > timedelta(seconds=var.PART_GRACE_TIME):
-                    if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
-                        channels.Main.send(messages["part_death"].format(dcedplayer, revealrole))
-                    else:
-                        channels.Main.send(messages["part_death_no_reveal"].format(dcedplayer))
-                    if var.PHASE != "join" and var.PART_PENALTY:
-                        add_warning(cli, dcedplayer.nick, var.PART_PENALTY, users.Bot.nick, messages["part_warning"], expires=var.PART_EXPIRY) # FIXME
-                    if var.PHASE in var.GAME_PHASES:
-                        var.DCED_LOSERS.add(dcedplayer)
-                    add_dying(var, dcedplayer, "bot", "part", death_triggers=False)
-                elif what == "account" and (datetime.now() - timeofdc) > timedelta(seconds=var.ACC_GRACE_TIME):
-                    if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
-                        channels.Main.send(messages["account_death"].format(dcedplayer, revealrole))
-                    else:
-                        channels.Main.send(messages["account_death_no_reveal"].format(dcedplayer))
-                    if var.PHASE != "join" and var.ACC_PENALTY:
-                        add_warning(cli, dcedplayer.nick, var.ACC_PENALTY, users.Bot.nick, messages["acc_warning"], expires=var.ACC_EXPIRY) # FIXME
-                    if var.PHASE in var.GAME_PHASES:
-                        var.DCED_LOSERS.add(dcedplayer)
-                    add_dying(var, dcedplayer, "bot", "account", death_triggers=False)
-            kill_players(var)
-        time.sleep(10)
+        for nck in to_kill:
+            if nck not in list_players():
+                continue
+            if var.ROLE_REVEAL in ("on", "team"):
+                cli.msg(chan, messages["idle_death"].format(nck, get_reveal_role(users._get(nck)))) # FIXME
+            else:
+                cli.msg(chan, (messages["idle_death_no_reveal"]).format(nck))
+            user = users._get(nck) # FIXME
+            user.disconnected = True
+            if var.PHASE in var.GAME_PHASES:
+                var.DCED_LOSERS.add(user)
+            if var.IDLE_PENALTY:
+                add_warning(cli, nck, var.IDLE_PENALTY, users.Bot.nick, messages["idle_warning"], expires=var.IDLE_EXPIRY)
+            add_dying(var, user, "bot", "idle", death_triggers=False)
+        pl = list_players()
+        x = [a for a in to_warn if a in pl]
+        if x:
+            cli.msg(chan, messages["channel_idle_warning"].format(", ".join(x)))
+        msg_targets = [p for p in to_warn_pm if p in pl]
+        mass_privmsg(cli, msg_targets, messages["player_idle_warning"].format(chan), privmsg=True)
+
+        for dcedplayer in dced:
+            if dcedplayer not in var.DISCONNECTED:
+                continue
+            timeofdc, what = var.DISCONNECTED[dcedplayer]
+            mainrole = get_main_role(dcedplayer)
+            revealrole = get_reveal_role(dcedplayer)
+            if what in ("quit", "badnick"):
+                if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
+                    channels.Main.send(messages["quit_death"].format(dcedplayer, revealrole), lane="game")
+                else:
+                    channels.Main.send(messages["quit_death_no_reveal"].format(dcedplayer), lane="game")
+                if var.PHASE != "join" and var.PART_PENALTY:
+                    add_warning(cli, dcedplayer.nick, var.PART_PENALTY, users.Bot.nick, messages["quit_warning"], expires=var.PART_EXPIRY) # FIXME
+                if var.PHASE in var.GAME_PHASES:
+                    var.DCED_LOSERS.add(dcedplayer)
+                add_dying(var, dcedplayer, "bot", "quit", death_triggers=False)
+            elif what == "part":
+                if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
+                    channels.Main.send(messages["part_death"].format(dcedplayer, revealrole), lane="game")
+                else:
+                    channels.Main.send(messages["part_death_no_reveal"].format(dcedplayer), lane="game")
+                if var.PHASE != "join" and var.PART_PENALTY:
+                    add_warning(cli, dcedplayer.nick, var.PART_PENALTY, users.Bot.nick, messages["part_warning"], expires=var.PART_EXPIRY) # FIXME
+                if var.PHASE in var.GAME_PHASES:
+                    var.DCED_LOSERS.add(dcedplayer)
+                add_dying(var, dcedplayer, "bot", "part", death_triggers=False)
+            elif what == "account":
+                if mainrole != "person" and var.ROLE_REVEAL in ("on", "team"):
+                    channels.Main.send(messages["account_death"].format(dcedplayer, revealrole), lane="game")
+                else:
+                    channels.Main.send(messages["account_death_no_reveal"].format(dcedplayer), lane="game")
+                if var.PHASE != "join" and var.ACC_PENALTY:
+                    add_warning(cli, dcedplayer.nick, var.ACC_PENALTY, users.Bot.nick, messages["acc_warning"], expires=var.ACC_EXPIRY) # FIXME
+                if var.PHASE in var.GAME_PHASES:
+                    var.DCED_LOSERS.add(dcedplayer)
+                add_dying(var, dcedplayer, "bot", "account", death_triggers=False)
+        kill_players(var)
+
+        if var.PHASE in ("day", "night") and _reaper.gameid == gameid:
+            # the players who were warned now have a later deadline
+            for nick in to_check:
+                _refresh_idle(nick)
+            _arm_reaper()
 
 @cmd("")  # update last said
 def update_last_said(cli, nick, chan, rest):
@@ -2068,7 +2223,7 @@ def update_last_said(cli, nick, chan, rest):
         return
 
     if var.PHASE not in ("join", "none"):
-        var.LAST_SAID_TIME[nick] = datetime.now()
+        reset_idle(nick)
 
     fullstring = "".join(rest)
 
@@ -2122,6 +2277,7 @@ def goat(var, wrapper, message):
     """Use a goat to interact with anyone in the channel during the day."""
 
     if wrapper.source in var.LAST_GOAT and var.LAST_GOAT[wrapper.source][0] + timedelta(seconds=var.GOAT_RATE_LIMIT) > datetime.now():
+        metrics.rate_limited()
         wrapper.pm(messages["command_ratelimited"])
         return
     target = re.split(" +",message)[0]
@@ -2163,7 +2319,7 @@ def return_to_village(var, target, *, show_message, new_user=None):
             if new_user is None:
                 new_user = target
 
-            var.LAST_SAID_TIME[target.nick] = datetime.now()
+            reset_idle(target.nick)
             var.DCED_LOSERS.discard(target)
 
             if target.nick in var.DCED_PLAYERS:
@@ -2225,6 +2381,8 @@ def rename_player(var, user, prefix):
                 if prefix in getattr(var, "IDLE_WARNED_PM", ()):
                     var.IDLE_WARNED_PM.remove(prefix)
                     var.IDLE_WARNED_PM.add(nick)
+                _refresh_idle(prefix)
+                _refresh_idle(nick)
 
         if var.PHASE == "join":
             if prefix in var.GAMEMODE_VOTES:
@@ -2341,7 +2499,7 @@ def leave(var, what, user, why=None):
         population = ""
         killplayer = False
 
-    channels.Main.send(msg.format(user, get_reveal_role(user)) + population)
+    channels.Main.send(msg.format(user, get_reveal_role(user)) + population, lane="game")
     var.SPECTATING_WOLFCHAT.discard(user)
     var.SPECTATING_DEADCHAT.discard(user)
     leave_deadchat(var, user)
@@ -2356,6 +2514,7 @@ def leave(var, what, user, why=None):
     else:
         temp = user.lower()
         var.DISCONNECTED[user] = (datetime.now(), what)
+        _refresh_dc(user)
 
 @command("quit", "leave", pm=True, phases=("join", "day", "night"))
 def leave_game(var, wrapper, message):
@@ -2414,15 +2573,15 @@ def begin_day():
     var.SILENCED = set()
     var.LAST_GOAT.clear()
     msg = messages["villagers_lynch"].format(botconfig.CMD_CHAR, len(list_players()) // 2 + 1)
-    channels.Main.send(msg)
+    channels.Main.send(msg, lane="game")
 
     var.DAY_ID = time.time()
     if var.DAY_TIME_WARN > 0:
         if var.STARTED_DAY_PLAYERS <= var.SHORT_DAY_PLAYERS:
-            t1 = threading.Timer(var.SHORT_DAY_WARN, hurry_up, [var.DAY_ID, False])
+            t1 = scheduler.Timer(var.SHORT_DAY_WARN, hurry_up, [var.DAY_ID, False])
             l = var.SHORT_DAY_WARN
         else:
-            t1 = threading.Timer(var.DAY_TIME_WARN, hurry_up, [var.DAY_ID, False])
+            t1 = scheduler.Timer(var.DAY_TIME_WARN, hurry_up, [var.DAY_ID, False])
             l = var.DAY_TIME_WARN
         var.TIMERS["day_warn"] = (t1, var.DAY_ID, l)
         t1.daemon = True
@@ -2430,10 +2589,10 @@ def begin_day():
 
     if var.DAY_TIME_LIMIT > 0:  # Time limit enabled
         if var.STARTED_DAY_PLAYERS <= var.SHORT_DAY_PLAYERS:
-            t2 = threading.Timer(var.SHORT_DAY_LIMIT, hurry_up, [var.DAY_ID, True])
+            t2 = scheduler.Timer(var.SHORT_DAY_LIMIT, hurry_up, [var.DAY_ID, True])
             l = var.SHORT_DAY_LIMIT
         else:
-            t2 = threading.Timer(var.DAY_TIME_LIMIT, hurry_up, [var.DAY_ID, True])
+            t2 = scheduler.Timer(var.DAY_TIME_LIMIT, hurry_up, [var.DAY_ID, True])
             l = var.DAY_TIME_LIMIT
         var.TIMERS["day"] = (t2, var.DAY_ID, l)
         t2.daemon = True
@@ -2459,7 +2618,7 @@ def night_warn(gameid):
     if var.PHASE != "night":
         return
 
-    channels.Main.send(messages["twilight_warning"])
+    channels.Main.send(messages["twilight_warning"], lane="game")
 
 @handle_error
 def transition_day(gameid=0):
@@ -2473,6 +2632,7 @@ def transition_day(gameid=0):
 
     var.PHASE = "day"
     var.DAY_COUNT += 1
+    resume_idle()
     var.FIRST_DAY = (var.DAY_COUNT == 1)
     var.DAY_START_TIME = datetime.now()
     var.VOTES.clear()
@@ -2631,7 +2791,7 @@ def transition_day(gameid=0):
             "https://i.imgur.com/PIIfL15.gifv",
             "https://i.imgur.com/eJiMG5z.gifv"]
             ))
-    channels.Main.send("\n".join(to_send))
+    channels.Main.send("\n".join(to_send), lane="game")
 
     # chilling howl message was played, give roles the opportunity to update !stats
     # to account for this
@@ -2957,6 +3117,9 @@ def transition_night():
     var.PHASE = "night"
     var.GAMEPHASE = "night"
 
+    if var.DEVOICE_DURING_NIGHT:
+        pause_idle() # don't count nighttime towards idling
+
     var.NIGHT_START_TIME = datetime.now()
     var.NIGHT_COUNT += 1
 
@@ -2988,13 +3151,13 @@ def transition_night():
 
     var.NIGHT_ID = time.time()
     if var.NIGHT_TIME_LIMIT > 0:
-        t = threading.Timer(var.NIGHT_TIME_LIMIT, transition_day, [var.NIGHT_ID])
+        t = scheduler.Timer(var.NIGHT_TIME_LIMIT, transition_day, [var.NIGHT_ID])
         var.TIMERS["night"] = (t, var.NIGHT_ID, var.NIGHT_TIME_LIMIT)
         t.daemon = True
         t.start()
 
     if var.NIGHT_TIME_WARN > 0:
-        t2 = threading.Timer(var.NIGHT_TIME_WARN, night_warn, [var.NIGHT_ID])
+        t2 = scheduler.Timer(var.NIGHT_TIME_WARN, night_warn, [var.NIGHT_ID])
         var.TIMERS["night_warn"] = (t2, var.NIGHT_ID, var.NIGHT_TIME_WARN)
         t2.daemon = True
         t2.start()
@@ -3005,12 +3168,14 @@ def transition_night():
 
     event_end = Event("transition_night_end", {})
     event_end.dispatch(var)
+    # role notifications are queued by the listeners, so that they go out ahead of everything else
+    IRCContext.send_messages()
 
     dmsg = (daydur_msg + messages["night_begin"])
 
     if var.NIGHT_COUNT > 1:
         dmsg = (dmsg + messages["first_night_begin"])
-    channels.Main.send(dmsg)
+    channels.Main.send(dmsg, lane="game")
     debuglog("BEGIN NIGHT")
     # If there are no nightroles that can act, immediately turn it to daytime
     chk_nightdone()
@@ -3054,6 +3219,30 @@ def expire_start_votes(cli, chan):
         var.START_VOTES.clear()
         cli.msg(chan, messages["start_expired"])
 
+def _roleset_picks(roleset, amount):
+    """Yield every distinct Counter of amount roles which can be taken from the roleset Counter.
+
+    Unlike itertools.combinations() over the elements, which yields the same
+    counts many times over, this yields each of them once.
+
+    """
+    roles = list(roleset)
+    # how many roles can still be taken from roles[i:]
+    left = list(itertools.accumulate(reversed([roleset[role] for role in roles])))[::-1] + [0]
+    picked = Counter()
+
+    def pick(i, amount):
+        if i == len(roles):
+            yield Counter(picked)
+            return
+        role = roles[i]
+        for num in range(max(amount - left[i + 1], 0), min(roleset[role], amount) + 1):
+            picked[role] = num
+            yield from pick(i + 1, amount - num)
+
+    if amount <= left[0]:
+        yield from pick(0, amount)
+
 @cmd("start", phases=("none", "join"))
 def start_cmd(cli, nick, chan, rest):
     """Starts a game of Werewolf."""
@@ -3064,6 +3253,7 @@ def start(cli, nick, chan, forced = False, restart = ""):
             var.LAST_START[nick][0] + timedelta(seconds=var.START_RATE_LIMIT) >
             datetime.now() and not restart):
         var.LAST_START[nick][1] += 1
+        metrics.rate_limited()
         cli.notice(nick, messages["command_ratelimited"])
         return
 
@@ -3132,7 +3322,7 @@ def start(cli, nick, chan, forced = False, restart = ""):
 
                     # If this was the first vote
                     if len(var.START_VOTES) == 1:
-                        t = threading.Timer(60, expire_start_votes, (cli, chan))
+                        t = scheduler.Timer(60, expire_start_votes, (cli, chan))
                         var.TIMERS["start_votes"] = (t, time.time(), 60)
                         t.daemon = True
                         t.start()
@@ -3221,16 +3411,15 @@ def start(cli, nick, chan, forced = False, restart = ""):
         for r in toadd:
             addroles[r] += 1
             roleset_roles[r] += 1
-        add_rolesets = []
-        temp_rolesets = []
-        for c in itertools.combinations(rs.elements(), amt):
-            add_rolesets.append(Counter(c))
+        # different rolesets may lead to the same role counts, so only keep one of each
+        temp_rolesets = {}
+        add_rolesets = list(_roleset_picks(rs, amt))
         for pr in possible_rolesets:
             for ar in add_rolesets:
                 temp = Counter(pr)
                 temp.update(ar)
-                temp_rolesets.append(temp)
-        possible_rolesets = temp_rolesets
+                temp_rolesets[frozenset(temp.items())] = temp
+        possible_rolesets = list(temp_rolesets.values())
 
     if var.ORIGINAL_SETTINGS and not restart:  # Custom settings
         need_reset = True
@@ -3294,7 +3483,7 @@ def start(cli, nick, chan, forced = False, restart = ""):
                 to_add.add(user)
                 count -= 1
 
-        selected = random.sample(vils, count)
+        selected = random.sample(list(vils), count)
         for x in selected:
             var.MAIN_ROLES[x] = role
             var.ORIGINAL_MAIN_ROLES[x] = role
@@ -3427,9 +3616,7 @@ def start(cli, nick, chan, forced = False, restart = ""):
 
     if not botconfig.DEBUG_MODE or not var.DISABLE_DEBUG_MODE_REAPER:
         # DEATH TO IDLERS!
-        reapertimer = threading.Thread(None, reaper, args=(cli,var.GAME_ID))
-        reapertimer.daemon = True
-        reapertimer.start()
+        reaper(cli, var.GAME_ID)
 
 @hook("error")
 def on_error(cli, pfx, msg):
@@ -3500,9 +3687,6 @@ def ftemplate(cli, nick, chan, rest):
                 db.delete_template(name)
                 reply(cli, nick, chan, messages["template_deleted"].format(name))
 
-        # re-init var.FLAGS and var.FLAGS_ACCS since they may have changed
-        db.init_vars()
-
 @cmd("fflags", flag="F", pm=True)
 def fflags(cli, nick, chan, rest):
     params = re.split(" +", rest)
@@ -3597,9 +3781,6 @@ def fflags(cli, nick, chan, rest):
                 else:
                     reply(cli, nick, chan, messages["access_deleted_host"].format(hm))
 
-        # re-init var.FLAGS and var.FLAGS_ACCS since they may have changed
-        db.init_vars()
-
 
 @cmd("wait", "w", playing=True, phases=("join",))
 def wait(cli, nick, chan, rest):
@@ -3620,6 +3801,7 @@ def wait(cli, nick, chan, rest):
         if ((var.LAST_WAIT and nick in var.LAST_WAIT and var.LAST_WAIT[nick] +
                 timedelta(seconds=var.WAIT_RATE_LIMIT) > now)
                 or var.WAIT_TB_TOKENS < 1):
+            metrics.rate_limited()
             cli.notice(nick, messages["command_ratelimited"])
             return
 
@@ -3820,6 +4002,7 @@ def show_admins(cli, nick, chan, rest):
 
     if (chan != nick and var.LAST_ADMINS and var.LAST_ADMINS +
             timedelta(seconds=var.ADMINS_RATE_LIMIT) > datetime.now()):
+        metrics.rate_limited()
         cli.notice(nick, messages["command_ratelimited"])
         return
 
@@ -3903,6 +4086,7 @@ def timeleft(cli, nick, chan, rest):
 
     if (chan != nick and var.LAST_TIME and
             var.LAST_TIME + timedelta(seconds=var.TIME_RATE_LIMIT) > datetime.now()):
+        metrics.rate_limited()
         cli.notice(nick, messages["command_ratelimited"])
         return
 
@@ -4097,6 +4281,7 @@ def game_stats(cli, nick, chan, rest):
     if (chan != nick and var.LAST_GSTATS and var.GSTATS_RATE_LIMIT and
             var.LAST_GSTATS + timedelta(seconds=var.GSTATS_RATE_LIMIT) >
             datetime.now()):
+        metrics.rate_limited()
         cli.notice(nick, messages["command_ratelimited"])
         return
 
@@ -4143,6 +4328,7 @@ def player_stats(cli, nick, chan, rest):
     if (chan != nick and var.LAST_PSTATS and var.PSTATS_RATE_LIMIT and
             var.LAST_PSTATS + timedelta(seconds=var.PSTATS_RATE_LIMIT) >
             datetime.now()):
+        metrics.rate_limited()
         cli.notice(nick, messages["command_ratelimited"])
         return
 
@@ -4218,6 +4404,7 @@ def role_stats(var, wrapper, rest):
     """Gets the stats for a given role in a given gamemode or lists role totals across all games if no role is given."""
     if (wrapper.target != users.Bot and var.LAST_RSTATS and var.RSTATS_RATE_LIMIT and
             var.LAST_RSTATS + timedelta(seconds=var.RSTATS_RATE_LIMIT) > datetime.now()):
+        metrics.rate_limited()
         wrapper.pm(messages["command_ratelimited"])
         return
 
@@ -4511,7 +4698,7 @@ def spectate_chat(var, wrapper, message, *, is_fspectate):
             if not is_fspectate and not already_spectating and var.SPECTATE_NOTICE:
                 spectator = wrapper.source.nick if var.SPECTATE_NOTICE_USER else "Someone"
                 for player in players:
-                    player.queue_message(messages["fspectate_notice"].format(spectator, what))
+                    player.queue_message(messages["fspectate_notice"].format(spectator, what), priority=PRIORITY_FLAVOR)
                 if players:
                     player.send_messages()
         elif var.ENABLE_DEADCHAT:
@@ -48,13 +48,15 @@ except ImportError:
 from oyoyo.client import IRCClient, TokenBucket
 
 import src
-from src import handler
+from src import handler, scheduler, metrics
 from src.events import Event
 import src.settings as var
 
 def main():
     evt = Event("init", {})
     evt.dispatch()
+    if var.METRICS_PORT:
+        metrics.start_server(var.METRICS_HOST, var.METRICS_PORT)
     src.plog("Connecting to {0}:{1}{2}".format(botconfig.HOST, "+" if botconfig.USE_SSL else "", botconfig.PORT))
     cli = IRCClient(
                       {"privmsg": lambda *s: None,
@@ -76,6 +78,8 @@ def main():
                      client_keyfile=var.SSL_KEYFILE,
                      cipher_list=var.SSL_CIPHERS,
                      tokenbucket=TokenBucket(var.IRC_TB_BURST, var.IRC_TB_DELAY, init=var.IRC_TB_INIT),
+                     reactor=var.IRC_REACTOR,
+                     scheduler=scheduler.default,
                      connect_cb=handler.connect_callback,
                      stream_handler=src.stream,
     )